@@ -0,0 +1,126 @@
+"""
+Serveur API en lecture seule, hors du processus de trading
+
+Sert les mêmes routes que l'API intégrée de bot_multisymbol_v6_3
+(/api/signals, /api/status, /api/trades, /api/positions, /metrics) à partir du
+snapshot SQLite publié par le bot. /api/profile déclenche la capture par
+SIGUSR1 (BOT_PID) : durée et fréquence sont alors PROFILE_SECONDS / PROFILE_HZ
+du bot, les paramètres seconds / hz ne traversent pas le processus.
+Lancé par le bot quand API_MODE=process :
+
+    gunicorn -w 4 -b 0.0.0.0:5001 api_server:app
+
+Le trafic du dashboard n'entre ainsi plus en concurrence avec bot_loop
+pour le GIL.
+"""
+import os
+import signal
+import time
+
+import pandas as pd
+from flask import Flask, Response, jsonify, request
+
+from state_snapshot import SnapshotReader, SNAPSHOT_DB
+from latency_metrics import PROMETHEUS_CONTENT_TYPE
+from loop_profiler import DEFAULT_SECONDS, DEFAULT_HZ
+
+BOT_NAME = os.getenv("BOT_NAME", "MULTI_SYMBOL_V6_3")
+TRADES_FILE = os.getenv("TRADES_FILE", "logs/trades_detailed.csv")
+STALE_AFTER_SECONDS = int(os.getenv("SNAPSHOT_STALE_SECONDS", "120"))
+BOT_PID = int(os.getenv("BOT_PID", "0")) or None
+
+app = Flask(__name__)
+reader = SnapshotReader(BOT_NAME, SNAPSHOT_DB)
+
+# Cache des trades par mtime du CSV (évite de relire le fichier à chaque requête)
+_trades_cache = {"mtime": None, "payload": []}
+
+
+def _raw_response(key, default="[]"):
+    payload, _ = reader.get_raw(key)
+    return Response(payload if payload is not None else default, mimetype="application/json")
+
+
+@app.route("/api/health")
+def health():
+    _, updated_at = reader.get_raw("status")
+    age = time.time() - updated_at if updated_at else None
+    ok = age is not None and age < STALE_AFTER_SECONDS
+    return jsonify({
+        "status": "ok" if ok else "stale",
+        "bot": BOT_NAME,
+        "snapshot_age_s": round(age, 1) if age is not None else None
+    }), (200 if ok else 503)
+
+
+@app.route("/api/signals")
+def signals():
+    """Endpoint pour le dashboard"""
+    return _raw_response("signals")
+
+
+@app.route("/api/status")
+def status():
+    """État du bot"""
+    return _raw_response("status", default="{}")
+
+
+@app.route("/api/positions")
+def positions():
+    """Positions actuellement ouvertes"""
+    return _raw_response("positions")
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Métriques de latence publiées par le bot (format Prometheus)"""
+    payload = reader.get("metrics", default="")
+    return Response(payload, mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route("/api/profile")
+def profile():
+    """
+    Profil par échantillonnage de bot_loop.
+    GET /api/profile?status=1 retourne l'état publié par le bot (rafraîchi au heartbeat),
+    GET /api/profile lance une capture par SIGUSR1.
+    """
+    current = reader.get("profile", default=None) or {"running": False}
+    if request.args.get("status"):
+        return jsonify(current)
+    if BOT_PID is None or not hasattr(signal, "SIGUSR1"):
+        return jsonify({"error": "BOT_PID inconnu ou SIGUSR1 indisponible"}), 501
+    if current.get("running"):
+        return jsonify({"error": "capture déjà en cours", **current}), 409
+    try:
+        os.kill(BOT_PID, signal.SIGUSR1)
+    except OSError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"requested": True, "seconds": DEFAULT_SECONDS, "hz": DEFAULT_HZ}), 202
+
+
+@app.route("/api/trades")
+def trades():
+    """Historique des trades récents"""
+    try:
+        mtime = os.path.getmtime(TRADES_FILE)
+    except OSError:
+        return jsonify([])
+
+    if mtime != _trades_cache["mtime"]:
+        try:
+            df = pd.read_csv(TRADES_FILE).tail(50)
+            df = df.replace([float('inf'), float('-inf')], 0)
+            df = df.where(pd.notnull(df), None)
+            _trades_cache["payload"] = df.to_dict('records')
+            _trades_cache["mtime"] = mtime
+        except Exception as e:
+            print(f"FAILED - API trades: {e}", flush=True)
+            return jsonify([])
+
+    return jsonify(_trades_cache["payload"])
+
+
+if __name__ == "__main__":
+    # Fallback sans gunicorn (mono-processus, utile en local)
+    app.run(host="0.0.0.0", port=int(os.getenv("API_PORT", "5001")), threaded=True)
@@ -1,8 +1,66 @@
+import os
+import sys
+import json
+import hashlib
+import contextlib
+import functools
+import multiprocessing
 import pandas as pd
 import numpy as np
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+import market_data
+from exit_resolution import trail_distances
+from cost_model import get_cost_model
+import monte_carlo
+
+# Local memory-mapped candle archive (see market_data.py). When enabled, only
+# missing candles are downloaded and the backtest window is no longer capped
+# at 1000 candles. Off by default: it writes to MARKET_DATA_DIR and downloads
+# the whole backtest span once (walk-forward needs it for multi-day windows).
+USE_MARKET_ARCHIVE = os.getenv("MARKET_ARCHIVE", "0") == "1"
+
+# Walk-forward settings: rolling train/test windows aligned on UTC days, so a
+# new day only adds one new window (past windows are served from the cache).
+WF_TRAIN_DAYS = float(os.getenv("WALK_FORWARD_TRAIN_DAYS", "3"))
+WF_TEST_DAYS = float(os.getenv("WALK_FORWARD_TEST_DAYS", "1"))
+WF_WINDOWS = int(os.getenv("WALK_FORWARD_WINDOWS", "7"))
+WF_WORKERS = int(os.getenv("WALK_FORWARD_WORKERS", str(min(4, os.cpu_count() or 1))))
+WF_CACHE_FILE = os.getenv("WALK_FORWARD_CACHE", "data/walk_forward_cache.json")
+MIN_TRADES = 5
+REST_OHLCV_LIMIT = 1000   # candles per fetch_ohlcv call when the archive is off
+MAX_LOOKAHEAD = 50   # candles a simulated trade may stay open (realistic trade horizon)
+DAY_MS = 86_400_000
+
+_worker_tuner = None
+
+
+def _evaluate_segment(task):
+    """Grid search of one strategy on one walk-forward segment — runs in a worker process.
+    The task only carries the grid and the candles as numpy columns (cheap to pickle
+    for a spawned worker). Returns [[pnl_atr, wins, trades, outcomes], ...] in param_grid order."""
+    global _worker_tuner
+    if _worker_tuner is None:
+        _worker_tuner = AutoTuner(None, None)
+    strat_name, param_grid, columns, first, strategy_params = task
+    return _worker_tuner._grid_stats(pd.DataFrame(columns), strat_name, param_grid, first, strategy_params)
+
+
+@contextlib.contextmanager
+def _worker_main():
+    """Spawned workers re-run the parent's __main__ (the bot script: ccxt client,
+    load_markets, Flask...). While the pool starts its workers, point __main__ at
+    tuner_worker, which only imports this module and the strategies."""
+    import tuner_worker
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = tuner_worker
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
 # Import the strategies
 import strategy_v6 as strat_v6
 import strategy_v7_robust as strat_v7
@@ -17,6 +75,8 @@ class AutoTuner:
             'v6_aggressive': (strat_v6.apply_indicators,      strat_v6.check_signal),
             'v7_robust':     (strat_v7.apply_indicators,      strat_v7.check_signal),
         }
+        # Hot-reloaded parameter sets (strategy_params.py) of the strategies taking one
+        self.param_stores = {'scalping_5m': strat_scalp5m.PARAMS}
         # Timeframe required by each strategy (used when fetching backtest data)
         self.strategy_timeframe = {
             'scalping_5m':   '5m',
@@ -31,13 +91,34 @@ class AutoTuner:
             {'sl_multi': 1.5, 'tp_multi': 3.0, 'threshold': 4},
             {'sl_multi': 1.2, 'tp_multi': 2.4, 'threshold': 3},
         ]
+        # Warm-up bars needed per strategy before the first signal
+        self.warmup = {'v7_robust': 200, 'scalping_5m': 110}
+        # Net PnL: fees / funding / slippage (cost_model.py, BACKTEST_COSTS=0 to disable).
+        # Slippage is sized on the largest position open_trade allows (25% of capital x leverage).
+        self.cost_model = get_cost_model()
+        self.trade_notional = float(os.getenv("CAPITAL", "200")) * int(os.getenv("LEVERAGE", "2")) * 0.25
+        # Equity fraction lost at the stop loss, for the Monte Carlo equity curves.
+        # Same default as config.py (not imported: it connects to the exchange).
+        self.risk_per_trade = float(os.getenv("RISK_PER_TRADE", "0.05"))
 
     def fetch_historical_data(self, symbol, timeframe, hours=48):
         """Fetch historical OHLCV data for backtesting."""
+        if USE_MARKET_ARCHIVE and timeframe in market_data.TIMEFRAME_MS:
+            start_ms = int((time.time() - hours * 3600) * 1000)
+            try:
+                if self.exchange is not None:
+                    market_data.sync(self.exchange, symbol, timeframe, since_ms=start_ms)
+            except Exception as e:
+                # Offline / API error: fall back to whatever is already archived
+                print(f"⚠️ AutoTuner archive sync failed for {symbol} {timeframe}: {e}", flush=True)
+            df = market_data.load_dataframe(symbol, timeframe, start_ms=start_ms)
+            if not df.empty:
+                return df
+
         try:
             tf_minutes = {'1m': 1, '5m': 5, '15m': 15, '1h': 60, '4h': 240}
             mins = tf_minutes.get(timeframe, 1)
-            limit = min(int(hours * 60 / mins), 1000)
+            limit = min(int(hours * 60 / mins), REST_OHLCV_LIMIT)
 
             ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
             df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
@@ -46,8 +127,18 @@ class AutoTuner:
             self.logger.log_error(f"AutoTuner fetch error for {symbol}", e)
             return pd.DataFrame()
 
-    def simulate_trade(self, df, start_index, signal, params):
-        """Simulate a trade from a given index with specific parameters."""
+    def simulate_trade(self, df, start_index, signal, params, intrabar=None, strategy=None):
+        """Simulate a trade from a given index with specific parameters.
+
+        With `intrabar` (exit_resolution.IntrabarIndex built on df's timestamps),
+        SL/TP are resolved on 1m candles instead of assuming SL first, and the
+        live trailing stop of `strategy` is modelled (see open_trade).
+        Returns the gross outcome in ATR multiples (0 if not closed)."""
+        result = self._simulate_exit(df, start_index, signal, params, intrabar, strategy)
+        return result[0] if result else 0
+
+    def _simulate_exit(self, df, start_index, signal, params, intrabar=None, strategy=None):
+        """Returns (outcome_atr, exit_index, exit_price, exit_reason) or None if not closed."""
         entry_price = df['close'].iloc[start_index]
         atr = df['atr'].iloc[start_index]
         
@@ -62,110 +153,278 @@ class AutoTuner:
             tp_price = entry_price - tp_dist
             
         # Scan forward — max 50 candles (realistic trade horizon)
-        max_lookahead = 50
-        end_index = min(start_index + 1 + max_lookahead, len(df))
+        end_index = min(start_index + 1 + MAX_LOOKAHEAD, len(df))
+
+        if intrabar is not None:
+            side = 1 if signal == 'long' else -1
+            trail = None
+            if strategy is not None:
+                activation_dist, trailing_distance = trail_distances(strategy, entry_price, atr, tp_dist)
+                trail = (entry_price + side * activation_dist, trailing_distance)
+            htf = tuple(df[c].to_numpy() for c in ('open', 'high', 'low', 'close'))
+            exit_index, exit_price, reason, _ = intrabar.resolve(start_index + 1, end_index, side,
+                                                                 sl_price, tp_price, trail, htf=htf)
+            if reason == 'END':
+                return None # Trade not closed within the window
+            return side * (exit_price - entry_price) / atr, exit_index, exit_price, reason
+
         for i in range(start_index + 1, end_index):
             current = df.iloc[i]
 
             if signal == 'long':
                 if current['low'] <= sl_price:
-                    return -params['sl_multi'] # Lost SL multiples of ATR
+                    return -params['sl_multi'], i, sl_price, 'SL' # Lost SL multiples of ATR
                 elif current['high'] >= tp_price:
-                    return params['tp_multi'] # Won TP multiples of ATR
+                    return params['tp_multi'], i, tp_price, 'TP' # Won TP multiples of ATR
             else:
                 if current['high'] >= sl_price:
-                    return -params['sl_multi']
+                    return -params['sl_multi'], i, sl_price, 'SL'
                 elif current['low'] <= tp_price:
-                    return params['tp_multi']
+                    return params['tp_multi'], i, tp_price, 'TP'
+
+        return None # Trade not closed within the window
+
+    def _backtest_stats(self, df, strat_name, params, start_idx=None, intrabar=None):
+        """Replay signals from start_idx to the end of df.
+        Returns [pnl_atr, wins, trades] net of costs when a cost model is set
+        (all zero if there is not enough data)."""
+        outcomes = self.backtest_outcomes(df, strat_name, params, start_idx, intrabar)
+        return [float(outcomes.sum()), int((outcomes > 0).sum()), len(outcomes)]
 
-        return 0 # Trade not closed within the window
+    def _grid_stats(self, df, strat_name, param_grid, start_idx=None, strategy_params=None):
+        """[pnl_atr, wins, trades, outcomes] of every param set, in param_grid order.
+        The per-trade outcomes (ATR multiples, JSON-friendly) feed the Monte Carlo ranking."""
+        return [[float(o.sum()), int((o > 0).sum()), len(o), [round(float(x), 6) for x in o]]
+                for o in self.grid_outcomes(df, strat_name, param_grid, start_idx, strategy_params)]
 
-    def backtest_strategy(self, df, strat_name, params):
-        """Run a quick backtest for a specific strategy and parameter set."""
+    def backtest_outcomes(self, df, strat_name, params, start_idx=None, intrabar=None):
+        """Net outcome of every simulated trade, in ATR multiples."""
+        if intrabar is None:
+            return self.grid_outcomes(df, strat_name, [params], start_idx)[0]
+
+        # 1m exits with the trailing stop are path dependent: one trade at a time
+        df_ind, side, score = self._signal_columns(df, strat_name, start_idx)
+        trades = []   # (entry_index, side, outcome_atr, exit_index, exit_price, exit_reason)
+        for i in np.flatnonzero((side != 0) & (score >= params['threshold'])):
+            signal = 'long' if side[i] > 0 else 'short'
+            result = self._simulate_exit(df_ind, i, signal, params, intrabar, strat_name)
+            if result and result[0] != 0:
+                trades.append((i, int(side[i])) + result)
+        return self._net_outcomes(df_ind, trades)
+
+    def _signal_columns(self, df, strat_name, start_idx=None, strategy_params=None):
+        """Indicators plus per-bar signal side (+1 long / -1 short / 0) and score.
+        Signals only depend on the strategy and the candles, so they are computed
+        once and shared by every param set of the grid. `strategy_params` (a
+        strategy_params dataclass) is passed to strategies that accept one; by
+        default the current set is read once, so a hot reload during the run
+        cannot mix two parameter sets between indicators and signals."""
         apply_ind, check_sig = self.strategies[strat_name]
+        if strategy_params is None:
+            strategy_params = self.current_strategy_params(strat_name)
+        if strategy_params is not None:
+            apply_ind = functools.partial(apply_ind, params=strategy_params)
+            check_sig = functools.partial(check_sig, params=strategy_params)
         df_ind = apply_ind(df.copy())
+        if start_idx is None:
+            start_idx = self.warmup.get(strat_name, 25)
 
-        pnl_atr = 0
-        trades_count = 0
-        wins = 0
-
-        # Warm-up bars needed per strategy
-        warmup = {'v7_robust': 200, 'scalping_5m': 110}
-        start_idx = warmup.get(strat_name, 25)
-        
-        if len(df_ind) <= start_idx:
-            return -999, 0 # Not enough data
-            
+        side = np.zeros(len(df_ind), dtype=np.int8)
+        score = np.zeros(len(df_ind))
         for i in range(start_idx, len(df_ind) - 1):
             slice_df = df_ind.iloc[:i+1] # Simulate real-time up to index i
-            signal, score, atr = check_sig(slice_df)
-            
-            if signal and score >= params['threshold']:
-                # Found a signal, simulate the trade outcome
-                outcome = self.simulate_trade(df_ind, i, signal, params)
-                if outcome != 0:
-                    trades_count += 1
-                    pnl_atr += outcome
-                    if outcome > 0:
-                        wins += 1
-                        
+            signal, sig_score, atr = check_sig(slice_df)
+            if signal:
+                side[i] = 1 if signal == 'long' else -1
+                score[i] = sig_score
+        return df_ind, side, score
+
+    def current_strategy_params(self, strat_name):
+        """Current strategy_params set of a strategy (None if it takes none)."""
+        store = self.param_stores.get(strat_name)
+        return store.get() if store is not None else None
+
+    def grid_outcomes(self, df, strat_name, param_grid, start_idx=None, strategy_params=None):
+        """Net outcomes (ATR multiples) of every param set, evaluated together.
+
+        The first SL / TP touch is searched once per distinct sl_multi / tp_multi
+        over a (signals x lookahead) candle matrix, then combined by broadcasting
+        into a (signals x sl x tp) outcome cube; thresholds only mask signals.
+        Same results as simulating each param set separately (SL first when a
+        candle touches both). Returns one outcome array per param set."""
+        df_ind, side, score = self._signal_columns(df, strat_name, start_idx, strategy_params)
+        return self._grid_from_signals(df_ind, side, score, param_grid)
+
+    def sweep_strategy_params(self, df, strat_name, strategy_param_sets, param_grid=None, start_idx=None):
+        """grid_outcomes for each strategy parameter set (strategy_params.sweep,
+        e.g. EMA / RSI settings of scalping_5m). Returns one list of outcome
+        arrays (param_grid order) per strategy parameter set."""
+        param_grid = param_grid or self.param_grid
+        results = []
+        for strategy_params in strategy_param_sets:
+            df_ind, side, score = self._signal_columns(df, strat_name, start_idx, strategy_params)
+            results.append(self._grid_from_signals(df_ind, side, score, param_grid))
+        return results
+
+    def _grid_from_signals(self, df_ind, side, score, param_grid):
+        """SL / TP / threshold grid on precomputed signal columns (see grid_outcomes)."""
+        min_threshold = min(p['threshold'] for p in param_grid)
+        entry_idx = np.flatnonzero((side != 0) & (score >= min_threshold))
+        if len(entry_idx) == 0:
+            return [np.zeros(0) for _ in param_grid]
+
+        sl_values = np.unique([p['sl_multi'] for p in param_grid]).astype(np.float64)
+        tp_values = np.unique([p['tp_multi'] for p in param_grid]).astype(np.float64)
+        high = df_ind['high'].to_numpy(dtype=np.float64)
+        low = df_ind['low'].to_numpy(dtype=np.float64)
+        entry = df_ind['close'].to_numpy(dtype=np.float64)[entry_idx]
+        atr = df_ind['atr'].to_numpy(dtype=np.float64)[entry_idx]
+        sgn = side[entry_idx].astype(np.float64)
+
+        # Candles after each entry, NaN-padded past the end of the data (never touched)
+        window = entry_idx[:, None] + 1 + np.arange(MAX_LOOKAHEAD)
+        pad = np.full(MAX_LOOKAHEAD, np.nan)
+        high_w = np.concatenate((high, pad))[window]
+        low_w = np.concatenate((low, pad))[window]
+        # Shorts mirrored as longs on negated prices (exact, keeps <= / >= semantics)
+        is_long = (sgn > 0)[:, None]
+        adverse = np.where(is_long, low_w, -high_w)
+        favorable = np.where(is_long, high_w, -low_w)
+
+        sl_price = entry[:, None] - sgn[:, None] * (atr[:, None] * sl_values)   # (signals, sl)
+        tp_price = entry[:, None] + sgn[:, None] * (atr[:, None] * tp_values)   # (signals, tp)
+        sl_hit = adverse[:, None, :] <= (sgn[:, None] * sl_price)[:, :, None]
+        tp_hit = favorable[:, None, :] >= (sgn[:, None] * tp_price)[:, :, None]
+        sl_bar = np.where(sl_hit.any(axis=2), sl_hit.argmax(axis=2), MAX_LOOKAHEAD)[:, :, None]
+        tp_bar = np.where(tp_hit.any(axis=2), tp_hit.argmax(axis=2), MAX_LOOKAHEAD)[:, None, :]
+
+        # (signals, sl, tp) cube
+        stopped = (sl_bar <= tp_bar) & (sl_bar < MAX_LOOKAHEAD)
+        closed = stopped | (tp_bar < sl_bar)
+        gross = np.where(stopped, -sl_values[None, :, None], tp_values[None, None, :])
+        exit_idx = entry_idx[:, None, None] + 1 + np.minimum(np.where(stopped, sl_bar, tp_bar), MAX_LOOKAHEAD - 1)
+        exit_price = np.where(stopped, sl_price[:, :, None], tp_price[:, None, :])
+        reason = np.where(stopped, 'SL', 'TP')
+        cube_shape = gross.shape
+        net = self._net_of_costs(
+            df_ind, np.broadcast_to(entry_idx[:, None, None], cube_shape),
+            np.broadcast_to(sgn[:, None, None], cube_shape), gross,
+            np.minimum(exit_idx, len(df_ind) - 1), exit_price, reason,
+        )
+        valid = closed & (gross != 0)
+
+        sig_score = score[entry_idx]
+        outcomes = []
+        for p in param_grid:
+            i_sl = int(np.searchsorted(sl_values, p['sl_multi']))
+            i_tp = int(np.searchsorted(tp_values, p['tp_multi']))
+            keep = valid[:, i_sl, i_tp] & (sig_score >= p['threshold'])
+            outcomes.append(net[:, i_sl, i_tp][keep])
+        return outcomes
+
+    def _net_outcomes(self, df_ind, trades):
+        """Per-trade outcomes in ATR multiples, with fees, funding and slippage
+        applied to all trades at once."""
+        if not trades:
+            return np.zeros(0)
+        entry_idx, side, outcome, exit_idx, exit_price, reason = (np.array(col) for col in zip(*trades))
+        return self._net_of_costs(df_ind, entry_idx, side, outcome, exit_idx, exit_price, reason)
+
+    def _net_of_costs(self, df_ind, entry_idx, side, outcome, exit_idx, exit_price, reason):
+        """Gross ATR outcomes minus fees / funding / slippage (arrays of any shape)."""
+        outcome = np.asarray(outcome, dtype=np.float64)
+        if self.cost_model is None:
+            return outcome
+        entry_price = df_ind['close'].to_numpy()[entry_idx]
+        atr = df_ind['atr'].to_numpy()[entry_idx]
+        volume = df_ind['volume'].to_numpy() if 'volume' in df_ind else None
+        ts = df_ind['timestamp'].to_numpy() if 'timestamp' in df_ind else None
+        costs = self.cost_model.trade_costs(
+            side, entry_price, exit_price, reason,
+            qty=self.trade_notional / entry_price,
+            entry_ts=ts[entry_idx] if ts is not None else None,
+            exit_ts=ts[exit_idx] if ts is not None else None,
+            entry_volume=volume[entry_idx] if volume is not None else None,
+            exit_volume=volume[exit_idx] if volume is not None else None,
+        )
+        return outcome - costs['total'] / atr
+
+    def backtest_strategy(self, df, strat_name, params, intrabar=None):
+        """Run a quick backtest for a specific strategy and parameter set.
+        Pass an IntrabarIndex built on df['timestamp'] to resolve exits on 1m candles."""
+        if len(df) <= self.warmup.get(strat_name, 25):
+            return -999, 0 # Not enough data
+
+        pnl_atr, wins, trades_count = self._backtest_stats(df, strat_name, params, intrabar=intrabar)
         win_rate = (wins / trades_count) * 100 if trades_count > 0 else 0
         # Require minimum 5 trades for a valid backtest result
-        if trades_count < 5:
+        if trades_count < MIN_TRADES:
             return -999, 0
         return pnl_atr, win_rate
 
     def get_best_configuration(self, symbols, default_timeframe):
         """Determine the best strategy and parameters based on recent data.
-        Backtests on up to 3 symbols and averages results to avoid overfitting.
+        Backtests on up to 3 symbols, pools the trades and ranks configs on the
+        5th percentile of Monte Carlo returns rather than on raw PnL.
         Returns None if no config beats the quality threshold — caller keeps
         the current strategy in that case."""
         test_symbols = symbols[:3] if isinstance(symbols, list) else [symbols]
 
-        best_pnl = -float('inf')
+        best_score = -float('inf')
         best_config = None
         results_log = []
 
+        frames = {}   # (symbol, timeframe) -> candles, fetched once for all strategies
+
         for strat_name in self.strategies.keys():
             # Each strategy is tested on its own required timeframe
             tf = self.strategy_timeframe.get(strat_name) or default_timeframe
 
-            for params in self.param_grid:
-                total_pnl = 0.0
-                total_wr = 0.0
-                valid_count = 0
-
-                for sym in test_symbols:
-                    df = self.fetch_historical_data(sym, tf, hours=48)
-                    if df.empty or len(df) < 110:
-                        continue
-                    pnl, win_rate = self.backtest_strategy(df, strat_name, params)
-                    if pnl == -999:
-                        continue
-                    total_pnl += pnl
-                    total_wr += win_rate
-                    valid_count += 1
+            # Signals are computed once per symbol, the whole grid is evaluated on them
+            grid_results = [[] for _ in self.param_grid]
+            for sym in test_symbols:
+                if (sym, tf) not in frames:
+                    frames[(sym, tf)] = self.fetch_historical_data(sym, tf, hours=48)
+                df = frames[(sym, tf)]
+                if df.empty or len(df) < 110:
+                    continue
+                if len(df) <= self.warmup.get(strat_name, 25):
+                    continue
+                for outcomes, sym_outcomes in zip(grid_results, self.grid_outcomes(df, strat_name, self.param_grid)):
+                    # Require minimum 5 trades for a valid backtest result
+                    if len(sym_outcomes) >= MIN_TRADES:
+                        outcomes.append(sym_outcomes)
 
-                if valid_count == 0:
+            for params, outcomes in zip(self.param_grid, grid_results):
+                if not outcomes:
                     continue
 
-                avg_pnl = total_pnl / valid_count
-                avg_wr = total_wr / valid_count
+                valid_count = len(outcomes)
+                avg_pnl = sum(o.sum() for o in outcomes) / valid_count
+                avg_wr = sum((o > 0).mean() * 100 for o in outcomes) / valid_count
+
+                # Outcomes in R (1R = loss at the stop) resampled into equity curves
+                mc = monte_carlo.simulate(np.concatenate(outcomes) / params['sl_multi'],
+                                          risk_per_trade=self.risk_per_trade)
+                score = monte_carlo.risk_adjusted_score(mc)
 
                 results_log.append(
-                    f"{strat_name} [{tf}] {params}: PnL={avg_pnl:.2f} ATR, WR={avg_wr:.1f}% (n={valid_count})"
+                    f"{strat_name} [{tf}] {params}: PnL={avg_pnl:.2f} ATR, WR={avg_wr:.1f}% (n={valid_count}), "
+                    f"MC p5={mc['return_pct'][5]:+.1f}% DD p5={mc['max_drawdown_pct'][5]:.1f}% "
+                    f"ruine={mc['prob_ruin']:.1%}"
                 )
 
-                # Require win rate >= 40% AND positive PnL
-                if avg_wr < 40.0 or avg_pnl <= 0:
+                # Require win rate >= 40%, positive PnL AND a low probability of ruin
+                if avg_wr < 40.0 or avg_pnl <= 0 or mc['prob_ruin'] > monte_carlo.MAX_RUIN_PROB:
                     continue
-                if avg_pnl > best_pnl:
-                    best_pnl = avg_pnl
+                if score > best_score:
+                    best_score = score
                     best_config = {
                         'strategy': strat_name,
                         'params': params,
                         'expected_pnl': avg_pnl,
-                        'expected_wr': avg_wr
+                        'expected_wr': avg_wr,
+                        'monte_carlo': monte_carlo.summary(mc),
                     }
 
         # Log results for debugging
@@ -178,3 +437,248 @@ class AutoTuner:
         # Nothing qualifies — return None so the bot keeps its current strategy
         print("🔍 Tuner: aucune config qualifiée, stratégie actuelle conservée.")
         return None
+
+    # ================= WALK-FORWARD =================
+
+    def _wf_cache_key(self, strat_name, tf, symbol, start_ms, end_ms, strategy_params=None):
+        costs = self.cost_model.signature() if self.cost_model is not None else "gross"
+        # Strategy parameter set (EMA / RSI...): a reload of strategy_params.json
+        # must not keep serving segments computed with the previous settings
+        signals = json.dumps(strategy_params.as_dict() if strategy_params is not None else None,
+                             sort_keys=True)
+        # "outcomes": cached results carry the per-trade outcomes (older entries do not)
+        grid = hashlib.md5((json.dumps(self.param_grid, sort_keys=True) + costs + signals + "outcomes")
+                           .encode()).hexdigest()[:8]
+        return f"{strat_name}|{tf}|{symbol}|{start_ms}|{end_ms}|{grid}"
+
+    def _load_wf_cache(self):
+        try:
+            with open(WF_CACHE_FILE, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_wf_cache(self, cache, horizon_ms):
+        # Drop segments that fell out of the walk-forward horizon
+        cache = {k: v for k, v in cache.items() if int(k.split('|')[3]) >= horizon_ms}
+        os.makedirs(os.path.dirname(WF_CACHE_FILE) or '.', exist_ok=True)
+        tmp = WF_CACHE_FILE + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp, WF_CACHE_FILE)
+
+    def _slice(self, df, start_ms, end_ms, warmup):
+        """Rows in [start_ms, end_ms) plus `warmup` bars before; returns (df, first_eval_index)"""
+        ts = df['timestamp'].to_numpy()
+        lo = int(np.searchsorted(ts, start_ms, side='left'))
+        hi = int(np.searchsorted(ts, end_ms, side='left'))
+        first = max(0, lo - warmup)
+        return df.iloc[first:hi].reset_index(drop=True), lo - first
+
+    def walk_forward(self, symbols, default_timeframe, train_days=WF_TRAIN_DAYS,
+                     test_days=WF_TEST_DAYS, n_windows=WF_WINDOWS, workers=WF_WORKERS):
+        """Walk-forward optimisation over rolling train/test windows.
+
+        Windows end on the last complete UTC day. In each window the config is
+        selected on the train segment only, then scored on the following test
+        segment; those out-of-sample results decide whether the procedure is
+        trusted. The config returned for live trading is the one selected on
+        the latest train segment (the last `train_days` before today).
+
+        Each (segment, strategy, symbol) grid search runs in a spawned worker
+        process and is cached on disk, so a new day only adds the newest
+        train / test / live segments.
+
+        Returns the same dict as get_best_configuration (strategy, params,
+        expected_pnl, expected_wr — here out-of-sample) plus walk-forward
+        stats, or None if the procedure is not robust out-of-sample.
+        Without the candle archive a single fetch is capped at REST_OHLCV_LIMIT
+        candles, too short for the windows of intraday timeframes: the tuner
+        then falls back to get_best_configuration (no walk-forward stats).
+        """
+        test_symbols = symbols[:3] if isinstance(symbols, list) else [symbols]
+        train_ms = int(train_days * DAY_MS)
+        test_ms = int(test_days * DAY_MS)
+        if not USE_MARKET_ARCHIVE:
+            span_ms = train_ms + n_windows * test_ms
+            short = sorted({tf for tf in (self.strategy_timeframe.get(s) or default_timeframe
+                                          for s in self.strategies)
+                            if span_ms / market_data.TIMEFRAME_MS.get(tf, 60_000) > REST_OHLCV_LIMIT})
+            if short:
+                print(f"⚠️ Walk-forward impossible sans archive (MARKET_ARCHIVE=0) : "
+                      f"{span_ms / DAY_MS:.0f} jours d'historique requis, {REST_OHLCV_LIMIT} bougies max "
+                      f"en {', '.join(short)}. Repli sur l'optimisation 48 h (get_best_configuration) ; "
+                      f"activer MARKET_ARCHIVE=1 pour le walk-forward.", flush=True)
+                return self.get_best_configuration(symbols, default_timeframe)
+        last_end = (int(time.time() * 1000) // DAY_MS) * DAY_MS
+        windows = []
+        for k in range(n_windows, 0, -1):
+            test_end = last_end - (k - 1) * test_ms
+            test_start = test_end - test_ms
+            windows.append((test_start - train_ms, test_start, test_end))
+        live_train = (last_end - train_ms, last_end)
+        segments = sorted({(train_start, test_start) for train_start, test_start, _ in windows}
+                          | {(test_start, test_end) for _, test_start, test_end in windows}
+                          | {live_train})
+        horizon_ms = windows[0][0]
+
+        # One parameter set per strategy for the whole run (cache keys and workers)
+        strategy_params = {name: self.current_strategy_params(name) for name in self.strategies}
+        cache = self._load_wf_cache()
+        tasks, task_keys = [], []
+        for strat_name in self.strategies:
+            tf = self.strategy_timeframe.get(strat_name) or default_timeframe
+            warmup = self.warmup.get(strat_name, 25)
+            tf_ms = market_data.TIMEFRAME_MS.get(tf, 60_000)
+            span_hours = (last_end - horizon_ms) / 3_600_000 + warmup * tf_ms / 3_600_000 + 24
+            for sym in test_symbols:
+                keys = [self._wf_cache_key(strat_name, tf, sym, *seg, strategy_params[strat_name])
+                        for seg in segments]
+                if all(key in cache for key in keys):
+                    continue
+                df = self.fetch_historical_data(sym, tf, hours=span_hours)
+                if df.empty:
+                    continue
+                for key, (start, end) in zip(keys, segments):
+                    if key in cache:
+                        continue
+                    seg_df, first = self._slice(df, start, end, warmup)
+                    # Incomplete history: skip the segment rather than cache partial results
+                    if len(seg_df) - first < 0.9 * (end - start) / tf_ms or first < warmup:
+                        continue
+                    columns = {c: seg_df[c].to_numpy() for c in
+                               ("timestamp", "open", "high", "low", "close", "volume")}
+                    tasks.append((strat_name, self.param_grid, columns, first, strategy_params[strat_name]))
+                    task_keys.append(key)
+
+        if tasks:
+            print(f"🔄 Walk-forward: {len(tasks)} segment(s) à calculer ({len(cache)} en cache)", flush=True)
+            if workers > 1 and len(tasks) > 1:
+                # spawn: fresh workers, nothing inherited from the bot's threads
+                # (locks held by the API / monitor threads at fork time)
+                ctx = multiprocessing.get_context('spawn')
+                with _worker_main(), ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                    results = list(pool.map(_evaluate_segment, tasks))
+            else:
+                results = [_evaluate_segment(t) for t in tasks]
+            cache.update(zip(task_keys, results))
+            self._save_wf_cache(cache, horizon_ms)
+
+        return self._aggregate_walk_forward(cache, test_symbols, default_timeframe, windows, live_train,
+                                           strategy_params)
+
+    def _segment_stats(self, cache, test_symbols, default_timeframe, strategy_params, *segments):
+        """Pooled [pnl_atr, wins, trades, outcomes] per (strategy, param_idx) for each
+        segment, over the symbols whose every segment is cached."""
+        totals = [{} for _ in segments]
+        for strat_name in self.strategies:
+            tf = self.strategy_timeframe.get(strat_name) or default_timeframe
+            for sym in test_symbols:
+                results = [cache.get(self._wf_cache_key(strat_name, tf, sym, *seg, strategy_params[strat_name]))
+                           for seg in segments]
+                if any(res is None for res in results):
+                    continue
+                for seg_totals, res in zip(totals, results):
+                    for idx, (pnl, wins, trades, outcomes) in enumerate(res):
+                        t = seg_totals.setdefault((strat_name, idx), [0.0, 0, 0, []])
+                        t[0] += pnl
+                        t[1] += wins
+                        t[2] += trades
+                        t[3].extend(outcomes)
+        return totals
+
+    def _r_multiples(self, cfg, outcomes):
+        """ATR outcomes of config (strategy, param_idx) in R (1R = loss at the stop)"""
+        return np.asarray(outcomes, dtype=np.float64) / self.param_grid[cfg[1]]['sl_multi']
+
+    def _select_in_sample(self, train):
+        """Best train config: among those with enough trades, WR >= 40%, PnL > 0 and a
+        Monte Carlo probability of ruin <= MAX_RUIN_PROB, the highest 5th-percentile
+        Monte Carlo return (as in get_best_configuration)."""
+        best, best_score = None, -float('inf')
+        for cfg, (pnl, wins, trades, outcomes) in sorted(train.items()):
+            if trades < MIN_TRADES or wins / trades < 0.4 or pnl <= 0:
+                continue
+            mc = monte_carlo.simulate(self._r_multiples(cfg, outcomes), risk_per_trade=self.risk_per_trade)
+            if mc['prob_ruin'] > monte_carlo.MAX_RUIN_PROB:
+                continue
+            score = monte_carlo.risk_adjusted_score(mc)
+            if score > best_score:
+                best, best_score = cfg, score
+        return best
+
+    def _aggregate_walk_forward(self, cache, test_symbols, default_timeframe, windows, live_train,
+                                strategy_params):
+        """Out-of-sample results of the select-on-train / score-on-test procedure,
+        and the config selected on the latest train segment."""
+        oos = {'pnl': 0.0, 'wins': 0, 'trades': 0, 'windows': 0, 'windows_positive': 0}
+        oos_r = []   # out-of-sample trades of the selected configs, in R
+        selected_is = 0.0
+        for train_start, test_start, test_end in windows:
+            train, test = self._segment_stats(cache, test_symbols, default_timeframe, strategy_params,
+                                              (train_start, test_start), (test_start, test_end))
+            if not train:
+                continue
+            oos['windows'] += 1
+            cfg = self._select_in_sample(train)
+            if cfg is None:
+                # Nothing qualified in-sample: the procedure stays flat this window
+                continue
+            pnl, wins, trades, outcomes = test[cfg]
+            strat_name, idx = cfg
+            print(f"🔍 Walk-forward {time.strftime('%Y-%m-%d %H:%M', time.gmtime(test_start / 1000))}: "
+                  f"{strat_name} {self.param_grid[idx]} IS={train[cfg][0]:.2f} → OOS={pnl:.2f} ATR "
+                  f"({trades} trades)")
+            selected_is += train[cfg][0]
+            oos['pnl'] += pnl
+            oos['wins'] += wins
+            oos['trades'] += trades
+            oos['windows_positive'] += pnl > 0
+            oos_r.append(self._r_multiples(cfg, outcomes))
+
+        if not oos['windows']:
+            print("⚠️ Walk-forward: historique insuffisant, aucune fenêtre complète "
+                  "(archive de bougies incomplète ?), stratégie actuelle conservée.", flush=True)
+            return None
+
+        wr = oos['wins'] / oos['trades'] * 100 if oos['trades'] else 0.0
+        avg_pnl = oos['pnl'] / oos['windows'] if oos['windows'] else 0.0
+        print(f"🔍 Walk-forward OOS: PnL={avg_pnl:.2f} ATR/fenêtre, WR={wr:.1f}% ({oos['trades']} trades, "
+              f"{oos['windows_positive']}/{oos['windows']} fenêtres +)")
+        if selected_is:
+            print(f"🔍 Walk-forward efficiency: OOS {oos['pnl']:.2f} / IS {selected_is:.2f} ATR", flush=True)
+
+        mc = monte_carlo.simulate(np.concatenate(oos_r), risk_per_trade=self.risk_per_trade) if oos_r else None
+        if mc:
+            print(f"🔍 Walk-forward OOS Monte Carlo: p5={mc['return_pct'][5]:+.1f}% "
+                  f"DD p5={mc['max_drawdown_pct'][5]:.1f}% ruine={mc['prob_ruin']:.1%}")
+
+        # Robust out-of-sample: enough trades, WR >= 40%, positive PnL in at least half the
+        # windows and a low Monte Carlo probability of ruin over the OOS trade sequence
+        if (oos['trades'] < MIN_TRADES or wr < 40.0 or avg_pnl <= 0
+                or oos['windows_positive'] * 2 < oos['windows']
+                or mc is None or mc['prob_ruin'] > monte_carlo.MAX_RUIN_PROB):
+            print("🔍 Walk-forward: aucune config robuste hors échantillon, stratégie actuelle conservée.")
+            return None
+
+        live, = self._segment_stats(cache, test_symbols, default_timeframe, strategy_params, live_train)
+        cfg = self._select_in_sample(live)
+        if cfg is None:
+            print("🔍 Walk-forward: aucune config qualifiée sur la dernière fenêtre d'entraînement, "
+                  "stratégie actuelle conservée.")
+            return None
+        strat_name, idx = cfg
+        pnl, wins, trades, _ = live[cfg]
+        return {
+            'strategy': strat_name,
+            'params': self.param_grid[idx],
+            'expected_pnl': avg_pnl,
+            'expected_wr': wr,
+            'oos_trades': oos['trades'],
+            'windows_positive': oos['windows_positive'],
+            'windows': oos['windows'],
+            'train_pnl': pnl,
+            'train_wr': wins / trades * 100,
+            'wf_efficiency': oos['pnl'] / selected_is if selected_is > 0 else 0.0,
+            'monte_carlo': monte_carlo.summary(mc),
+        }
@@ -0,0 +1,140 @@
+"""
+Ordonnanceur aligné sur la clôture des bougies
+
+Les boucles des bots dormaient une durée fixe (5 s, 60 s...) sans lien avec
+les bougies : une bougie close pouvait attendre presque une période avant
+d'être traitée, et la plupart des requêtes relisaient des données inchangées.
+
+BarScheduler connaît les timeframes de chaque stratégie et dort jusqu'à la
+prochaine clôture (heure de l'exchange) + un délai de grâce, le temps que
+l'exchange publie la bougie. wait() retourne les stratégies dont une bougie
+vient de clôturer :
+  - horloge : décalage local → exchange mesuré par fetch_time (milieu de
+    l'aller-retour), resynchronisé toutes les CLOCK_RESYNC_SECONDS
+  - une bougie n'est signalée qu'une fois ; si le travail a débordé sur
+    plusieurs périodes, la clôture en retard est signalée immédiatement
+  - max_wait : réveil anticipé (ex: suivi des positions), liste vide
+  - BAR_SCHEDULER=0 : ancien comportement, pause fixe de
+    BAR_SCHEDULER_POLL_SECONDS et toutes les stratégies à chaque cycle
+
+Usage :
+    scheduler = BarScheduler(exchange, {"sniper_ote": ("1m", "4h")})
+    while True:
+        ...
+        due = scheduler.wait()
+"""
+import os
+import time
+
+from market_data import TIMEFRAME_MS
+
+BAR_SCHEDULER = os.getenv("BAR_SCHEDULER", "1") == "1"
+BAR_CLOSE_GRACE_MS = int(os.getenv("BAR_CLOSE_GRACE_MS", "1500"))
+CLOCK_RESYNC_SECONDS = float(os.getenv("CLOCK_RESYNC_SECONDS", "900"))
+POLL_SECONDS = float(os.getenv("BAR_SCHEDULER_POLL_SECONDS", "5"))
+
+
+class BarScheduler:
+    def __init__(self, exchange=None, strategies=None, grace_ms=BAR_CLOSE_GRACE_MS,
+                 enabled=BAR_SCHEDULER, poll_seconds=POLL_SECONDS,
+                 resync_seconds=CLOCK_RESYNC_SECONDS):
+        self.exchange = exchange
+        self.grace_ms = grace_ms
+        self.enabled = enabled
+        self.poll_seconds = poll_seconds
+        self.resync_seconds = resync_seconds
+        self.offset_ms = 0.0           # heure exchange - heure locale
+        self._synced_at = None
+        self.strategies = {}           # nom -> timeframes
+        self._last_close = {}          # timeframe -> dernière clôture signalée (ms)
+        for name, timeframes in (strategies or {}).items():
+            self.register(name, timeframes)
+
+    def register(self, name, timeframes):
+        """Déclare (ou met à jour) les timeframes d'une stratégie"""
+        if isinstance(timeframes, str):
+            timeframes = (timeframes,)
+        unknown = [tf for tf in timeframes if tf not in TIMEFRAME_MS]
+        if unknown:
+            raise ValueError(f"Timeframes inconnus pour {name}: {unknown}")
+        self.strategies[name] = tuple(timeframes)
+        now = self.now_ms()
+        for tf in timeframes:
+            # La bougie en cours à l'enregistrement sera la première signalée
+            self._last_close.setdefault(tf, self._last_close_at(tf, now))
+
+    # ── Horloge ───────────────────────────────────────────────────────────────
+    def sync_clock(self):
+        """Mesure le décalage avec l'horloge de l'exchange (conservé en cas d'erreur)"""
+        self._synced_at = time.monotonic()
+        if self.exchange is None:
+            return self.offset_ms
+        try:
+            t0 = time.time()
+            server_ms = self.exchange.fetch_time()
+            t1 = time.time()
+        except Exception as e:
+            print(f"⚠️ Horloge exchange indisponible, décalage conservé ({self.offset_ms:.0f} ms): {e}", flush=True)
+            return self.offset_ms
+        offset = server_ms - (t0 + t1) * 500
+        if abs(offset - self.offset_ms) > 250:
+            print(f"⏱️ Décalage horloge exchange: {offset:+.0f} ms", flush=True)
+        self.offset_ms = offset
+        return offset
+
+    def now_ms(self):
+        """Heure de l'exchange estimée (ms)"""
+        return time.time() * 1000 + self.offset_ms
+
+    def _last_close_at(self, timeframe, now_ms):
+        """Dernière clôture de bougie dont le délai de grâce est écoulé"""
+        tf_ms = TIMEFRAME_MS[timeframe]
+        return (int(now_ms) - self.grace_ms) // tf_ms * tf_ms
+
+    # ── Attente ───────────────────────────────────────────────────────────────
+    def next_wake_ms(self, names=None):
+        """Heure exchange (ms) du prochain réveil pour ces stratégies"""
+        timeframes = self._timeframes(names)
+        return min(self._last_close[tf] + TIMEFRAME_MS[tf] for tf in timeframes) + self.grace_ms
+
+    def wait(self, names=None, max_wait=None):
+        """
+        Dort jusqu'à la prochaine clôture d'un timeframe de `names` (toutes les
+        stratégies par défaut) ou au plus `max_wait` secondes.
+        Retourne la liste des stratégies dont une bougie a clôturé.
+        """
+        names = list(self.strategies) if names is None else [names] if isinstance(names, str) else list(names)
+        if not self.enabled:
+            time.sleep(self.poll_seconds if max_wait is None else min(self.poll_seconds, max_wait))
+            return names
+
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            if self._synced_at is None or time.monotonic() - self._synced_at >= self.resync_seconds:
+                self.sync_clock()
+            due = self.poll(names)
+            if due:
+                return due
+            delay = (self.next_wake_ms(names) - self.now_ms()) / 1000
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                delay = min(delay, remaining)
+            time.sleep(max(delay, 0.01))
+
+    def poll(self, names=None):
+        """Stratégies dont une bougie a clôturé depuis le dernier signalement (sans attendre)"""
+        names = list(self.strategies) if names is None else names
+        now = self.now_ms()
+        closed = set()
+        for tf in self._timeframes(names):
+            close = self._last_close_at(tf, now)
+            if close > self._last_close[tf]:
+                self._last_close[tf] = close
+                closed.add(tf)
+        return [name for name in names if closed.intersection(self.strategies[name])]
+
+    def _timeframes(self, names):
+        names = self.strategies if names is None else names
+        return {tf for name in names for tf in self.strategies[name]}
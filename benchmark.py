@@ -0,0 +1,523 @@
+"""
+Benchmark des chemins critiques : indicateurs, signaux, backtests, analyseur, logger
+
+Données OHLCV synthétiques reproductibles (market_data.generate, graine fixe)
+ou enregistrées (--dataset), plusieurs tailles :
+  - bars    : 200 / 10k / 1M bougies par symbole
+  - symbols : 1 / 20 / 200 symboles (cycle de scan complet, 200 bougies chacun)
+
+Cas mesurés :
+  strategy/<strat>/bars=N      apply_indicators + check_signal sur N bougies
+  scan/<strat>/symbols=K       un cycle de scan sur K symboles
+  scan/paper_tick/symbols=K    un tick de prix groupé du paper exchange (K positions)
+  scan/order_book/symbols=K    deltas L2 + requêtes de sizing (VWAP, max_qty) sur K carnets
+  bars/<spec>/trades=N         bougies depuis N trades publics (vectorisé et incrémental)
+  tuner/backtest/<strat>/...   AutoTuner.backtest_strategy (≤ 10k bougies)
+  tuner/grid/combos=G          AutoTuner.grid_outcomes, grille SL × TP × seuil de G combinaisons
+  tuner/simulate_trade         AutoTuner.simulate_trade (par appel)
+  analyzer/<métrique>/...      TradeAnalyzer sur un historique de trades
+  logger/<méthode>             écritures EnhancedLogger (par appel)
+
+Chaque cas est aussi exprimé relativement à un cas de calibration
+(calibrate : pandas, numpy et boucle Python sur des données fixes) mesuré sur
+la même machine au même moment. Le baseline ne contient que ces ratios, ce qui
+absorbe une partie de la charge de la machine. Il n'est pas versionné : des
+temps mesurés ailleurs ne sont pas comparables, chacun génère le sien avec
+--save-baseline avant de modifier le code, puis --compare.
+
+Usage :
+    python benchmark.py                        # profil quick (200/10k bougies, 1/20 symboles)
+    python benchmark.py --profile full         # + 1M bougies et 200 symboles
+    python benchmark.py --save-baseline        # enregistre benchmark_baseline.json (local, ignoré par git)
+    python benchmark.py --compare              # compare au baseline (code retour 1 si régression)
+    python benchmark.py --only strategy/v7     # filtre sur le nom des cas
+    python benchmark.py --dataset BTC/USDT:USDT@1m   # données enregistrées (market_data.py)
+
+Les fichiers écrits par les stratégies et le logger (logs/*.csv) le sont dans
+un dossier temporaire, jamais dans le dépôt.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+import market_data  # noqa: E402
+
+DEFAULT_RESULTS = os.path.join(ROOT, "benchmark_results.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmark_baseline.json")
+
+PROFILES = {
+    "quick": {"bars": [200, 10_000], "symbols": [1, 20], "trades": [200, 10_000]},
+    "full":  {"bars": [200, 10_000, 1_000_000], "symbols": [1, 20, 200], "trades": [200, 10_000, 100_000]},
+}
+BACKTEST_MAX_BARS = 10_000   # backtest_strategy est O(n) appels check_signal : au-delà, trop long
+SCAN_BARS = 200              # taille du fetch_ohlcv des bots
+SEED = 42
+CALIBRATION_BARS = 200_000
+DEFAULT_TOLERANCE = 1.0      # régression = 2× plus lent ; le bruit d'une machine chargée atteint 50-90 %
+
+
+# =========================
+# DONNÉES SYNTHÉTIQUES
+# =========================
+_dataset = None   # série enregistrée (--dataset), sinon données synthétiques
+_dataset_tf = None
+
+
+def ohlcv(n_bars, seed=SEED, timeframe="1m"):
+    """
+    n_bars bougies : les dernières de la série --dataset si elle est assez
+    longue (décalées selon la graine pour varier les symboles), sinon
+    régimes synthétiques market_data.generate.
+    """
+    if _dataset is not None and len(_dataset["timestamp"]) >= n_bars and timeframe == _dataset_tf:
+        n_total = len(_dataset["timestamp"])
+        end = n_total - (seed - SEED) * 7 % max(1, n_total - n_bars + 1)
+        return pd.DataFrame({c: np.array(_dataset[c][end - n_bars:end]) for c in market_data.COLUMNS})
+    return market_data.synthetic_dataframe(n_bars, seed=seed, timeframe=timeframe)
+
+
+def synthetic_trades(n_trades, seed=SEED):
+    """Historique de trades au format logs/trades_detailed.csv"""
+    rng = np.random.default_rng(seed)
+    pnl = rng.normal(0.1, 1.0, n_trades)
+    return pd.DataFrame({
+        "timestamp": pd.date_range(end=datetime.now(), periods=n_trades, freq="15min"),
+        "side": rng.choice(["long", "short"], n_trades),
+        "pnl_usdt": pnl,
+        "pnl_percent": pnl / 10,
+        "result": np.where(pnl > 0, "WIN", "LOSS"),
+        "entry_signal_strength": rng.integers(1, 6, n_trades),
+        "entry_rsi": rng.uniform(20, 80, n_trades),
+    })
+
+
+# =========================
+# MESURE
+# =========================
+def measure(fn, repeat, per_call=1):
+    """Exécute fn `repeat` fois, retourne les stats en secondes (divisées par per_call)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) / per_call)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "runs": repeat,
+    }
+
+
+def calibrate(repeat=9):
+    """
+    Cas de référence de la machine : EMA / rolling pandas, cumsum numpy et une
+    boucle Python, dans les mêmes proportions que les chemins mesurés
+    """
+    rng = np.random.default_rng(SEED)
+    close = pd.Series(100 + np.cumsum(rng.normal(0, 0.1, CALIBRATION_BARS)))
+    values = close.tolist()
+
+    def workload():
+        close.ewm(span=20, adjust=False).mean()
+        close.rolling(50).std()
+        np.maximum.accumulate(np.cumsum(close.to_numpy()))
+        total = 0.0
+        for x in values:
+            total += x * x
+        return total
+
+    return measure(workload, repeat)
+
+
+def relative_to(results, calibration):
+    """
+    Ajoute à chaque cas son meilleur temps en multiples de celui de la calibration
+    (les minimums sont les moins sensibles à la charge de la machine)
+    """
+    for stats in results.values():
+        stats["relative"] = stats["min_s"] / calibration["min_s"]
+
+
+def repeat_for(n_bars):
+    """Moins de répétitions sur les gros volumes"""
+    if n_bars >= 1_000_000:
+        return 1
+    if n_bars >= 10_000:
+        return 3
+    return 5
+
+
+# =========================
+# CAS DE BENCHMARK
+# =========================
+def single_frame_strategies():
+    """Stratégies à interface apply_indicators(df) / check_signal(df)"""
+    import strategy_scalping_5m
+    import strategy_v6
+    import strategy_v7_robust
+    import strategy_v9_scalper
+    import strategy_ai_enhanced
+
+    def ai_enhanced_check(df):
+        return strategy_ai_enhanced.check_signal(df, symbol="__BENCH__")
+
+    return {
+        "scalping_5m":   (strategy_scalping_5m.apply_indicators, strategy_scalping_5m.check_signal),
+        "v6_aggressive": (strategy_v6.apply_indicators, strategy_v6.check_signal),
+        "v7_robust":     (strategy_v7_robust.apply_indicators, strategy_v7_robust.check_signal),
+        "v9_scalper":    (strategy_v9_scalper.apply_indicators, strategy_v9_scalper.check_signal),
+        # debug_check_signal recalcule ses indicateurs et écrit une ligne CSV (chemin live)
+        "ai_enhanced":   (strategy_ai_enhanced.apply_indicators, ai_enhanced_check),
+    }
+
+
+def bench_strategies(profile, results):
+    import strategy_sniper_ote
+    import strategy_ai_enhanced
+
+    strategies = single_frame_strategies()
+    for n_bars in profile["bars"]:
+        df = ohlcv(n_bars)
+        for name, (apply_ind, check_sig) in strategies.items():
+            def run():
+                # copie : certaines stratégies (v6) modifient df en place
+                check_sig(apply_ind(df.copy()))
+            results[f"strategy/{name}/bars={n_bars}"] = measure(run, repeat_for(n_bars))
+
+        # Rejeu batch de la machine à états BIOS/OTE sur tout l'historique
+        results[f"strategy/ai_enhanced_replay/bars={n_bars}"] = measure(
+            lambda: strategy_ai_enhanced.replay_signals(df), repeat_for(n_bars)
+        )
+
+        df_h4 = ohlcv(50, seed=SEED + 1, timeframe="4h")
+        results[f"strategy/sniper_ote/bars={n_bars}"] = measure(
+            lambda: strategy_sniper_ote.check_signal(df, df_h4), repeat_for(n_bars)
+        )
+        # Structure incrémentale (live) : cadres déjà intégrés, lecture seule
+        strategy_sniper_ote.check_signal(df, df_h4, "BENCH")
+        results[f"strategy/sniper_ote_incremental/bars={n_bars}"] = measure(
+            lambda: strategy_sniper_ote.check_signal(df, df_h4, "BENCH"), repeat_for(n_bars)
+        )
+
+
+def bench_scan(profile, results):
+    import strategy_fvg_confluence
+
+    strategies = single_frame_strategies()
+    for n_symbols in profile["symbols"]:
+        frames = [ohlcv(SCAN_BARS, seed=SEED + i) for i in range(n_symbols)]
+        for name, (apply_ind, check_sig) in strategies.items():
+            def run():
+                for df in frames:
+                    check_sig(apply_ind(df.copy()))
+            results[f"scan/{name}/symbols={n_symbols}"] = measure(run, 3)
+        # Confluence FVG + Fibonacci vectorisée sur tout l'historique de chaque symbole
+        results[f"scan/fvg_confluence/symbols={n_symbols}"] = measure(
+            lambda: [strategy_fvg_confluence.fvg_fib_confluence(df) for df in frames], 3
+        )
+        results[f"scan/paper_tick/symbols={n_symbols}"] = bench_paper_tick(n_symbols)
+        results[f"scan/order_book/symbols={n_symbols}"] = bench_order_book(n_symbols)
+
+
+def bench_paper_tick(n_symbols, n_ticks=1_000):
+    """Ticks de prix groupés sur K positions avec TP/SL et trailing (coût par tick)"""
+    from paper_exchange import PaperExchange
+
+    class Market:
+        def fetch_ticker(self, symbol, params=None):
+            return {"symbol": symbol, "last": 100.0}
+
+    paper = PaperExchange(Market(), balance=1e9, feed=False)
+    symbols = [f"S{i}/USDT:USDT" for i in range(n_symbols)]
+    for symbol in symbols:
+        paper.create_market_order(symbol, "buy", 1, params={"stopLoss": 50, "takeProfit": 200})
+        paper.private_post_v5_position_trading_stop({
+            "symbol": symbol.split(":")[0].replace("/", ""), "trailingStop": "30", "activePrice": "101"})
+    rng = np.random.default_rng(SEED)
+    paths = 100 + np.cumsum(rng.normal(0, 0.05, (n_ticks, n_symbols)), axis=0)
+    ticks = [dict(zip(symbols, row.tolist())) for row in paths]
+
+    def run():
+        for prices in ticks:
+            paper.update_prices(prices)
+
+    return measure(run, 3, per_call=n_ticks)
+
+
+def bench_order_book(n_symbols, n_updates=200):
+    """Un delta par carnet puis les requêtes de sizing d'une entrée (coût par tour)"""
+    from order_book import OrderBookRegistry
+
+    books = OrderBookRegistry(record_path="")
+    rng = np.random.default_rng(SEED)
+    ids = [f"S{i}USDT" for i in range(n_symbols)]
+    for market in ids:
+        books.handle_message({"topic": f"orderbook.50.{market}", "type": "snapshot", "data": {
+            "s": market, "u": 1,
+            "b": [[100 - 0.01 * k, float(q)] for k, q in enumerate(rng.uniform(0.1, 5, 50), 1)],
+            "a": [[100 + 0.01 * k, float(q)] for k, q in enumerate(rng.uniform(0.1, 5, 50), 1)],
+        }})
+    deltas = [[{"topic": f"orderbook.50.{market}", "type": "delta", "data": {
+        "s": market,
+        "b": [[round(100 - 0.01 * rng.integers(1, 50), 2), float(rng.choice([0.0, 1.0]))]],
+        "a": [[round(100 + 0.01 * rng.integers(1, 50), 2), float(rng.choice([0.0, 1.0]))]],
+    }} for market in ids] for _ in range(n_updates)]
+    update_ids = itertools.count(2)
+
+    def run():
+        for messages in deltas:
+            update_id = next(update_ids)
+            for message in messages:
+                message["data"]["u"] = update_id
+                book = books.handle_message(message)
+                book.vwap("buy", 10)
+                book.max_qty("sell", 10)
+
+    return measure(run, 3, per_call=n_updates)
+
+
+def bench_bars(profile, results):
+    import trade_bars
+
+    rng = np.random.default_rng(SEED)
+    for n_trades in profile["trades"]:
+        trades = {
+            "timestamp": 1_700_000_000_000 + np.cumsum(rng.exponential(150, n_trades)).astype(np.int64),
+            "price": 100 + np.cumsum(rng.normal(0, 0.02, n_trades)),
+            "size": rng.exponential(1.0, n_trades),
+        }
+        rows = list(zip(trades["timestamp"].tolist(), trades["price"].tolist(), trades["size"].tolist()))
+        for spec in ("5s", "vol50", "range0.5"):
+            results[f"bars/{spec}/trades={n_trades}"] = measure(
+                lambda: trade_bars.build_bars(trades, spec), repeat_for(n_trades)
+            )
+
+            def run_incremental():
+                builder = trade_bars.BarBuilder(spec)
+                for ts, price, size in rows:
+                    builder.add(ts, price, size)
+
+            results[f"bars/{spec}_incremental/trades={n_trades}"] = measure(run_incremental, repeat_for(n_trades))
+
+
+def bench_tuner(profile, results):
+    from auto_tuner import AutoTuner
+
+    tuner = AutoTuner(None, None)
+    params = tuner.param_grid[0]
+    for n_bars in profile["bars"]:
+        if n_bars > BACKTEST_MAX_BARS:
+            print(f"   (backtest ignoré pour {n_bars} bougies > {BACKTEST_MAX_BARS})")
+            continue
+        df = ohlcv(n_bars)
+        for strat_name in tuner.strategies:
+            # Pas plus de bougies que le warmup : backtest_strategy sort tout de suite
+            if n_bars <= tuner.warmup.get(strat_name, 25):
+                continue
+            results[f"tuner/backtest/{strat_name}/bars={n_bars}"] = measure(
+                lambda: tuner.backtest_strategy(df, strat_name, params), repeat_for(n_bars)
+            )
+
+    # Grille complète évaluée sur les mêmes signaux : coût ~ indépendant de la taille
+    df = ohlcv(min(profile["bars"][-1], BACKTEST_MAX_BARS))
+    for n_values in (1, 6):
+        grid = [{'sl_multi': 1.0 + 0.2 * a, 'tp_multi': 2.0 + 0.4 * b, 'threshold': 2 + c}
+                for a in range(n_values) for b in range(n_values) for c in range(min(n_values, 3))]
+        results[f"tuner/grid/combos={len(grid)}"] = measure(
+            lambda: tuner.grid_outcomes(df, "v7_robust", grid), repeat_for(len(df))
+        )
+
+    # simulate_trade : coût par appel, fenêtre de 50 bougies
+    df_ind = tuner.strategies["v7_robust"][0](ohlcv(2_000))
+    starts = list(range(200, 1_900, 10))
+
+    def run_simulations():
+        for i, start in enumerate(starts):
+            tuner.simulate_trade(df_ind, start, "long" if i % 2 else "short", params)
+
+    results["tuner/simulate_trade"] = measure(run_simulations, 5, per_call=len(starts))
+
+
+def bench_analyzer(profile, results, workdir):
+    from analyzers.trade_analyzer import TradeAnalyzer
+
+    for n_trades in profile["trades"]:
+        path = os.path.join(workdir, f"trades_{n_trades}.csv")
+        synthetic_trades(n_trades).to_csv(path, index=False)
+        analyzer = TradeAnalyzer(path)
+        results[f"analyzer/load_data/trades={n_trades}"] = measure(analyzer.load_data, 3)
+        results[f"analyzer/get_daily_stats/trades={n_trades}"] = measure(lambda: analyzer.get_daily_stats(30), 3)
+        results[f"analyzer/get_hourly_performance/trades={n_trades}"] = measure(analyzer.get_hourly_performance, 3)
+        results[f"analyzer/get_risk_metrics/trades={n_trades}"] = measure(analyzer.get_risk_metrics, 3)
+        results[f"analyzer/get_best_trades/trades={n_trades}"] = measure(analyzer.get_best_trades, 3)
+
+
+def bench_logger(results):
+    from logger_enhanced import EnhancedLogger
+
+    bench_logger = EnhancedLogger("BENCH")
+    n_writes = 500
+    signal_data = {
+        "symbol": "BTC/USDT:USDT", "signal": "long", "price": 50_000.0, "trend": "bullish",
+        "rsi": 55.0, "macd": 1.2, "stoch_k": 60.0, "stoch_d": 55.0, "bb_position": 0.6,
+        "signal_strength": 3, "executed": True, "reason_not_executed": "",
+    }
+    trade_data = {
+        "symbol": "BTC/USDT:USDT", "side": "long", "entry_price": 50_000.0, "exit_price": 50_250.0,
+        "quantity": 0.01, "pnl_usdt": 2.5, "pnl_percent": 0.5, "result": "WIN",
+    }
+
+    def write_signals():
+        for _ in range(n_writes):
+            bench_logger.log_signal(signal_data)
+
+    def write_trades():
+        for _ in range(n_writes):
+            bench_logger.log_trade_detailed(trade_data)
+
+    results["logger/log_signal"] = measure(write_signals, 3, per_call=n_writes)
+    results["logger/log_trade_detailed"] = measure(write_trades, 3, per_call=n_writes)
+    results["logger/get_recent_trades"] = measure(lambda: bench_logger.get_recent_trades(50), 5)
+
+
+# =========================
+# BASELINE
+# =========================
+def compare(results, baseline, tolerance):
+    """
+    Retourne la liste des régressions (cas qui dépassent baseline × (1 + tolérance)).
+    Compare les ratios à la calibration quand le baseline en a, sinon les
+    temps absolus (baseline enregistré par une version précédente).
+    """
+    regressions = []
+    print(f"\n{'cas':<58} {'baseline':>12} {'actuel':>12} {'ratio':>7}")
+    for case, stats in sorted(results.items()):
+        ref = baseline.get(case)
+        key = "relative" if ref and "relative" in ref else "median_s"
+        unit, scale = ("x", 1) if key == "relative" else ("ms", 1000)
+        if not ref:
+            print(f"{case:<58} {'—':>12} {stats[key] * scale:>10.4g}{unit:<2} {'new':>7}")
+            continue
+        ratio = stats[key] / ref[key] if ref[key] > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append((case, ratio))
+            flag = "  ❌"
+        print(f"{case:<58} {ref[key] * scale:>10.4g}{unit:<2} {stats[key] * scale:>10.4g}{unit:<2} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des stratégies, backtests et logger")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--dataset", default="",
+                        help="série enregistrée SYMBOLE@TF (ex: BTC/USDT:USDT@1m) au lieu du synthétique")
+    parser.add_argument("--only", default="", help="ne garder que les cas contenant cette chaîne")
+    parser.add_argument("--output", default=DEFAULT_RESULTS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="régression si médiane > baseline × (1 + tolérance)")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    if args.dataset:
+        global _dataset, _dataset_tf
+        symbol, _dataset_tf = args.dataset.rsplit("@", 1)
+        _dataset = market_data.load_candles(symbol, _dataset_tf, root=os.path.join(ROOT, market_data.MARKET_DATA_DIR))
+        print(f"📂 Dataset {args.dataset}: {len(_dataset['timestamp'])} bougies")
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline)
+
+    # Les stratégies loguent en INFO à chaque appel : on coupe pour ne mesurer que le calcul
+    logging.getLogger("strategy_ai_enhanced").setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="bybit_bench_")
+    os.chdir(workdir)
+    os.makedirs("logs", exist_ok=True)
+
+    print("⏱️  calibration...", flush=True)
+    calibration = calibrate()
+
+    results = {}
+    groups = [
+        ("strategy", lambda: bench_strategies(profile, results)),
+        ("scan", lambda: bench_scan(profile, results)),
+        ("bars", lambda: bench_bars(profile, results)),
+        ("tuner", lambda: bench_tuner(profile, results)),
+        ("analyzer", lambda: bench_analyzer(profile, results, workdir)),
+        ("logger", lambda: bench_logger(results)),
+    ]
+    only_group = args.only.split("/")[0] if "/" in args.only else None
+    for name, run in groups:
+        if only_group and only_group != name:
+            continue
+        print(f"⏱️  {name}...", flush=True)
+        run()
+
+    if args.only:
+        results = {k: v for k, v in results.items() if args.only in k}
+    relative_to(results, calibration)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "profile": args.profile,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": SEED,
+            "dataset": args.dataset or "synthetic",
+        },
+        "calibration": calibration,
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Résultats : {output}")
+
+    if args.save_baseline:
+        # Ratios seulement : les temps absolus ne valent que pour cette machine
+        baseline = {
+            "meta": {k: report["meta"][k] for k in ("timestamp", "profile", "python", "pandas", "numpy", "seed", "dataset")},
+            "results": {case: {"relative": stats["relative"]} for case, stats in results.items()},
+        }
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"📌 Baseline enregistré : {baseline_path}")
+
+    if args.compare:
+        if not os.path.exists(baseline_path):
+            print(f"⚠️ Pas de baseline ({baseline_path}), lancer avec --save-baseline")
+            return 1
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) > {args.tolerance:.0%}")
+            return 1
+        print("\n✅ Aucune régression")
+    else:
+        for case, stats in sorted(results.items()):
+            print(f"{case:<58} {stats['median_s'] * 1000:>10.3f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,14 +2,18 @@ import time
 import threading
 import pandas as pd
 from config import *
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from notifier import send_telegram
 from strategy import apply_indicators, check_signal
 from portfolio import add_position, remove_position, get_positions, lowest_score
 from risk_engine import can_open_trade
+from latency_metrics import get_metrics, PROMETHEUS_CONTENT_TYPE
 
 signals_cache = []
 
+metrics = get_metrics("MULTI_SYMBOL_V4")
+metrics.instrument_exchange(exchange)
+
 app = Flask(__name__)
 
 
@@ -18,6 +22,11 @@ def signals():
     return jsonify(signals_cache[-50:])
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
 def start_api():
 
     print("🌐 API server started on port 5001")
@@ -140,6 +149,8 @@ def bot_loop():
 
     while True:
 
+        cycle_start = time.perf_counter()
+
         positions = get_positions()
 
         for symbol in SYMBOLS:
@@ -148,11 +159,14 @@ def bot_loop():
 
                 print("⏳ Analyse", symbol)
 
-                df = fetch_data(symbol)
+                with metrics.span("fetch", symbol):
+                    df = fetch_data(symbol)
 
-                df = apply_indicators(df)
+                with metrics.span("indicators", symbol):
+                    df = apply_indicators(df)
 
-                signal, score = check_signal(df)
+                with metrics.span("signal", symbol):
+                    signal, score = check_signal(df)
 
                 if signal is None:
                     continue
@@ -185,7 +199,8 @@ def bot_loop():
                 if not can_open_trade(positions, CAPITAL, RISK_PER_TRADE):
                     continue
 
-                open_trade(symbol, signal, price, score)
+                with metrics.span("order", symbol):
+                    open_trade(symbol, signal, price, score)
 
                 signals_cache.append({
                     "symbol": symbol,
@@ -197,6 +212,8 @@ def bot_loop():
 
                 print("Bot error:", e)
 
+        metrics.record_cycle(cycle_start)
+
         time.sleep(120)
 
 
@@ -1,23 +1,32 @@
 import time
 import threading
 import pandas as pd
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 
 from config import *
 from strategy import apply_indicators, check_signal
 from precision import adjust_quantity
 from notifier import send_telegram
+from latency_metrics import get_metrics, PROMETHEUS_CONTENT_TYPE
 
 app = Flask(__name__)
 
 signals_log = []
 
+metrics = get_metrics("MULTI_SYMBOL_V5")
+metrics.instrument_exchange(exchange)
+
 
 @app.route("/api/signals")
 def api_signals():
     return jsonify(signals_log[-50:])
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
 def fetch_ohlcv(symbol):
 
     ohlcv = exchange.fetch_ohlcv(symbol, TIMEFRAME, limit=100)
@@ -105,17 +114,22 @@ def bot_loop():
 
     while True:
 
+        cycle_start = time.perf_counter()
+
         for symbol in SYMBOLS:
 
             try:
 
                 print(f"⏳ Analyse {symbol}")
 
-                df = fetch_ohlcv(symbol)
+                with metrics.span("fetch", symbol):
+                    df = fetch_ohlcv(symbol)
 
-                df = apply_indicators(df)
+                with metrics.span("indicators", symbol):
+                    df = apply_indicators(df)
 
-                signal, score, atr = check_signal(df)
+                with metrics.span("signal", symbol):
+                    signal, score, atr = check_signal(df)
 
                 print(f"🚦 Signal {symbol} = {signal} | Score={score}")
 
@@ -130,7 +144,8 @@ def bot_loop():
 
                 side = "buy" if signal == "long" else "sell"
 
-                place_trade(symbol, side, price, atr, score)
+                with metrics.span("order", symbol):
+                    place_trade(symbol, side, price, atr, score)
 
                 signals_log.append({
                     "symbol": symbol,
@@ -143,6 +158,8 @@ def bot_loop():
 
                 print("Erreur bot:", e)
 
+        metrics.record_cycle(cycle_start)
+
         time.sleep(60)
 
 
@@ -4,12 +4,16 @@ import pandas as pd
 import math
 
 from config import *
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from notifier import send_telegram
 from strategy_v6 import apply_indicators, check_signal
+from latency_metrics import get_metrics, PROMETHEUS_CONTENT_TYPE
 
 signals_cache = []
 
+metrics = get_metrics("MULTI_SYMBOL_V6")
+metrics.instrument_exchange(exchange)
+
 app = Flask(__name__)
 
 
@@ -18,6 +22,11 @@ def signals():
     return jsonify(signals_cache[-50:])
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
 def start_api():
     print("🌐 API server started on port 5001")
     app.run(host="0.0.0.0", port=5001)
@@ -153,17 +162,22 @@ def bot_loop():
 
     while True:
 
+        cycle_start = time.perf_counter()
+
         for symbol in SYMBOLS:
 
             try:
 
                 print("⏳ Analyse", symbol)
 
-                df = fetch_data(symbol)
+                with metrics.span("fetch", symbol):
+                    df = fetch_data(symbol)
 
-                df = apply_indicators(df)
+                with metrics.span("indicators", symbol):
+                    df = apply_indicators(df)
 
-                signal, score, atr = check_signal(df)
+                with metrics.span("signal", symbol):
+                    signal, score, atr = check_signal(df)
 
                 if signal is None:
                     continue
@@ -173,7 +187,8 @@ def bot_loop():
 
                 price = df.close.iloc[-1]
 
-                open_trade(symbol, signal, price, atr, score)
+                with metrics.span("order", symbol):
+                    open_trade(symbol, signal, price, atr, score)
 
                 signals_cache.append({
                     "symbol": symbol,
@@ -185,6 +200,8 @@ def bot_loop():
 
                 print("Bot error:", e)
 
+        metrics.record_cycle(cycle_start)
+
         time.sleep(120)
 
 
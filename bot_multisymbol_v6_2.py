@@ -4,12 +4,16 @@ import pandas as pd
 import math
 
 from config import *
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from notifier import send_telegram
 from strategy_v6 import apply_indicators, check_signal
+from latency_metrics import get_metrics, PROMETHEUS_CONTENT_TYPE
 
 signals_cache = []
 
+metrics = get_metrics("MULTI_SYMBOL_V6_2")
+metrics.instrument_exchange(exchange)
+
 app = Flask(__name__)
 
 last_trade_time = {}
@@ -21,6 +25,11 @@ def signals():
     return jsonify(signals_cache[-50:])
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
 def start_api():
     print("🌐 API server started on port 5001")
     app.run(host="0.0.0.0", port=5001)
@@ -182,6 +191,8 @@ def bot_loop():
 
     while True:
 
+        cycle_start = time.perf_counter()
+
         for symbol in SYMBOLS:
 
             try:
@@ -191,11 +202,14 @@ def bot_loop():
 
                 print("⏳ Analyse", symbol)
 
-                df = fetch_data(symbol)
+                with metrics.span("fetch", symbol):
+                    df = fetch_data(symbol)
 
-                df = apply_indicators(df)
+                with metrics.span("indicators", symbol):
+                    df = apply_indicators(df)
 
-                signal, score, atr = check_signal(df)
+                with metrics.span("signal", symbol):
+                    signal, score, atr = check_signal(df)
 
                 if signal is None:
                     continue
@@ -205,7 +219,8 @@ def bot_loop():
 
                 price = df.close.iloc[-1]
 
-                open_trade(symbol, signal, price, atr, score)
+                with metrics.span("order", symbol):
+                    open_trade(symbol, signal, price, atr, score)
 
                 signals_cache.append({
                     "symbol": symbol,
@@ -217,6 +232,8 @@ def bot_loop():
 
                 print("Bot error:", e)
 
+        metrics.record_cycle(cycle_start)
+
         time.sleep(120)
 
 
@@ -4,11 +4,14 @@ import pandas as pd
 import math
 import os
 import json
+import sys
+import atexit
+import subprocess
 import pytz
 from datetime import datetime
 
 from config import *
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from notifier import send_telegram
 from strategy_v9_scalper import apply_indicators as apply_v9, check_signal as check_v9
 from strategy_v7_robust import apply_indicators as apply_v7, check_signal as check_v7
@@ -21,6 +24,12 @@ from strategy_scalping_5m import (
 )
 from auto_tuner import AutoTuner
 from logger_enhanced import get_logger
+from state_snapshot import SnapshotWriter
+from latency_metrics import get_metrics, PROMETHEUS_CONTENT_TYPE
+from loop_profiler import LoopProfiler
+from bar_scheduler import BarScheduler
+from order_book import OrderBookRegistry
+from trade_bars import TradeBarFeed, SUB_MINUTE_TIMEFRAMES
 
 # ── Timezone Paris pour la session américaine (14h30-20h00) ──────────────────
 PARIS_TZ = pytz.timezone("Europe/Paris")
@@ -30,6 +39,9 @@ SNIPER_SESSION_END   = (20,  0)   # 20h00 Paris
 # ================= CONFIGURATION =================
 BOT_NAME = "MULTI_SYMBOL_V6_3"
 logger = get_logger(BOT_NAME)
+metrics = get_metrics(BOT_NAME)
+metrics.instrument_exchange(exchange)
+profiler = LoopProfiler(BOT_NAME)
 signals_cache = []
 
 app = Flask(__name__)
@@ -39,6 +51,32 @@ active_positions = {} # {symbol: trade_data}
 
 # Active Strategy Settings
 ACTIVE_STRATEGY = os.getenv("ACTIVE_STRATEGY", "scalping_5m")
+
+# Timeframe du scalping_5m : 5s / 15s / 30s = bougies construites depuis les
+# trades publics (trade_bars), sinon klines de l'exchange
+SCALP_TIMEFRAME = os.getenv("SCALP_TIMEFRAME", "5m")
+trade_bars = TradeBarFeed(exchange, SYMBOLS, (SCALP_TIMEFRAME,)) if SCALP_TIMEFRAME in SUB_MINUTE_TIMEFRAMES else None
+
+# Timeframes dont la clôture déclenche un cycle (les autres stratégies : TIMEFRAME)
+STRATEGY_TIMEFRAMES = {
+    'sniper_ote':  ('1m', '4h'),
+    'scalping_5m': (SCALP_TIMEFRAME,),
+}
+
+def strategy_timeframes(strategy):
+    return STRATEGY_TIMEFRAMES.get(strategy, (TIMEFRAME,))
+
+scheduler = BarScheduler(exchange)
+# Le scan attend la clôture des bougies ; les positions ouvertes sont resynchronisées
+# avec l'exchange entre deux clôtures, au plus toutes les POSITION_CHECK_SECONDS
+POSITION_CHECK_SECONDS = float(os.getenv("POSITION_CHECK_SECONDS", "5"))
+
+# Carnets L2 locaux : taille plafonnée à la liquidité disponible à l'entrée
+# (VWAP de l'ordre market à moins de ORDER_BOOK_MAX_SLIPPAGE_BPS du meilleur prix).
+# Désactivé par défaut : un fetch_order_book REST de plus par entrée
+ORDER_BOOK_SIZING = os.getenv("ORDER_BOOK_SIZING", "0") == "1"
+ORDER_BOOK_MAX_SLIPPAGE_BPS = float(os.getenv("ORDER_BOOK_MAX_SLIPPAGE_BPS", "10"))
+order_books = OrderBookRegistry(exchange)
 CURRENT_SL_MULTI = SL_ATR_MULTIPLIER
 CURRENT_TP_MULTI = TP_ATR_MULTIPLIER
 CURRENT_THRESHOLD = SCORE_THRESHOLD
@@ -52,7 +90,54 @@ last_state_save = datetime.now().date().isoformat()
 
 STATE_FILE = "data/multisymbol_state.json"
 
+# API_MODE=thread  : serveur Flask de dev dans un thread du bot (historique)
+# API_MODE=process : serveur gunicorn multi-workers dans un processus séparé,
+#                    qui lit le snapshot SQLite publié par le bot
+API_MODE = os.getenv("API_MODE", "thread").lower()
+API_PORT = int(os.getenv("API_PORT", "5001"))
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+# Le snapshot n'est sinon publié qu'aux sauvegardes (une fois par bougie au mieux) :
+# le heartbeat garde /api/health sous SNAPSHOT_STALE_SECONDS quel que soit le timeframe
+SNAPSHOT_HEARTBEAT_SECONDS = float(os.getenv("SNAPSHOT_HEARTBEAT_SECONDS", "30"))
+snapshot = SnapshotWriter(BOT_NAME) if API_MODE == "process" else None
+
+def publish_snapshot():
+    """
+    Publie l'état lu par le serveur API externe (API_MODE=process).
+    Appelé depuis bot_loop uniquement : active_positions et signals_cache
+    y sont modifiés sans verrou.
+    """
+    if snapshot is None:
+        return
+    try:
+        snapshot.publish(
+            signals=signals_cache[-50:],
+            status=build_status(),
+            positions=list(active_positions.values()),
+            metrics=metrics.render_prometheus(),
+            profile=profiler.status(),
+        )
+    except Exception as e:
+        logger.log_error("Error publishing API snapshot", e)
+
+def snapshot_heartbeat():
+    """
+    Republie le dernier snapshot de bot_loop à intervalle fixe, entre deux
+    sauvegardes, sans relire l'état du bot ; seuls les métriques et l'état du
+    profileur (protégés par leurs verrous) sont rafraîchis
+    """
+    while True:
+        time.sleep(SNAPSHOT_HEARTBEAT_SECONDS)
+        try:
+            snapshot.republish(metrics=metrics.render_prometheus(), profile=profiler.status())
+        except Exception as e:
+            logger.log_error("Error republishing API snapshot", e)
+
 def save_state():
+    with metrics.span("save_state"):
+        _save_state()
+
+def _save_state():
     state = {
         "daily_pnl": daily_pnl,
         "total_trades": total_trades,
@@ -66,6 +151,7 @@ def save_state():
             json.dump(state, f)
     except Exception as e:
         logger.log_error("Error saving state", e)
+    publish_snapshot()
 
 def load_state():
     global daily_pnl, total_trades, consecutive_losses, last_state_save, signals_cache
@@ -97,10 +183,8 @@ def signals():
     """Endpoint pour le dashboard"""
     return jsonify(signals_cache[-50:])
 
-@app.route("/api/status")
-def status():
-    """État du bot"""
-    return jsonify({
+def build_status():
+    return {
         "bot": BOT_NAME,
         "symbols": SYMBOLS,
         "active_strategy": ACTIVE_STRATEGY,
@@ -111,8 +195,15 @@ def status():
         "leverage": LEVERAGE,
         "active_count": len(active_positions),
         "daily_pnl": daily_pnl,
-        "total_trades": total_trades
-    })
+        "total_trades": total_trades,
+        "order_books": order_books.status(),
+        "trade_bars": trade_bars.status() if trade_bars else None
+    }
+
+@app.route("/api/status")
+def status():
+    """État du bot"""
+    return jsonify(build_status())
 
 @app.route("/api/trades")
 def trades():
@@ -125,15 +216,77 @@ def positions():
     # On rafraîchit la liste avec Bybit pour être sûr
     return jsonify(list(active_positions.values()))
 
+@app.route("/metrics")
+def prometheus_metrics():
+    """Latences du hot-path, appels REST et durée de cycle (format Prometheus)"""
+    return Response(metrics.render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+@app.route("/api/profile")
+def profile():
+    """
+    Profil par échantillonnage de bot_loop à la demande.
+    GET /api/profile?seconds=30&hz=100 lance une capture (fichier .folded dans logs/),
+    GET /api/profile?status=1 retourne l'état de la capture.
+    """
+    if request.args.get("status"):
+        return jsonify(profiler.status())
+    try:
+        started = profiler.start(
+            seconds=request.args.get("seconds", 30),
+            hz=request.args.get("hz", 100),
+        )
+    except (RuntimeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not started:
+        return jsonify({"error": "capture déjà en cours", **profiler.status()}), 409
+    return jsonify(profiler.status())
+
 def start_api():
-    print(f"🌐 {BOT_NAME} API server started on port 5001")
+    print(f"🌐 {BOT_NAME} API server started on port {API_PORT}")
     try:
-        app.run(host="0.0.0.0", port=5001)
+        app.run(host="0.0.0.0", port=API_PORT)
     except Exception as e:
         logger.log_error("API server error", e)
 
+def start_api_process():
+    """
+    Lance le serveur API en lecture seule (api_server.py) dans un processus
+    gunicorn séparé. Retourne le Popen, ou None si gunicorn est indisponible
+    (le bot repasse alors en mode thread).
+    """
+    # BOT_PID : /api/profile déclenche la capture par SIGUSR1 (loop_profiler)
+    env = dict(os.environ, BOT_NAME=BOT_NAME, BOT_PID=str(os.getpid()))
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-w", str(API_WORKERS),
+        "-b", f"0.0.0.0:{API_PORT}",
+        "--access-logfile", "-",
+        "api_server:app",
+    ]
+    try:
+        proc = subprocess.Popen(cmd, env=env)
+        time.sleep(1)
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        print(f"🌐 {BOT_NAME} API process started (gunicorn, {API_WORKERS} workers, port {API_PORT})")
+        return proc
+    except Exception as e:
+        logger.log_error("API process start error, falling back to thread mode", e)
+        return None
+
 # ================= FETCH DATA =================
 
+def closed_candles(df):
+    """
+    Bougies closes uniquement quand le cycle est aligné sur les clôtures :
+    le scheduler réveille la boucle BAR_CLOSE_GRACE_MS après la clôture, la
+    dernière bougie de fetch_ohlcv vient alors d'ouvrir et est quasi vide
+    (volume, range). Sans scheduler (polling fixe) on garde la bougie en cours.
+    """
+    if scheduler.enabled and not df.empty:
+        return df.iloc[:-1].reset_index(drop=True)
+    return df
+
 def fetch_data(symbol):
     try:
         ohlcv = exchange.fetch_ohlcv(symbol, TIMEFRAME, limit=200)
@@ -141,7 +294,7 @@ def fetch_data(symbol):
             ohlcv,
             columns=["time", "open", "high", "low", "close", "volume"]
         )
-        return df
+        return closed_candles(df)
     except Exception as e:
         logger.log_error(f"Fetch data error {symbol}", e)
         return pd.DataFrame()
@@ -151,7 +304,7 @@ def fetch_data_m1(symbol):
     """Données M1 pour l'exécution Sniper OTE"""
     try:
         ohlcv = exchange.fetch_ohlcv(symbol, '1m', limit=100)
-        return pd.DataFrame(ohlcv, columns=["time", "open", "high", "low", "close", "volume"])
+        return closed_candles(pd.DataFrame(ohlcv, columns=["time", "open", "high", "low", "close", "volume"]))
     except Exception as e:
         logger.log_error(f"Fetch M1 error {symbol}", e)
         return pd.DataFrame()
@@ -161,17 +314,27 @@ def fetch_data_h4(symbol):
     """Données H4 pour l'analyse macro Dow Theory"""
     try:
         ohlcv = exchange.fetch_ohlcv(symbol, '4h', limit=50)
-        return pd.DataFrame(ohlcv, columns=["time", "open", "high", "low", "close", "volume"])
+        return closed_candles(pd.DataFrame(ohlcv, columns=["time", "open", "high", "low", "close", "volume"]))
     except Exception as e:
         logger.log_error(f"Fetch H4 error {symbol}", e)
         return pd.DataFrame()
 
 
 def fetch_data_5m(symbol):
-    """Données 5M pour la stratégie Scalping 5M (besoin de 200 bougies)"""
+    """Données SCALP_TIMEFRAME (5m par défaut) pour la stratégie Scalping 5M (besoin de 200 bougies)"""
+    if trade_bars is not None:
+        # Flux démarré au premier appel (stratégie active) ; historique vide au départ
+        trade_bars.start()
+        if scheduler.enabled:
+            # Réveil à la clôture + BAR_CLOSE_GRACE_MS : la bougie qui vient de clôturer
+            # est fermée tout de suite (sans attendre le prochain poll) et seules les
+            # bougies closes sont évaluées
+            trade_bars.close_due(scheduler.now_ms() - scheduler.grace_ms)
+        frame = trade_bars.frame(symbol, SCALP_TIMEFRAME, include_forming=not scheduler.enabled)
+        return frame.rename(columns={"timestamp": "time"})
     try:
-        ohlcv = exchange.fetch_ohlcv(symbol, '5m', limit=200)
-        return pd.DataFrame(ohlcv, columns=["time", "open", "high", "low", "close", "volume"])
+        ohlcv = exchange.fetch_ohlcv(symbol, SCALP_TIMEFRAME, limit=200)
+        return closed_candles(pd.DataFrame(ohlcv, columns=["time", "open", "high", "low", "close", "volume"]))
     except Exception as e:
         logger.log_error(f"Fetch 5M error {symbol}", e)
         return pd.DataFrame()
@@ -192,7 +355,20 @@ def is_sniper_session():
 
 # ================= POSITION SIZE =================
 
-def calculate_position_size(price, stop_distance, capital=None):
+def liquidity_cap(symbol, side):
+    """Quantité max exécutable au market sans dépasser ORDER_BOOK_MAX_SLIPPAGE_BPS, None si pas de carnet"""
+    if not ORDER_BOOK_SIZING or symbol is None or side is None:
+        return None
+    try:
+        book = order_books.book(symbol)
+    except Exception as e:
+        logger.log_error(f"Order book error {symbol}", e)
+        return None
+    if book is None:
+        return None
+    return book.max_qty(side, ORDER_BOOK_MAX_SLIPPAGE_BPS)
+
+def calculate_position_size(price, stop_distance, capital=None, symbol=None, side=None):
     if stop_distance <= 0:
         return None
 
@@ -208,11 +384,17 @@ def calculate_position_size(price, stop_distance, capital=None):
     if qty > max_qty:
         qty = max_qty
 
+    liquid_qty = liquidity_cap(symbol, side)
+    if liquid_qty is not None and qty > liquid_qty:
+        print(f"💧 {symbol} Taille plafonnée par le carnet: {qty:.6f} → {liquid_qty:.6f} "
+              f"(VWAP ≤ {ORDER_BOOK_MAX_SLIPPAGE_BPS} bps du meilleur prix)")
+        qty = liquid_qty
+
     return qty
 
 # ================= PRECISION FIX =================
 
-def adjust_qty(symbol, qty, price):
+def adjust_qty(symbol, qty, price, side=None):
     try:
         market = exchange.market(symbol)
         min_amount = market["limits"]["amount"]["min"]
@@ -222,13 +404,20 @@ def adjust_qty(symbol, qty, price):
             precision = abs(int(round(-math.log10(precision))))
 
         qty = round(qty, precision)
-
-        if qty < min_amount:
+        if qty < min_amount or qty * price < 5:
+            # Bybit : minimum order value 5 USDT
             return None
 
-        # Bybit : minimum order value 5 USDT
-        if qty * price < 5:
-            return None
+        # L'arrondi ne doit pas repasser au-dessus de la liquidité du carnet
+        liquid_qty = liquidity_cap(symbol, side)
+        if liquid_qty is not None and qty > liquid_qty:
+            qty = math.floor(liquid_qty * 10 ** precision) / 10 ** precision
+            if qty < min_amount or qty * price < 5:
+                # Le plafond de liquidité, pas le capital, empêche l'entrée
+                print(f"💧 {symbol} Entrée refusée par le carnet: {liquid_qty:.6f} exécutable à "
+                      f"{ORDER_BOOK_MAX_SLIPPAGE_BPS} bps du meilleur prix, sous le minimum "
+                      f"({min_amount} / 5 USDT)", flush=True)
+                return None
 
         return qty
 
@@ -257,15 +446,20 @@ def has_open_position(symbol, ignore_cache=False):
         
         if is_open:
             # On en profite pour remettre à jour notre cache si besoin
-            active_positions[symbol] = {
+            # (mise à jour en place : on garde stratégie, fill et MFE/MAE)
+            cached = active_positions.get(symbol, {})
+            cached.update({
                 "symbol": symbol,
                 "side": pos.get('side'),
                 "entry_price": pos.get('entryPrice'),
                 "qty": pos.get('contracts'),
                 "pnl_percent": pos.get('percentage'),
                 "pnl_usdt": pos.get('unrealizedPnl'),
-                "timestamp": datetime.now().isoformat()
-            }
+            })
+            cached.setdefault("timestamp", datetime.now().isoformat())
+            if pos.get('markPrice'):
+                update_excursions(cached, float(pos['markPrice']))
+            active_positions[symbol] = cached
             return True
         else:
             # Si pas de position sur l'échange, on s'assure de nettoyer le cache
@@ -285,12 +479,15 @@ def handle_position_closed(symbol):
         pos_entry      = cached.get('entry_price', 0)
         pos_qty        = cached.get('qty', 0)
         pos_strategy   = cached.get('strategy', 'unknown')
+        pos_entry_ts   = cached.get('entry_ts')
 
         # Retry avec délai croissant — Bybit enregistre le PnL avec un léger délai
         # après la fermeture par trailing stop (asynchrone côté serveur)
         clean_symbol = symbol.split(':')[0].replace('/', '')
         pnl = 0.0
         exit_price = 0.0
+        exit_order_id = None
+        exit_ms = None
 
         for attempt in range(4):                        # 4 tentatives max
             wait = [3, 5, 8, 12][attempt]              # 3s → 5s → 8s → 12s
@@ -306,6 +503,8 @@ def handle_position_closed(symbol):
                     data       = pnl_resp['result']['list'][0]
                     pnl        = float(data.get('closedPnl', 0))
                     exit_price = float(data.get('avgExitPrice') or data.get('avgPrice', 0))
+                    exit_order_id = data.get('orderId')
+                    exit_ms = int(data.get('updatedTime') or 0) or None
                     if pnl != 0.0:
                         print(f"✅ {symbol} - PnL récupéré à la tentative {attempt+1}: {pnl:.2f} USDT", flush=True)
                         break
@@ -328,6 +527,20 @@ def handle_position_closed(symbol):
         else:
             consecutive_losses = 0
 
+        # MFE/MAE : plus hauts / plus bas de chaque bougie 1m de la vie du trade
+        # (le scan n'échantillonne la position qu'une fois par bougie)
+        update_excursions_from_candles(symbol, cached, exit_ms)
+        if exit_price > 0:
+            update_excursions(cached, exit_price)
+
+        # Frais : entrée (record_execution) + exécution de clôture
+        exit_fee = None
+        if exit_order_id:
+            _, exit_fee, _ = fetch_fill(symbol, {'id': exit_order_id})
+        if exit_fee is None and exit_price > 0 and pos_qty:
+            exit_fee = exit_price * float(pos_qty) * TAKER_FEE_RATE
+        commission = cached.get('commission_paid', 0) + (exit_fee or 0)
+
         result = "WIN" if pnl > 0 else ("LOSS" if pnl < 0 else "UNKNOWN")
         print(f"💰 {symbol} [{pos_side.upper()}] {result} | PnL: {pnl:.2f} USDT | Jour: {daily_pnl:.2f} USDT")
         save_state()
@@ -344,6 +557,11 @@ def handle_position_closed(symbol):
             'result':       result,
             'exit_reason':  'Exchange closed (SL/TP/Trailing)',
             'strategy':     pos_strategy,
+            'duration_seconds':    round(time.time() - pos_entry_ts) if pos_entry_ts else 0,
+            'max_favorable_price': cached.get('max_favorable_price', 0),
+            'max_adverse_price':   cached.get('max_adverse_price', 0),
+            'slippage_bps':        cached.get('slippage_bps', 0),
+            'commission_paid':     round(commission, 6),
         }
         logger.log_trade_detailed(trade_data)
 
@@ -376,6 +594,147 @@ def set_trailing_stop(symbol, distance, activation_price=None):
         logger.log_error(f"Trailing Stop Error {symbol}", e)
         return False
 
+# ================= EXECUTION TRACKING =================
+
+# Frais taker Bybit (utilisé si les frais réels de l'exécution sont indisponibles)
+TAKER_FEE_RATE = float(os.getenv("TAKER_FEE_RATE", "0.00075"))
+
+def now_ms():
+    return int(time.time() * 1000)
+
+def last_candle_close_ms(df, timeframe):
+    """
+    Heure de clôture (ms) de la dernière bougie close utilisée pour le signal.
+    Sans scheduler, la dernière bougie renvoyée par fetch_ohlcv est en cours de
+    formation : sa clôture est dans le futur, on prend alors celle de la précédente.
+    Avec le scheduler, closed_candles l'a déjà retirée.
+    """
+    if df is None or df.empty:
+        return None
+    tf_ms = exchange.parse_timeframe(timeframe) * 1000
+    bar_close = int(df['time'].iloc[-1]) + tf_ms
+    return bar_close if bar_close <= now_ms() else bar_close - tf_ms
+
+def fetch_fill(symbol, order):
+    """
+    Prix moyen, frais et heure de fill d'un ordre market via la liste
+    d'exécutions Bybit V5. Retourne (fill_price, commission, fill_ms),
+    éléments à None si indisponibles.
+    """
+    order_id = (order or {}).get('id')
+    fill_price = (order or {}).get('average')
+    if not order_id:
+        return fill_price, None, None
+    try:
+        resp = exchange.private_get_v5_execution_list({
+            "category": "linear",
+            "symbol":   symbol.split(':')[0].replace('/', ''),
+            "orderId":  order_id,
+        })
+        execs = resp.get('result', {}).get('list', [])
+        filled_qty = sum(float(e.get('execQty', 0)) for e in execs)
+        if filled_qty > 0:
+            fill_price = sum(float(e['execPrice']) * float(e['execQty']) for e in execs) / filled_qty
+            commission = sum(float(e.get('execFee', 0)) for e in execs)
+            fill_ms = max(int(e.get('execTime', 0)) for e in execs)
+            return fill_price, commission, fill_ms
+    except Exception as e:
+        logger.log_error(f"Error fetching executions {symbol}", e)
+    return fill_price, None, None
+
+def record_execution(symbol, side, signal_price, qty, order, timing):
+    """
+    Mesure le chemin clôture bougie → signal → envoi → fill d'une entrée :
+    slippage vs prix du signal (bps, positif = défavorable), frais réels,
+    latences. Logue dans logs/executions.csv et dans les métriques.
+    """
+    fill_price, commission, fill_ms = fetch_fill(symbol, order)
+    fill_price = float(fill_price or signal_price)
+    fill_ms = fill_ms or timing.get('ack_ms')
+    if commission is None:
+        commission = fill_price * qty * TAKER_FEE_RATE
+
+    direction = 1 if side == 'long' else -1
+    slippage_bps = direction * (fill_price - signal_price) / signal_price * 10000 if signal_price else 0.0
+
+    candle_ms = timing.get('candle_close_ms')
+    signal_ms = timing.get('signal_ms')
+    sent_ms = timing.get('order_sent_ms')
+
+    def delta(start, end):
+        return end - start if start is not None and end is not None else ''
+
+    def iso(ms):
+        return datetime.fromtimestamp(ms / 1000).isoformat() if ms else ''
+
+    execution = {
+        'symbol':              symbol,
+        'side':                side,
+        'order_id':            (order or {}).get('id', ''),
+        'signal_price':        signal_price,
+        'fill_price':          fill_price,
+        'slippage_bps':        round(slippage_bps, 2),
+        'commission_paid':     round(commission, 6),
+        'candle_close_time':   iso(candle_ms),
+        'signal_time':         iso(signal_ms),
+        'order_sent_time':     iso(sent_ms),
+        'fill_time':           iso(fill_ms),
+        'candle_to_signal_ms': delta(candle_ms, signal_ms),
+        'signal_to_send_ms':   delta(signal_ms, sent_ms),
+        'send_to_fill_ms':     delta(sent_ms, fill_ms),
+        'candle_to_fill_ms':   delta(candle_ms, fill_ms),
+    }
+    logger.log_execution(execution)
+
+    if signal_ms and fill_ms:
+        metrics.observe("bot_signal_to_fill_seconds", (fill_ms - signal_ms) / 1000, symbol=symbol)
+    if candle_ms and fill_ms:
+        metrics.observe("bot_candle_to_fill_seconds", (fill_ms - candle_ms) / 1000, symbol=symbol)
+    metrics.observe("bot_entry_slippage_bps", slippage_bps, symbol=symbol)
+
+    print(f"⏱️ {symbol} fill {fill_price:.4f} vs signal {signal_price:.4f} | "
+          f"slippage {slippage_bps:+.1f} bps | clôture→fill {execution['candle_to_fill_ms'] or '?'} ms")
+    return execution
+
+def update_excursions(position, price):
+    """Met à jour le prix le plus favorable (MFE) et le plus défavorable (MAE) d'une position ouverte"""
+    entry = position.get('fill_price') or position.get('entry_price')
+    if not entry or not price:
+        return
+    mfe = position.get('max_favorable_price') or entry
+    mae = position.get('max_adverse_price') or entry
+    if position.get('side') == 'long':
+        position['max_favorable_price'] = max(mfe, price)
+        position['max_adverse_price']   = min(mae, price)
+    else:
+        position['max_favorable_price'] = min(mfe, price)
+        position['max_adverse_price']   = max(mae, price)
+
+def update_excursions_from_candles(symbol, position, exit_ms=None):
+    """
+    MFE/MAE sur les plus hauts / plus bas des bougies 1m entières entre
+    l'entrée et la sortie (1000 premières minutes du trade)
+    """
+    entry_ts = position.get('entry_ts')
+    if not entry_ts:
+        return
+    minute_ms = 60_000
+    exit_ms = exit_ms or now_ms()
+    # Première minute entière après l'entrée : la bougie d'entrée contient des prix antérieurs au fill
+    since = (int(entry_ts * 1000) // minute_ms + 1) * minute_ms
+    if since + minute_ms > exit_ms:
+        return
+    try:
+        candles = exchange.fetch_ohlcv(symbol, '1m', since=since, limit=1000)
+    except Exception as e:
+        logger.log_error(f"Error fetching candles for MFE/MAE {symbol}", e)
+        return
+    for ts, _, high, low, _, _ in candles:
+        if ts + minute_ms > exit_ms:
+            break
+        update_excursions(position, float(high))
+        update_excursions(position, float(low))
+
 # ================= OPEN TRADE =================
 
 def get_base_currency(symbol):
@@ -438,7 +797,7 @@ def get_available_balance():
     return None
 
 
-def open_trade(symbol, side, price, atr, score):
+def open_trade(symbol, side, price, atr, score, timing=None):
     # Sécurité ultime : On ne rentre pas si déjà en position
     if has_open_position(symbol):
         print(f"🚫 {symbol} déjà en position, ouverture annulée.")
@@ -475,11 +834,11 @@ def open_trade(symbol, side, price, atr, score):
     sl_dist = max(atr * CURRENT_SL_MULTI, min_sl_dist)
     tp_dist = max(atr * CURRENT_TP_MULTI, min_tp_dist)
 
-    qty = calculate_position_size(price, sl_dist, capital=effective_capital)
+    qty = calculate_position_size(price, sl_dist, capital=effective_capital, symbol=symbol, side=side)
     if qty is None:
         return
 
-    qty = adjust_qty(symbol, qty, price)
+    qty = adjust_qty(symbol, qty, price, side)
     if qty is None:
         print(f"⚠️ {symbol} Qty too small after adjustment (capital: {effective_capital:.2f} USDT)")
         last_trade_time[symbol] = time.time()
@@ -528,6 +887,8 @@ def open_trade(symbol, side, price, atr, score):
             "positionIdx": 0
         }
 
+        timing = dict(timing or {})
+        timing['order_sent_ms'] = now_ms()
         order = exchange.create_order(
             symbol,
             "market",
@@ -536,23 +897,30 @@ def open_trade(symbol, side, price, atr, score):
             None,
             params
         )
+        timing['ack_ms'] = now_ms()
 
         # Activer le Trailing Stop avec prix d'activation
         set_trailing_stop(symbol, trailing_distance, activation_price)
 
         last_trade_time[symbol] = time.time()
+
+        # Fill réel, slippage et latences (après le délai du trailing stop,
+        # les exécutions sont normalement déjà disponibles chez Bybit)
+        execution = record_execution(symbol, side, price, qty, order, timing)
         
         trade_data = {
             'timestamp':             datetime.now().isoformat(),
             'bot_name':              BOT_NAME,
             'symbol':                symbol,
             'side':                  side,
-            'entry_price':           price,
+            'entry_price':           execution['fill_price'],
             'quantity':              qty,
             'result':                'OPEN',
             'exit_reason':           'position opened',
             'entry_signal_strength': score,
             'entry_atr_percent':     (atr / price),
+            'slippage_bps':          execution['slippage_bps'],
+            'commission_paid':       execution['commission_paid'],
         }
         logger.log_trade_detailed(trade_data)
         
@@ -561,8 +929,14 @@ def open_trade(symbol, side, price, atr, score):
             "symbol": symbol,
             "side": side,
             "entry_price": price,
+            "fill_price": execution['fill_price'],
             "qty": qty,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "entry_ts": time.time(),
+            "slippage_bps": execution['slippage_bps'],
+            "commission_paid": execution['commission_paid'],
+            "max_favorable_price": execution['fill_price'],
+            "max_adverse_price": execution['fill_price'],
         }
 
         msg = f"🟢 TRADE OPEN {BOT_NAME}\n\nSymbol: {symbol}\nSide: {side.upper()}\nScore: {score}/3\nPrice: {price:.2f}\nSL: {sl:.2f}\nTP: {tp:.2f}\nQty: {qty}"
@@ -578,7 +952,7 @@ def open_trade(symbol, side, price, atr, score):
 
 # ================= OPEN TRADE SNIPER ================
 
-def open_trade_sniper(symbol, side, price, sl_distance, score):
+def open_trade_sniper(symbol, side, price, sl_distance, score, timing=None):
     """
     Ouvre un trade Sniper OTE :
       - SL : distance structurelle passée en paramètre (mèches incluses)
@@ -613,11 +987,11 @@ def open_trade_sniper(symbol, side, price, sl_distance, score):
     sl_dist = max(sl_distance, min_sl)
     tp_dist = sl_dist * SNIPER_RR   # RR 2.0
 
-    qty = calculate_position_size(price, sl_dist, capital=effective_capital)
+    qty = calculate_position_size(price, sl_dist, capital=effective_capital, symbol=symbol, side=side)
     if qty is None:
         return
 
-    qty = adjust_qty(symbol, qty, price)
+    qty = adjust_qty(symbol, qty, price, side)
     if qty is None:
         print(f"⚠️ {symbol} Sniper: qty trop petite après ajustement (capital: {effective_capital:.2f} USDT)")
         last_trade_time[symbol] = time.time()
@@ -650,19 +1024,30 @@ def open_trade_sniper(symbol, side, price, sl_distance, score):
             "positionIdx":  0,
         }
 
+        timing = dict(timing or {})
+        timing['order_sent_ms'] = now_ms()
         order = exchange.create_order(symbol, "market", order_side, qty, None, params)
+        timing['ack_ms'] = now_ms()
 
         set_trailing_stop(symbol, trailing_distance, activation_price)
 
         last_trade_time[symbol] = time.time()
 
+        execution = record_execution(symbol, side, price, qty, order, timing)
+
         active_positions[symbol] = {
-            "symbol":      symbol,
-            "side":        side,
-            "entry_price": price,
-            "qty":         qty,
-            "timestamp":   datetime.now().isoformat(),
-            "strategy":    "sniper_ote",
+            "symbol":              symbol,
+            "side":                side,
+            "entry_price":         price,
+            "fill_price":          execution['fill_price'],
+            "qty":                 qty,
+            "timestamp":           datetime.now().isoformat(),
+            "entry_ts":            time.time(),
+            "strategy":            "sniper_ote",
+            "slippage_bps":        execution['slippage_bps'],
+            "commission_paid":     execution['commission_paid'],
+            "max_favorable_price": execution['fill_price'],
+            "max_adverse_price":   execution['fill_price'],
         }
 
         trade_data = {
@@ -670,12 +1055,14 @@ def open_trade_sniper(symbol, side, price, sl_distance, score):
             'bot_name':              BOT_NAME,
             'symbol':                symbol,
             'side':                  side,
-            'entry_price':           price,
+            'entry_price':           execution['fill_price'],
             'quantity':              qty,
             'result':                'OPEN',
             'exit_reason':           'position opened',
             'entry_signal_strength': score,
             'strategy':              'sniper_ote',
+            'slippage_bps':          execution['slippage_bps'],
+            'commission_paid':       execution['commission_paid'],
         }
         logger.log_trade_detailed(trade_data)
 
@@ -736,11 +1123,13 @@ def bot_loop():
     
     tuner = AutoTuner(exchange, logger)
     LAST_TUNE_TRADES = total_trades
+    profiler.attach()
+    profiler.install_signal_handler()
     
     send_telegram(
         f"🚀 {BOT_NAME} STARTED\n"
         f"Stratégie: {ACTIVE_STRATEGY}\n"
-        f"Symbols: {len(SYMBOLS)} | TF: {'5m' if ACTIVE_STRATEGY == 'scalping_5m' else TIMEFRAME}\n"
+        f"Symbols: {len(SYMBOLS)} | TF: {SCALP_TIMEFRAME if ACTIVE_STRATEGY == 'scalping_5m' else TIMEFRAME}\n"
         f"SL: {CURRENT_SL_MULTI}×ATR | TP: {CURRENT_TP_MULTI}×ATR | Threshold: {CURRENT_THRESHOLD}\n"
         f"Risk guards: -{MAX_DAILY_LOSS_PCT}%/jour | {MAX_CONSECUTIVE_LOSSES} pertes consécutives max"
     )
@@ -750,6 +1139,8 @@ def bot_loop():
     _risk_pause_reason = ""
 
     while True:
+        cycle_start = time.perf_counter()
+
         # ── Guards de risque journalier ──────────────────────────────────────
         blocked, reason = check_risk_limits()
         if blocked:
@@ -772,7 +1163,8 @@ def bot_loop():
                 if not cooldown_ok(symbol):
                     continue
 
-                df = fetch_data(symbol)
+                with metrics.span("fetch", symbol):
+                    df = fetch_data(symbol)
                 if df.empty:
                     continue
 
@@ -788,19 +1180,26 @@ def bot_loop():
                         time.sleep(0.2)
                         continue
 
-                    df_m1 = fetch_data_m1(symbol)
-                    df_h4 = fetch_data_h4(symbol)
+                    with metrics.span("fetch", symbol):
+                        df_m1 = fetch_data_m1(symbol)
+                        df_h4 = fetch_data_h4(symbol)
                     if df_m1.empty or df_h4.empty:
                         continue
 
-                    signal, score, sl_distance = check_sniper(df_m1, df_h4)
+                    with metrics.span("signal", symbol):
+                        signal, score, sl_distance = check_sniper(df_m1, df_h4, symbol)
+                    timing = {
+                        'candle_close_ms': last_candle_close_ms(df_m1, '1m'),
+                        'signal_ms':       now_ms(),
+                    }
                     price = float(df_m1['close'].iloc[-1])
                     atr   = sl_distance  # pour le logging
                     reason = ""
 
                     if signal:
                         if score >= CURRENT_THRESHOLD:
-                            open_trade_sniper(symbol, signal, price, sl_distance, score)
+                            with metrics.span("order", symbol):
+                                open_trade_sniper(symbol, signal, price, sl_distance, score, timing)
                             executed = True
                         else:
                             reason = f"Score insuffisant ({score}/{CURRENT_THRESHOLD})"
@@ -810,29 +1209,43 @@ def bot_loop():
                         executed = False
 
                 elif ACTIVE_STRATEGY == 'scalping_5m':
-                    df5m = fetch_data_5m(symbol)
+                    with metrics.span("fetch", symbol):
+                        df5m = fetch_data_5m(symbol)
                     if df5m.empty:
                         continue
-                    df5m = apply_scalp5m(df5m)
-                    signal, score, atr = check_scalp5m(df5m)
+                    with metrics.span("indicators", symbol):
+                        df5m = apply_scalp5m(df5m)
+                    with metrics.span("signal", symbol):
+                        signal, score, atr = check_scalp5m(df5m)
                     df = df5m  # use 5m df for price below
                 elif ACTIVE_STRATEGY == 'v9_scalper':
-                    df = apply_v9(df)
-                    signal, score, atr = check_v9(df)
+                    with metrics.span("indicators", symbol):
+                        df = apply_v9(df)
+                    with metrics.span("signal", symbol):
+                        signal, score, atr = check_v9(df)
                 elif ACTIVE_STRATEGY == 'v6_aggressive':
-                    df = apply_v6(df)
-                    signal, score, atr = check_v6(df)
+                    with metrics.span("indicators", symbol):
+                        df = apply_v6(df)
+                    with metrics.span("signal", symbol):
+                        signal, score, atr = check_v6(df)
                 else:  # Default robust v7
-                    df = apply_v7(df)
-                    signal, score, atr = check_v7(df)
+                    with metrics.span("indicators", symbol):
+                        df = apply_v7(df)
+                    with metrics.span("signal", symbol):
+                        signal, score, atr = check_v7(df)
 
                 if ACTIVE_STRATEGY != 'sniper_ote':
+                    timing = {
+                        'candle_close_ms': last_candle_close_ms(df, SCALP_TIMEFRAME if ACTIVE_STRATEGY == 'scalping_5m' else TIMEFRAME),
+                        'signal_ms':       now_ms(),
+                    }
                     price = df.close.iloc[-1]
                     reason = ""
 
                     if signal:
                         if score >= CURRENT_THRESHOLD:
-                            open_trade(symbol, signal, price, atr, score)
+                            with metrics.span("order", symbol):
+                                open_trade(symbol, signal, price, atr, score, timing)
                             executed = True
                         else:
                             reason = f"Score insuffisant ({score}/{CURRENT_THRESHOLD})"
@@ -850,7 +1263,8 @@ def bot_loop():
                     "executed": executed,
                     "reason_not_executed": reason
                 }
-                logger.log_signal(signal_data)
+                with metrics.span("log", symbol):
+                    logger.log_signal(signal_data)
                 
                 # Mise à jour du cache API (format harmonisé avec ZONE2_AI)
                 signals_cache.append({
@@ -870,9 +1284,6 @@ def bot_loop():
                 if signal:
                     save_state()
 
-                # Délai minimal pour ne pas saturer l'API
-                time.sleep(0.2)
-
             except Exception as e:
                 logger.log_error(f"Loop error on {symbol}", e)
                 time.sleep(10)
@@ -883,8 +1294,8 @@ def bot_loop():
         try:
             AUTO_TUNING_ENABLED = os.getenv("AUTO_TUNING_ENABLED", "false").lower() == "true"
             if AUTO_TUNING_ENABLED and total_trades > 0 and total_trades - LAST_TUNE_TRADES >= 10:
-                print("🔄 Lancement de l'Auto-Tuner...", flush=True)
-                best_config = tuner.get_best_configuration(SYMBOLS, TIMEFRAME)
+                print("🔄 Lancement de l'Auto-Tuner (walk-forward)...", flush=True)
+                best_config = tuner.walk_forward(SYMBOLS, TIMEFRAME)
 
                 if best_config:
                     new_strat = best_config['strategy']
@@ -900,9 +1311,15 @@ def bot_loop():
                                f"Nouvelle Strat: {ACTIVE_STRATEGY}\n"
                                f"SL Multi: {CURRENT_SL_MULTI}x\n"
                                f"TP Multi: {CURRENT_TP_MULTI}x\n"
-                               f"Threshold: {CURRENT_THRESHOLD}\n"
-                               f"Expected WinRate: {best_config['expected_wr']:.1f}%\n"
-                               f"Expected PnL: {best_config['expected_pnl']:.2f} ATR")
+                               f"Threshold: {CURRENT_THRESHOLD}\n")
+                        if 'windows' in best_config:
+                            msg += (f"OOS WinRate: {best_config['expected_wr']:.1f}%\n"
+                                    f"OOS PnL: {best_config['expected_pnl']:.2f} ATR/fenêtre "
+                                    f"({best_config['windows_positive']}/{best_config['windows']} fenêtres +)")
+                        else:
+                            # Repli sans archive : backtest 48 h, pas de walk-forward
+                            msg += (f"WinRate 48h: {best_config['expected_wr']:.1f}%\n"
+                                    f"PnL 48h: {best_config['expected_pnl']:.2f} ATR")
                         print(msg, flush=True)
                         send_telegram(msg)
                     else:
@@ -914,17 +1331,30 @@ def bot_loop():
         except Exception as e:
             logger.log_error("Auto-tuner error", e)
 
-        # Nettoyage périodique du cache des positions actives (vérification réelle sur Bybit)
-        try:
+        sync_positions()
+        save_state()
+        metrics.record_cycle(cycle_start)
+        # Prochain cycle juste après la clôture d'une bougie de la stratégie active
+        # (ACTIVE_STRATEGY peut avoir changé via l'Auto-Tuner) ; entre deux clôtures,
+        # réveil toutes les POSITION_CHECK_SECONDS pour synchroniser les positions
+        scheduler.register(ACTIVE_STRATEGY, strategy_timeframes(ACTIVE_STRATEGY))
+        while not scheduler.wait(ACTIVE_STRATEGY, max_wait=POSITION_CHECK_SECONDS):
+            if active_positions:
+                sync_positions()
+                publish_snapshot()
+
+def sync_positions():
+    """
+    Nettoyage du cache des positions actives (vérification réelle sur Bybit) :
+    une position fermée libère MAX_POSITIONS et son PnL remonte aux guards de risque
+    """
+    try:
+        with metrics.span("positions_sync"):
             for s in list(active_positions.keys()):
                 # On force la vérification sur l'échange pour vider le cache si la position est fermée
                 has_open_position(s, ignore_cache=True)
-        except Exception as e:
-            logger.log_error("Cleanup positions cache error", e)
-            
-        # Pause très courte entre les cycles pour une réactivité maximale (5s)
-        save_state()
-        time.sleep(5)
+    except Exception as e:
+        logger.log_error("Cleanup positions cache error", e)
 
 # ================= START =================
 
@@ -936,9 +1366,18 @@ if __name__ == "__main__":
         pass
         
     load_state()
-        
-    t = threading.Thread(target=start_api)
-    t.daemon = True
-    t.start()
+
+    api_proc = None
+    if API_MODE == "process":
+        publish_snapshot()
+        threading.Thread(target=snapshot_heartbeat, daemon=True, name="snapshot-heartbeat").start()
+        api_proc = start_api_process()
+        if api_proc is not None:
+            atexit.register(api_proc.terminate)
+
+    if api_proc is None:
+        t = threading.Thread(target=start_api)
+        t.daemon = True
+        t.start()
 
     bot_loop()
@@ -13,6 +13,7 @@ from strategy_scalping_3candles import (
 from risk_improved import calculate_position_size
 from notifier import send_telegram
 from logger import init_logger, log_trade
+from bar_scheduler import BarScheduler
 
 # =========================
 # PARAMÈTRES STRATÉGIE SCALPING
@@ -26,6 +27,9 @@ MAX_CANDLES = 3         # Sortie à la 3ème bougie
 # Pas de limite de trades pour le scalping
 COOLDOWN_SECONDS = 60   # 1 minute entre trades
 
+# Cycle réveillé à chaque clôture de bougie 1m (la 5m clôture en même temps)
+scheduler = BarScheduler(exchange, {"scalping_3candles": (TIMEFRAME_EXEC, TIMEFRAME_TREND)})
+
 # =========================
 # ÉTAT
 # =========================
@@ -52,13 +56,24 @@ def safe_float(v, default=0.0):
         return default
 
 
+def closed_candles(df):
+    """
+    Bougies closes uniquement quand le cycle est aligné sur les clôtures :
+    réveillée BAR_CLOSE_GRACE_MS après la clôture, la dernière bougie vient
+    d'ouvrir et son corps quasi nul ferait rejeter le pattern par MIN_BODY_PCT.
+    """
+    if scheduler.enabled and not df.empty:
+        return df.iloc[:-1].reset_index(drop=True)
+    return df
+
+
 def fetch_ohlcv(timeframe, limit=100):
     """Récupère les données OHLCV pour un timeframe"""
     ohlcv = exchange.fetch_ohlcv(SYMBOL, timeframe, limit=limit)
-    return pd.DataFrame(
+    return closed_candles(pd.DataFrame(
         ohlcv,
         columns=["time", "open", "high", "low", "close", "volume"],
-    )
+    ))
 
 
 def get_available_balance():
@@ -380,8 +395,8 @@ def run():
                         "candles_count": 0,
                     }
 
-            # Attendre 1 minute (cycle 1m)
-            time.sleep(60)
+            # Attendre la clôture de la prochaine bougie 1m
+            scheduler.wait()
 
         except Exception as e:
             print("❌ Scalping error:", e, flush=True)
@@ -69,6 +69,19 @@ def get_positions_api():
         print(f"FAILED - API positions: {e}", flush=True)
         return jsonify([])
 
+@api_app.route('/api/params')
+def get_params_api():
+    """Paramètres courants de la stratégie (AIEnhancedParams)"""
+    return jsonify(STRATEGY_PARAMS.get().as_dict())
+
+@api_app.route('/api/params/reload', methods=['POST'])
+def reload_params_api():
+    """Recharge STRATEGY_PARAMS_FILE sans redémarrer le bot"""
+    ok, result = STRATEGY_PARAMS.reload()
+    if ok:
+        return jsonify({'status': 'ok', 'params': result.as_dict()})
+    return jsonify({'status': 'error', 'error': result}), 400
+
 def run_api():
     """Lance l'API Flask dans un thread séparé"""
     try:
@@ -81,13 +94,18 @@ def run_api():
 
 # IMPORTS DU BOT
 from config import exchange, SYMBOLS, CAPITAL, LEVERAGE, MAX_POSITIONS
+from paper_exchange import PaperExchange
 from risk_improved import calculate_position_size
 from notifier import send_telegram
 from logger import init_logger, log_trade
 from logger_enhanced import get_logger
+from bar_scheduler import BarScheduler
+from position_monitor import PositionMonitor
+from stop_amender import StopAmender
 from strategy_ai_enhanced import (
     apply_indicators, check_signal, calculate_sl_tp_adaptive,
-    reset_state, get_state, calculate_signal_strength
+    reset_state, get_state, calculate_signal_strength,
+    PARAMS as STRATEGY_PARAMS,
 )
 
 # =========================
@@ -102,6 +120,16 @@ TRAILING_STOP_DISTANCE = float(os.getenv('TRAILING_STOP_DISTANCE', '0.003'))
 MAX_DAILY_LOSS_PCT = float(os.getenv('MAX_DAILY_LOSS_PCT', '5'))
 MAX_CONSECUTIVE_LOSSES = int(os.getenv('MAX_CONSECUTIVE_LOSSES', '3'))
 RISK_PER_TRADE = float(os.getenv('RISK_PER_TRADE', '0.02'))
+POSITION_SYNC_SECONDS = float(os.getenv('POSITION_SYNC_SECONDS', '5'))
+
+# Mode paper : ordres, SL/TP et trailing simulés par paper_exchange derrière la
+# même API que le réel ; les prix arrivent par les fetch_tickers de position_monitor
+if PAPER_TRADING and not getattr(exchange, 'is_paper', False):
+    exchange = PaperExchange(exchange, balance=CAPITAL, feed=False)
+
+# Recherche de signaux à chaque clôture de bougie TIMEFRAME ; les positions
+# ouvertes sont suivies à part (position_monitor, sous la seconde)
+scheduler = BarScheduler(exchange, {'zone2_ai': TIMEFRAME})
 
 # =========================
 # FILTRE HORAIRE (GOLD = Marché américain)
@@ -121,6 +149,8 @@ def is_trading_hours():
 active_positions = {} 
 trades_state = {}     
 last_trade_times = {} 
+# Positions partagées entre la boucle de scan et le thread de suivi
+positions_lock = threading.RLock()
 
 consecutive_losses = 0
 daily_pnl = 0.0
@@ -171,6 +201,16 @@ def load_state():
 # =========================
 # UTILS
 # =========================
+def closed_candles(df):
+    """
+    Bougies closes uniquement quand le cycle est aligné sur les clôtures :
+    réveillée BAR_CLOSE_GRACE_MS après la clôture, la dernière bougie vient
+    d'ouvrir (corps, MACD et stochastique lus sur une bougie de 1-2 s).
+    """
+    if scheduler.enabled and not df.empty:
+        return df.iloc[:-1].reset_index(drop=True)
+    return df
+
 def fetch_ohlcv(symbol, limit=200):
     """Récupère les données OHLCV pour un symbole spécifique"""
     try:
@@ -179,7 +219,7 @@ def fetch_ohlcv(symbol, limit=200):
             ohlcv,
             columns=["timestamp", "open", "high", "low", "close", "volume"],
         )
-        return df
+        return closed_candles(df)
     except Exception as e:
         enhanced_logger.log_error(f"Erreur fetch_ohlcv {symbol}", e)
         return pd.DataFrame()
@@ -224,10 +264,6 @@ def get_available_balance():
 
 def place_sl_tp_orders(symbol, side, qty, entry_price, sl_price, tp_price):
     """Place les ordres SL/TP optimisés"""
-    if PAPER_TRADING:
-        print(f"📝 PAPER - SL/TP simulés: SL={sl_price:.2f}, TP={tp_price:.2f}", flush=True)
-        return True
-        
     try:
         exchange.private_post_v5_position_trading_stop({
             'category': 'linear',
@@ -262,7 +298,10 @@ def get_status():
             'daily_pnl': daily_pnl,
             'total_trades': total_trades,
             'consecutive_losses': consecutive_losses,
-            'max_positions': MAX_POSITIONS
+            'max_positions': MAX_POSITIONS,
+            'position_monitor': position_monitor.status(),
+            'paper_exchange': exchange.status() if PAPER_TRADING else None,
+            'stop_amendments': stop_amender.stats()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -287,26 +326,8 @@ def update_trailing_stop(symbol, side, qty, current_price, current_sl):
 
             if new_sl > current_sl:
                 print(f"📈 [{symbol}] LONG Trailing stop: {current_sl:.2f} → {new_sl:.2f}", flush=True)
-                if not PAPER_TRADING:
-                    try:
-                        resp = exchange.private_post_v5_position_trading_stop({
-                            'category': 'linear',
-                            'symbol': symbol.split(':')[0].replace('/', ''),
-                            'stopLoss': str(round(new_sl, 4)),
-                            'slTriggerBy': 'MarkPrice',
-                            'slOrderType': 'Market',
-                            'tpslMode': 'Full',
-                            'positionIdx': 0,
-                        })
-                        ret_code = resp.get('retCode', -1) if isinstance(resp, dict) else -1
-                        if ret_code == 0:
-                            print(f"✅ [{symbol}] Trailing SL mis à jour sur Bybit: {new_sl:.2f}", flush=True)
-                        else:
-                            print(f"⚠️ [{symbol}] Bybit trailing stop refusé: {resp}", flush=True)
-                            return current_sl
-                    except Exception as e:
-                        enhanced_logger.log_error(f"Erreur trailing stop {symbol}", e)
-                        return current_sl
+                # Envoi groupé et limité par stop_amender (flush du suivi)
+                stop_amender.desire(symbol, new_sl)
                 return new_sl
 
     else:  # short
@@ -321,30 +342,31 @@ def update_trailing_stop(symbol, side, qty, current_price, current_sl):
 
             if new_sl < current_sl:
                 print(f"📈 [{symbol}] SHORT Trailing stop: {current_sl:.2f} → {new_sl:.2f}", flush=True)
-                if not PAPER_TRADING:
-                    try:
-                        resp = exchange.private_post_v5_position_trading_stop({
-                            'category': 'linear',
-                            'symbol': symbol.split(':')[0].replace('/', ''),
-                            'stopLoss': str(round(new_sl, 4)),
-                            'slTriggerBy': 'MarkPrice',
-                            'slOrderType': 'Market',
-                            'tpslMode': 'Full',
-                            'positionIdx': 0,
-                        })
-                        ret_code = resp.get('retCode', -1) if isinstance(resp, dict) else -1
-                        if ret_code == 0:
-                            print(f"✅ [{symbol}] Trailing SL mis à jour sur Bybit: {new_sl:.2f}", flush=True)
-                        else:
-                            print(f"⚠️ [{symbol}] Bybit trailing stop refusé: {resp}", flush=True)
-                            return current_sl
-                    except Exception as e:
-                        enhanced_logger.log_error(f"Erreur trailing stop {symbol}", e)
-                        return current_sl
+                stop_amender.desire(symbol, new_sl)
                 return new_sl
 
     return current_sl
 
+def send_trailing_stop(symbol, stop):
+    """Modifie le SL de la position sur Bybit. Retourne (accepté, réponse)."""
+    resp = exchange.private_post_v5_position_trading_stop({
+        'category': 'linear',
+        'symbol': symbol.split(':')[0].replace('/', ''),
+        'stopLoss': str(round(stop, 4)),
+        'slTriggerBy': 'MarkPrice',
+        'slOrderType': 'Market',
+        'tpslMode': 'Full',
+        'positionIdx': 0,
+    })
+    ret_code = resp.get('retCode', -1) if isinstance(resp, dict) else -1
+    # 34040 : stop identique déjà en place
+    if ret_code in (0, 34040):
+        print(f"✅ [{symbol}] Trailing SL mis à jour sur Bybit: {stop:.2f}", flush=True)
+        return True, resp
+    return False, resp
+
+stop_amender = StopAmender(send_trailing_stop)
+
 def check_circuit_breaker():
     """Vérifie si on doit arrêter le trading"""
     global consecutive_losses, initial_capital, total_trades
@@ -371,40 +393,14 @@ def check_circuit_breaker():
     
     return False, "OK"
 
-def check_signal_with_logging(symbol, df):
-    """Calcule le signal FVG+Fibonacci+Momentum et le logue"""
-    from strategy_ai_enhanced import apply_indicators, check_signal, detect_trend, calculate_signal_strength
+def check_signal_with_logging(symbol, df, params=None):
+    """Calcule le signal BIOS/OTE+Momentum et le logue"""
+    from strategy_ai_enhanced import evaluate_signal
 
-    df_with_indicators = apply_indicators(df)
+    # Une seule passe : indicateurs calculés une fois, une seule ligne de journal
     # Passe le symbole pour isoler l'état BIOS/OTE par symbole
-    signal = check_signal(df_with_indicators, symbol=symbol)
-    reason_not_executed = "" if signal else "Pas de signal FVG/Fib"
-
-    last_row = df_with_indicators.iloc[-1] if not df_with_indicators.empty else None
-    if last_row is not None:
-        bb_position = 0
-        if 'bb_upper' in last_row.index and 'bb_lower' in last_row.index:
-            bb_range = last_row['bb_upper'] - last_row['bb_lower']
-            if bb_range > 0:
-                bb_position = (last_row['close'] - last_row['bb_lower']) / bb_range
-
-        signal_data = {
-            'symbol': symbol,
-            'signal': signal if signal else 'none',
-            'price': last_row['close'],
-            'trend': detect_trend(df_with_indicators) or 'unknown',
-            'rsi': last_row.get('rsi', 0),
-            'macd': last_row.get('macd', 0),
-            'stoch_k': last_row.get('stoch_k', 0),
-            'stoch_d': last_row.get('stoch_d', 0),
-            'bb_position': bb_position,
-            'ote_zone': False,
-            'bios_detected': False,
-            'signal_strength': calculate_signal_strength(df_with_indicators, signal) if signal else 0,
-            'executed': signal is not None,
-            'reason_not_executed': reason_not_executed
-        }
-        enhanced_logger.log_signal(signal_data)
+    signal, signal_data, df_with_indicators = evaluate_signal(df, symbol=symbol, params=params)
+    enhanced_logger.log_signal(signal_data)
 
     return signal, df_with_indicators
 
@@ -428,14 +424,13 @@ def run():
     
     init_logger()
     
-    if not PAPER_TRADING:
-        for symbol in SYMBOLS:
-            try:
-                exchange.set_leverage(LEVERAGE, symbol)
-                print(f"⚙️ Leverage set for {symbol}: {LEVERAGE}x", flush=True)
-            except Exception as e:
-                if "110043" not in str(e):
-                    print(f"⚠️ Erreur leverage {symbol}: {e}", flush=True)
+    for symbol in SYMBOLS:
+        try:
+            exchange.set_leverage(LEVERAGE, symbol)
+            print(f"⚙️ Leverage set for {symbol}: {LEVERAGE}x", flush=True)
+        except Exception as e:
+            if "110043" not in str(e):
+                print(f"⚠️ Erreur leverage {symbol}: {e}", flush=True)
     
     mode = "📝 PAPER" if PAPER_TRADING else "💰 REAL"
     send_telegram(
@@ -445,61 +440,14 @@ def run():
         f"🛡️ Circuit breaker actif"
     )
     
+    position_monitor.start()
+
     while True:
         for symbol in SYMBOLS:
             try:
-                # 1. Gestion des positions existantes
+                # 1. Positions ouvertes : trailing et sorties gérés par position_monitor
                 if active_positions.get(symbol):
-                    trade_info = trades_state.get(symbol)
-                    if trade_info:
-                        # Récupérer le prix courant (fallback sur le dernier prix connu)
-                        current_price = trade_info.get('last_price', trade_info['entry_price'])
-                        df_trail = fetch_ohlcv(symbol, limit=2)
-                        if not df_trail.empty:
-                            current_price = df_trail['close'].iloc[-1]
-                            trade_info['last_price'] = current_price
-
-                        # Trailing stop — toujours évalué avant la vérification de fermeture
-                        new_sl = update_trailing_stop(
-                            symbol,
-                            trade_info['side'],
-                            trade_info['qty'],
-                            current_price,
-                            trade_info['sl_price']
-                        )
-                        if new_sl != trade_info['sl_price']:
-                            trade_info['sl_price'] = new_sl
-                            trade_info['trailing_activated'] = True
-
-                        # Check exit
-                        position_closed = False
-                        exit_reason = None
-
-                        if PAPER_TRADING:
-                            if trade_info['side'] == 'long':
-                                if current_price <= trade_info['sl_price']:
-                                    position_closed, exit_reason = True, "SL"
-                                elif current_price >= trade_info['tp_price']:
-                                    position_closed, exit_reason = True, "TP"
-                            else:  # short
-                                if current_price >= trade_info['sl_price']:
-                                    position_closed, exit_reason = True, "SL"
-                                elif current_price <= trade_info['tp_price']:
-                                    position_closed, exit_reason = True, "TP"
-                        else:
-                            try:
-                                # Bybit est la source de vérité pour la fermeture
-                                if not has_open_position(symbol, ignore_cache=True):
-                                    position_closed, exit_reason = True, "SL/TP (Market)"
-                            except:
-                                pass
-
-                        if position_closed:
-                            finalize_trade(symbol, trade_info, current_price, exit_reason or "EXIT")
-                            active_positions[symbol] = False
-                            trades_state.pop(symbol, None)
-                            last_trade_times[symbol] = time.time()
-                            continue
+                    continue
 
                 # 2. Recherche de nouveaux signaux
                 if not active_positions.get(symbol):
@@ -522,22 +470,129 @@ def run():
                     if df.empty:
                         continue
 
-                    signal, df_with_indicators = check_signal_with_logging(symbol, df)
+                    # Jeu de paramètres lu une fois (rechargé à chaud) pour signal et SL/TP
+                    params = STRATEGY_PARAMS.get()
+                    signal, df_with_indicators = check_signal_with_logging(symbol, df, params)
 
                     if signal:
                         print(f"🎯 [{symbol}] Signal détecté: {signal.upper()}", flush=True)
-                        execute_entry(symbol, signal, df_with_indicators)
+                        execute_entry(symbol, signal, df_with_indicators, params)
 
             except Exception as e:
                 enhanced_logger.log_error(f"Loop error on {symbol}", e)
-                
-        time.sleep(60)
+
+        # Prochain scan juste après la clôture de la bougie TIMEFRAME
+        scheduler.wait()
+
+def open_position_symbols():
+    """Symboles en position suivis par position_monitor"""
+    return [s for s, is_open in list(active_positions.items()) if is_open and s in trades_state]
+
+_last_exchange_sync = 0.0
+
+def exchange_closed_positions(symbols):
+    """
+    Symboles dont la position n'existe plus sur Bybit (SL/TP exécuté).
+    Un seul fetch_positions groupé, au plus toutes les POSITION_SYNC_SECONDS
+    (à chaque tick en paper : positions locales, sans appel réseau).
+    """
+    global _last_exchange_sync
+    if not PAPER_TRADING and time.monotonic() - _last_exchange_sync < POSITION_SYNC_SECONDS:
+        return set()
+    _last_exchange_sync = time.monotonic()
+    try:
+        positions = exchange.fetch_positions(symbols)
+    except Exception as e:
+        enhanced_logger.log_error("Erreur fetch_positions (suivi)", e)
+        return set()
+    still_open = {p.get('symbol') for p in positions if float(p.get('contracts') or 0) > 0}
+    return {s for s in symbols if s not in still_open}
+
+def manage_positions(prices):
+    """Callback de position_monitor : trailing stop puis sortie, par symbole"""
+    closed = exchange_closed_positions(list(prices))
+    for symbol, current_price in prices.items():
+        with positions_lock:
+            trade_info = trades_state.get(symbol)
+            if trade_info and active_positions.get(symbol):
+                manage_position(symbol, trade_info, current_price, symbol in closed)
+    # Stops souhaités de ce tick : un envoi par position au plus
+    stop_amender.flush()
+
+def manage_position(symbol, trade_info, current_price, closed_on_exchange=False):
+    """Trailing stop et vérification de sortie d'une position au prix courant"""
+    trade_info['last_price'] = current_price
+
+    # Trailing stop — toujours évalué avant la vérification de fermeture
+    new_sl = update_trailing_stop(
+        symbol,
+        trade_info['side'],
+        trade_info['qty'],
+        current_price,
+        trade_info['sl_price']
+    )
+    if new_sl != trade_info['sl_price']:
+        trade_info['sl_price'] = new_sl
+        trade_info['trailing_activated'] = True
+
+    # Check exit
+    position_closed = False
+    exit_reason = None
+
+    if closed_on_exchange:
+        # Bybit est la source de vérité pour la fermeture
+        position_closed, exit_reason = True, "SL/TP (Market)"
+
+    if position_closed:
+        exit_price, pnl_usdt = current_price, None
+        fill = paper_closed_trade(symbol, trade_info) if PAPER_TRADING else None
+        if fill:
+            # Exécution simulée par paper_exchange (slippage, frais) plutôt que le ticker
+            exit_price, pnl_usdt = fill
+        finalize_trade(symbol, trade_info, exit_price, exit_reason or "EXIT", pnl_usdt)
+        active_positions[symbol] = False
+        trades_state.pop(symbol, None)
+        stop_amender.close(symbol)
+        last_trade_times[symbol] = time.time()
+
+def paper_closed_trade(symbol, trade):
+    """
+    (prix de sortie moyen, PnL clôturé USDT) de la position fermée dans
+    paper_exchange, depuis ses enregistrements closed-pnl postérieurs à
+    l'entrée. None si aucun.
+    """
+    try:
+        resp = exchange.private_get_v5_position_closed_pnl({
+            "category": "linear",
+            "symbol": symbol.split(':')[0].replace('/', ''),
+            "limit": 50,
+        })
+        since_ms = datetime.fromisoformat(trade['entry_time']).timestamp() * 1000
+    except Exception as e:
+        enhanced_logger.log_error(f"Erreur closed PnL {symbol}", e)
+        return None
+    rows = [r for r in resp.get('result', {}).get('list', [])
+            if int(r.get('updatedTime') or 0) >= since_ms]
+    qty = sum(float(r['qty']) for r in rows)
+    if qty <= 0:
+        return None
+    exit_price = sum(float(r['avgExitPrice']) * float(r['qty']) for r in rows) / qty
+    return exit_price, sum(float(r['closedPnl']) for r in rows)
+
+def price_tick_size(symbol):
+    """Pas de prix du marché (ccxt, mode TICK_SIZE), None si inconnu"""
+    try:
+        return exchange.market(symbol)['precision']['price']
+    except Exception:
+        return None
+
+position_monitor = PositionMonitor(exchange, open_position_symbols, manage_positions, name="ZONE2_AI")
 
 def get_base_currency(symbol):
     """Extrait la devise de base d'un symbole. Ex: BTC/USDT:USDT → BTC"""
     return symbol.split('/')[0]
 
-def execute_entry(symbol, signal, df):
+def execute_entry(symbol, signal, df, params=None):
     """Gère l'ouverture d'une position"""
     global total_trades
 
@@ -555,7 +610,7 @@ def execute_entry(symbol, signal, df):
             return
 
     current_price = df['close'].iloc[-1]
-    sl_price, tp_price, atr_pct = calculate_sl_tp_adaptive(current_price, signal, df)
+    sl_price, tp_price, atr_pct = calculate_sl_tp_adaptive(current_price, signal, df, params)
     
     qty = calculate_position_size(
         CAPITAL,
@@ -568,30 +623,30 @@ def execute_entry(symbol, signal, df):
     if qty <= 0: return
 
     try:
-        if PAPER_TRADING:
-            order_success = True
-        else:
-            order_side = "buy" if signal == "long" else "sell"
-            exchange.create_market_order(symbol, order_side, qty)
-            order_success = True
+        order_side = "buy" if signal == "long" else "sell"
+        exchange.create_market_order(symbol, order_side, qty)
+        order_success = True
         
         if order_success:
             success = place_sl_tp_orders(symbol, signal, qty, current_price, sl_price, tp_price)
             if success:
-                active_positions[symbol] = True
-                trades_state[symbol] = {
-                    "symbol": symbol,
-                    "entry_price": current_price,
-                    "side": signal,
-                    "qty": qty,
-                    "sl_price": sl_price,
-                    "tp_price": tp_price,
-                    "entry_time": datetime.now(timezone.utc).isoformat(),
-                    "highest_price": current_price,
-                    "lowest_price": current_price,
-                    "trailing_activated": False,
-                    "last_price": current_price
-                }
+                with positions_lock:
+                    active_positions[symbol] = True
+                    trades_state[symbol] = {
+                        "symbol": symbol,
+                        "entry_price": current_price,
+                        "side": signal,
+                        "qty": qty,
+                        "sl_price": sl_price,
+                        "tp_price": tp_price,
+                        "entry_time": datetime.now(timezone.utc).isoformat(),
+                        "highest_price": current_price,
+                        "lowest_price": current_price,
+                        "trailing_activated": False,
+                        "last_price": current_price
+                    }
+                    atr = df['atr'].iloc[-1] if 'atr' in df.columns else None
+                    stop_amender.open(symbol, signal, sl_price, price_tick_size(symbol), atr)
                 
                 # Save state after opening position
                 save_state()
@@ -602,18 +657,20 @@ def execute_entry(symbol, signal, df):
     except Exception as e:
         enhanced_logger.log_error(f"Entry error {symbol}", e)
 
-def finalize_trade(symbol, trade, exit_price, reason):
-    """Finalise et log un trade terminé"""
+def finalize_trade(symbol, trade, exit_price, reason, pnl_usdt=None):
+    """Finalise et log un trade terminé (pnl_usdt : PnL clôturé de l'exchange, frais compris)"""
     global consecutive_losses, daily_pnl, total_trades, last_state_save_date
     
     if trade['side'] == 'long':
         pnl_pct = (exit_price - trade['entry_price']) / trade['entry_price'] * 100
-        pnl_usdt = (exit_price - trade['entry_price']) * trade['qty']
+        price_pnl = (exit_price - trade['entry_price']) * trade['qty']
     else:
         pnl_pct = (trade['entry_price'] - exit_price) / trade['entry_price'] * 100
-        pnl_usdt = (trade['entry_price'] - exit_price) * trade['qty']
+        price_pnl = (trade['entry_price'] - exit_price) * trade['qty']
+    if pnl_usdt is None:
+        pnl_usdt = price_pnl
     
-    result = "WIN" if pnl_pct > 0 else "LOSS"
+    result = "WIN" if pnl_usdt > 0 else "LOSS"
     if result == "LOSS": consecutive_losses += 1
     else: consecutive_losses = 0
     
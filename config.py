@@ -84,4 +84,11 @@ try:
 except Exception as e:
     print("⚠️ Markets load error:", e, flush=True)
 
+# Ordres et positions simulés derrière la même API (données de marché réelles)
+PAPER_EXCHANGE = os.getenv("PAPER_EXCHANGE", "0") == "1"
+if PAPER_EXCHANGE:
+    from paper_exchange import PaperExchange
+    exchange = PaperExchange(exchange, balance=float(os.getenv("PAPER_BALANCE", CAPITAL)))
+    print(f"📝 Paper exchange actif (solde {exchange.balance:.2f} USDT)", flush=True)
+
 print("⚙️ CONFIG READY", flush=True)
@@ -0,0 +1,117 @@
+"""
+Modèle de coûts des backtests : frais, funding et slippage
+
+Appliqué en numpy sur tous les trades simulés d'un coup (pas de boucle
+Python), pour que les classements de l'AutoTuner et du backtester
+portefeuille reflètent le PnL net sans ralentir la recherche sur la grille.
+
+  - Frais par type d'ordre, comme open_trade : entrée market (taker),
+    SL / trailing / clôture market (taker), TP limit (maker)
+  - Funding : taux × notionnel à chaque échéance (00h / 08h / 16h UTC)
+    traversée pendant la position ; les longs paient un taux positif.
+    Taux constant ou historique par symbole (set_funding_history)
+  - Slippage sur les ordres market : base_bps + impact_bps × √(notionnel /
+    volume de la bougie en USDT), le TP limit n'en subit pas
+
+Tous les coûts sont exprimés en prix par unité de quantité : multiplier par
+qty pour des USDT, diviser par l'ATR pour des multiples d'ATR.
+"""
+import os
+
+import numpy as np
+
+TAKER_FEE_RATE = float(os.getenv("TAKER_FEE_RATE", "0.00075"))
+MAKER_FEE_RATE = float(os.getenv("MAKER_FEE_RATE", "0.0002"))
+FUNDING_RATE = float(os.getenv("FUNDING_RATE", "0.0001"))            # par échéance
+FUNDING_INTERVAL_MS = 8 * 3_600_000
+SLIPPAGE_BASE_BPS = float(os.getenv("SLIPPAGE_BASE_BPS", "1.0"))
+SLIPPAGE_IMPACT_BPS = float(os.getenv("SLIPPAGE_IMPACT_BPS", "10.0"))
+
+# Type d'ordre de sortie selon la raison (exit_resolution) : seul le TP est une limite
+MAKER_EXITS = ("TP",)
+
+
+class CostModel:
+    def __init__(self, taker_fee=TAKER_FEE_RATE, maker_fee=MAKER_FEE_RATE,
+                 funding_rate=FUNDING_RATE, funding_interval_ms=FUNDING_INTERVAL_MS,
+                 slippage_base_bps=SLIPPAGE_BASE_BPS, slippage_impact_bps=SLIPPAGE_IMPACT_BPS):
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.funding_rate = funding_rate
+        self.funding_interval_ms = funding_interval_ms
+        self.slippage_base_bps = slippage_base_bps
+        self.slippage_impact_bps = slippage_impact_bps
+        self._funding_history = {}   # symbol -> (timestamps, taux cumulés)
+
+    def signature(self):
+        """Identifiant des paramètres (clé de cache des résultats de backtest)"""
+        return (f"{self.taker_fee}|{self.maker_fee}|{self.funding_rate}|{self.funding_interval_ms}|"
+                f"{self.slippage_base_bps}|{self.slippage_impact_bps}|{sorted(self._funding_history)}")
+
+    def set_funding_history(self, symbol, timestamps, rates):
+        """Historique réel des taux de funding d'un symbole (timestamps ms triés)"""
+        ts = np.asarray(timestamps, dtype=np.int64)
+        self._funding_history[symbol] = (ts, np.concatenate(([0.0], np.cumsum(rates))))
+
+    # ── Composantes (vectorisées) ─────────────────────────────────────────────
+    def slippage_bps(self, notional, bar_volume_quote):
+        """Slippage d'un ordre market en bps, croissant avec la part du volume de la bougie"""
+        notional = np.asarray(notional, dtype=np.float64)
+        volume = np.asarray(bar_volume_quote, dtype=np.float64)
+        participation = np.divide(notional, volume, out=np.zeros(np.broadcast(notional, volume).shape),
+                                  where=volume > 0)
+        return self.slippage_base_bps + self.slippage_impact_bps * np.sqrt(participation)
+
+    def funding_per_unit(self, side, entry_price, entry_ts, exit_ts, symbol=None):
+        """Funding payé par unité (positif = coût) entre entry_ts et exit_ts"""
+        entry_ts = np.asarray(entry_ts, dtype=np.int64)
+        exit_ts = np.asarray(exit_ts, dtype=np.int64)
+        if symbol in self._funding_history:
+            ts, cum = self._funding_history[symbol]
+            rate_sum = cum[np.searchsorted(ts, exit_ts, side="right")] - cum[np.searchsorted(ts, entry_ts, side="right")]
+        else:
+            interval = self.funding_interval_ms
+            crossings = exit_ts // interval - entry_ts // interval
+            rate_sum = np.maximum(crossings, 0) * self.funding_rate
+        return np.asarray(side) * rate_sum * np.asarray(entry_price)
+
+    def trade_costs(self, side, entry_price, exit_price, exit_reason, qty=1.0,
+                    entry_ts=None, exit_ts=None, entry_volume=None, exit_volume=None, symbol=None):
+        """
+        Coûts par unité de quantité pour un ou plusieurs trades.
+
+        side         : +1 long / -1 short
+        exit_reason  : SL / TP / TRAIL / END (tableau de chaînes accepté)
+        qty          : quantité, pour le slippage (part du volume) uniquement
+        *_volume     : volume de la bougie en unités de base (None = pas d'impact)
+        Retourne {"fees", "funding", "slippage", "total"} en prix par unité.
+        """
+        side = np.asarray(side, dtype=np.float64)
+        entry_price = np.asarray(entry_price, dtype=np.float64)
+        exit_price = np.asarray(exit_price, dtype=np.float64)
+        maker_exit = np.isin(np.asarray(exit_reason), MAKER_EXITS)
+
+        exit_fee = np.where(maker_exit, self.maker_fee, self.taker_fee)
+        fees = entry_price * self.taker_fee + exit_price * exit_fee
+
+        qty = np.asarray(qty, dtype=np.float64)
+        entry_slip = self.slippage_bps(qty * entry_price, np.inf if entry_volume is None
+                                       else np.asarray(entry_volume) * entry_price)
+        exit_slip = self.slippage_bps(qty * exit_price, np.inf if exit_volume is None
+                                      else np.asarray(exit_volume) * exit_price)
+        slippage = (entry_price * entry_slip + np.where(maker_exit, 0.0, exit_price * exit_slip)) / 10_000
+
+        if entry_ts is None or exit_ts is None:
+            funding = np.zeros(np.broadcast(side, entry_price).shape)
+        else:
+            funding = self.funding_per_unit(side, entry_price, entry_ts, exit_ts, symbol)
+
+        return {"fees": fees, "funding": funding, "slippage": slippage,
+                "total": fees + funding + slippage}
+
+
+def get_cost_model():
+    """Modèle par défaut (paramètres de l'environnement), None si BACKTEST_COSTS=0"""
+    if os.getenv("BACKTEST_COSTS", "1") != "1":
+        return None
+    return CostModel()
@@ -10,6 +10,10 @@ import os
 import sys
 import secrets
 import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 
 # Ajouter le chemin parent pour les imports
@@ -69,6 +73,106 @@ def requires_auth(f):
 trade_analyzer = TradeAnalyzer()
 signal_analyzer = SignalAnalyzer()
 
+# =========================
+# COUCHE D'AGRÉGATION DES BOTS
+# =========================
+# Toutes les routes interrogent les bots en parallèle via des sessions HTTP
+# keep-alive (une par bot), avec un petit cache partagé et un disjoncteur par
+# bot : la latence d'une page est bornée par l'appel le plus lent, pas la somme.
+BOT_CACHE_TTL = float(os.getenv('BOT_CACHE_TTL', '2'))          # secondes
+BOT_CB_FAILURES = int(os.getenv('BOT_CB_FAILURES', '3'))        # échecs avant ouverture
+BOT_CB_COOLDOWN = float(os.getenv('BOT_CB_COOLDOWN', '30'))     # secondes en circuit ouvert
+
+_bot_executor = ThreadPoolExecutor(max_workers=max(4, len(BOTS) * 4), thread_name_prefix='bot-fetch')
+_bot_sessions = {}
+_bot_cache = {}      # {(bot_name, endpoint): (timestamp, result)}
+_bot_breakers = {}   # {bot_name: {'failures': int, 'open_until': float}}
+_bot_lock = threading.Lock()
+
+def _get_session(bot):
+    """Session HTTP persistante (pool de connexions keep-alive) par bot"""
+    with _bot_lock:
+        session = _bot_sessions.get(bot['name'])
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _bot_sessions[bot['name']] = session
+        return session
+
+def _bot_url(bot, endpoint):
+    """Construit l'URL d'un endpoint à partir de l'URL /signals du bot"""
+    return bot['url'].replace('/signals', f'/{endpoint}')
+
+def _breaker_open(bot):
+    state = _bot_breakers.get(bot['name'])
+    return state is not None and state['open_until'] > time.monotonic()
+
+def _record_result(bot, ok):
+    """Met à jour le disjoncteur du bot après un appel"""
+    with _bot_lock:
+        state = _bot_breakers.setdefault(bot['name'], {'failures': 0, 'open_until': 0.0})
+        if ok:
+            state['failures'] = 0
+            state['open_until'] = 0.0
+        else:
+            state['failures'] += 1
+            if state['failures'] >= BOT_CB_FAILURES:
+                state['open_until'] = time.monotonic() + BOT_CB_COOLDOWN
+
+def fetch_bot(bot, endpoint, timeout=None):
+    """
+    Interroge un endpoint d'un bot (avec cache et disjoncteur).
+    Retourne un dict {'bot', 'status_code', 'data', 'error'}
+    """
+    key = (bot['name'], endpoint)
+    now = time.monotonic()
+    cached = _bot_cache.get(key)
+    if cached and now - cached[0] < BOT_CACHE_TTL:
+        return cached[1]
+
+    if _breaker_open(bot):
+        return {'bot': bot, 'status_code': None, 'data': None, 'error': 'circuit ouvert'}
+
+    result = {'bot': bot, 'status_code': None, 'data': None, 'error': None}
+    try:
+        response = _get_session(bot).get(_bot_url(bot, endpoint), timeout=timeout or bot['timeout'])
+        result['status_code'] = response.status_code
+        if response.status_code == 200:
+            result['data'] = response.json()
+        # 5xx : bot joignable mais en panne, compte comme un échec du disjoncteur
+        _record_result(bot, response.status_code < 500)
+    except Exception as e:
+        result['error'] = str(e)
+        _record_result(bot, False)
+
+    _bot_cache[key] = (time.monotonic(), result)
+    return result
+
+def fetch_all_bots(*endpoints, timeout=None):
+    """
+    Interroge tous les bots en parallèle sur un ou plusieurs endpoints.
+    Retourne {endpoint: [résultat par bot, dans l'ordre de BOTS]}
+    """
+    futures = {
+        endpoint: [_bot_executor.submit(fetch_bot, bot, endpoint, timeout) for bot in BOTS]
+        for endpoint in endpoints
+    }
+    return {endpoint: [f.result() for f in fs] for endpoint, fs in futures.items()}
+
+def bots_health():
+    """État des disjoncteurs pour le debug"""
+    now = time.monotonic()
+    return {
+        bot['name']: {
+            'failures': _bot_breakers.get(bot['name'], {}).get('failures', 0),
+            'circuit_open': _breaker_open(bot),
+            'retry_in_s': round(max(0.0, _bot_breakers.get(bot['name'], {}).get('open_until', 0.0) - now), 1)
+        }
+        for bot in BOTS
+    }
+
 # =========================
 # FONCTIONS D'ACCÈS DIRECT AUX BOTS
 # =========================
@@ -82,20 +186,16 @@ def fetch_signals_from_bots():
     
     print(f"\n🔍 Interrogation des bots à {datetime.now().strftime('%H:%M:%S')}", flush=True)
     
-    for bot in BOTS:
-        try:
-            print(f"   → Tentative de connexion à {bot['name']}: {bot['url']}", flush=True)
-            response = requests.get(bot['url'], timeout=bot['timeout'])
-            
-            if response.status_code == 200:
-                signals = response.json()
-                print(f"   ✅ {bot['name']}: {len(signals)} signaux reçus", flush=True)
-                all_signals.extend(signals)
-            else:
-                print(f"   ⚠️ {bot['name']}: code {response.status_code}", flush=True)
-                
-        except Exception as e:
-            print(f"   ❌ {bot['name']}: Erreur {e}", flush=True)
+    for res in fetch_all_bots('signals')['signals']:
+        bot = res['bot']
+        if res['error']:
+            print(f"   ❌ {bot['name']}: Erreur {res['error']}", flush=True)
+        elif res['status_code'] == 200:
+            signals = res['data'] or []
+            print(f"   ✅ {bot['name']}: {len(signals)} signaux reçus", flush=True)
+            all_signals.extend(signals)
+        else:
+            print(f"   ⚠️ {bot['name']}: code {res['status_code']}", flush=True)
     
     print(f"   Total signaux reçus: {len(all_signals)}", flush=True)
     
@@ -157,22 +257,19 @@ def get_overview():
     total_executed_signals = 0
     total_signals_count = 0
     
-    for bot in BOTS:
-        try:
-            # Status pour les métriques de base
-            response = requests.get(bot['url'].replace('/signals', '/status'), timeout=2)
-            if response.status_code == 200:
-                status = response.json()
-                all_metrics['total_pnl_usdt'] += status.get('daily_pnl', 0)
-                
-            # Signaux pour le taux d'exécution
-            sig_response = requests.get(bot['url'], timeout=2)
-            if sig_response.status_code == 200:
-                signals = sig_response.json()
-                total_signals_count += len(signals)
-                total_executed_signals += sum(1 for s in signals if s.get('executed'))
-        except:
-            pass
+    results = fetch_all_bots('status', 'signals', timeout=2)
+
+    # Status pour les métriques de base
+    for res in results['status']:
+        if res['data']:
+            all_metrics['total_pnl_usdt'] += res['data'].get('daily_pnl', 0)
+
+    # Signaux pour le taux d'exécution
+    for res in results['signals']:
+        if res['data']:
+            signals = res['data']
+            total_signals_count += len(signals)
+            total_executed_signals += sum(1 for s in signals if s.get('executed'))
             
     return jsonify({
         'risk_metrics': all_metrics,
@@ -236,17 +333,15 @@ def get_parameters():
 def get_recent_trades():
     """API - Trades récents agrégés"""
     all_trades = []
-    for bot in BOTS:
-        try:
-            response = requests.get(bot['url'].replace('/signals', '/trades'), timeout=2)
-            if response.status_code == 200:
-                trades = response.json()
-                # Marquer l'origine si pas présent
-                for t in trades:
-                    if 'bot_name' not in t: t['bot_name'] = bot['name']
-                all_trades.extend(trades)
-        except:
-            pass
+    for res in fetch_all_bots('trades', timeout=2)['trades']:
+        if not res['data']:
+            continue
+        # Copie : les résultats sont partagés via le cache
+        trades = [dict(t) for t in res['data']]
+        # Marquer l'origine si pas présent
+        for t in trades:
+            if 'bot_name' not in t: t['bot_name'] = res['bot']['name']
+        all_trades.extend(trades)
             
     # Trier par date décroissante
     all_trades.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
@@ -280,17 +375,15 @@ def check_balance():
     """Vérifie le solde et la configuration des bots"""
     results = {}
     
-    for bot in BOTS:
-        try:
-            # Appeler l'API du bot pour obtenir des infos
-            response = requests.get(bot['url'].replace('/signals', '/health'), timeout=3)
-            if response.status_code == 200:
-                # Ici on pourrait ajouter une route /status dans chaque bot
-                results[bot['name']] = {'status': '✅ OK'}
-            else:
-                results[bot['name']] = {'status': f'⚠️ {response.status_code}'}
-        except Exception as e:
-            results[bot['name']] = {'status': f'❌ {str(e)}'}
+    for res in fetch_all_bots('health', timeout=3)['health']:
+        name = res['bot']['name']
+        if res['error']:
+            results[name] = {'status': f"❌ {res['error']}"}
+        elif res['status_code'] == 200:
+            # Ici on pourrait ajouter une route /status dans chaque bot
+            results[name] = {'status': '✅ OK'}
+        else:
+            results[name] = {'status': f"⚠️ {res['status_code']}"}
     
     return jsonify(results)
 
@@ -300,11 +393,13 @@ def analyze_bots():
     """Analyse détaillée des signaux de chaque bot"""
     results = {}
     
-    for bot in BOTS:
+    for res in fetch_all_bots('signals', timeout=3)['signals']:
+        bot = res['bot']
         try:
-            response = requests.get(bot['url'], timeout=3)
-            if response.status_code == 200:
-                signals = response.json()
+            if res['error']:
+                results[bot['name']] = {'error': res['error']}
+            elif res['status_code'] == 200:
+                signals = res['data']
                 
                 # Analyser les champs des signaux
                 bot_results = {
@@ -329,7 +424,7 @@ def analyze_bots():
                 
                 results[bot['name']] = bot_results
             else:
-                results[bot['name']] = {'error': f'HTTP {response.status_code}'}
+                results[bot['name']] = {'error': f"HTTP {res['status_code']}"}
         except Exception as e:
             results[bot['name']] = {'error': str(e)}
     
@@ -342,17 +437,12 @@ def get_current_positions():
     all_positions = []
     total_pnl = 0
     
-    for bot in BOTS:
-        try:
-            response = requests.get(bot['url'].replace('/signals', '/positions'), timeout=2)
-            if response.status_code == 200:
-                positions = response.json()
-                for p in positions:
-                    if 'bot' not in p: p['bot'] = bot['name']
-                    all_positions.append(p)
-                    total_pnl += p.get('pnl_usdt', 0)
-        except:
-            pass
+    for res in fetch_all_bots('positions', timeout=2)['positions']:
+        for p in res['data'] or []:
+            p = dict(p)
+            if 'bot' not in p: p['bot'] = res['bot']['name']
+            all_positions.append(p)
+            total_pnl += p.get('pnl_usdt') or 0
             
     return jsonify({
         'positions': all_positions,
@@ -377,33 +467,33 @@ def get_worst_trades():
 def debug():
     """Route de debug pour voir l'état des connexions"""
     results = []
-    for bot in BOTS:
-        try:
-            response = requests.get(bot['url'], timeout=2)
-            if response.status_code == 200:
-                data = response.json()
-                results.append({
-                    'bot': bot['name'],
-                    'status': '✅ OK',
-                    'count': len(data),
-                    'sample': data[:2] if data else []
-                })
-            else:
-                results.append({
-                    'bot': bot['name'],
-                    'status': f'⚠️ Code {response.status_code}',
-                    'count': 0
-                })
-        except Exception as e:
+    for res in fetch_all_bots('signals', timeout=2)['signals']:
+        bot = res['bot']
+        if res['error']:
+            results.append({
+                'bot': bot['name'],
+                'status': f"❌ {res['error']}",
+                'count': 0
+            })
+        elif res['status_code'] == 200:
+            data = res['data']
+            results.append({
+                'bot': bot['name'],
+                'status': '✅ OK',
+                'count': len(data),
+                'sample': data[:2] if data else []
+            })
+        else:
             results.append({
                 'bot': bot['name'],
-                'status': f'❌ {str(e)}',
+                'status': f"⚠️ Code {res['status_code']}",
                 'count': 0
             })
     
     return jsonify({
         'timestamp': datetime.now().isoformat(),
-        'bots': results
+        'bots': results,
+        'circuit_breakers': bots_health()
     })
 
 # =========================
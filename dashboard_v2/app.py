@@ -537,7 +537,10 @@ def render_visual_backtester():
         tp_m     = p2.number_input("TP ATR Multiplier", value=2.0 if strat == "Scalping 5M" else 3.0, step=0.1)
         score_th = p3.number_input("Score Threshold", value=3, min_value=1, max_value=5,
                                    help="Non utilisé pour Zone2 AI (seuil interne: 2/3 momentum)")
-        hours    = st.slider("Période (heures)", min_value=24, max_value=240, value=72, step=24)
+        # Avec l'archive locale (market_data.py) l'historique n'est plus limité à 1000 bougies
+        from auto_tuner import USE_MARKET_ARCHIVE
+        max_hours = 24 * 180 if USE_MARKET_ARCHIVE else 240
+        hours    = st.slider("Période (heures)", min_value=24, max_value=max_hours, value=72, step=24)
         submitted = st.form_submit_button("▶️ Lancer la simulation", type="primary", use_container_width=True)
 
     if submitted:
@@ -567,6 +570,7 @@ def render_visual_backtester():
                     capital = 1000.0
                     equity_curve, time_axis = [capital], [df['timestamp'].iloc[0]]
                     wins, losses, total = 0, 0, 0
+                    r_multiples = []   # résultats en R pour le Monte Carlo
                     start_idx = 110
 
                     for i in range(start_idx, len(df) - 1):
@@ -576,6 +580,7 @@ def render_visual_backtester():
                             outcome = tuner.simulate_trade(df, i, signal, p)
                             if outcome != 0:
                                 total += 1
+                                r_multiples.append(outcome / p['sl_multi'])
                                 trade_pnl = outcome * atr * (capital * 0.02 / (atr * p['sl_multi']))
                                 capital += trade_pnl
                                 if outcome > 0: wins += 1; buy_x.append(df['timestamp'].iloc[i]); buy_y.append(df['close'].iloc[i])
@@ -587,24 +592,23 @@ def render_visual_backtester():
             elif strat == "Zone2 AI (BIOS/OTE)":
                 from strategy_ai_enhanced import (
                     apply_indicators as apply_z2,
-                    check_signal as check_z2,
-                    reset_state,
+                    replay_signals,
                 )
-                BT_SYM = "__BACKTEST__"
-                reset_state(BT_SYM)
 
                 with st.spinner("Simulation Zone2 AI (stateful BIOS/OTE)..."):
                     df_ind = apply_z2(df_raw.copy())  # pre-compute for simulate_trade ATR
                     df = df_raw.copy()
+                    # Machine à états rejouée en une passe (mêmes signaux que le bot live)
+                    z2_signals = replay_signals(df_ind)
                     buy_x, buy_y, sell_x, sell_y = [], [], [], []
                     capital = 1000.0
                     equity_curve, time_axis = [capital], [df['timestamp'].iloc[0]]
                     wins, losses, total = 0, 0, 0
+                    r_multiples = []   # résultats en R pour le Monte Carlo
                     start_idx = 55  # EMA50 warmup
 
                     for i in range(start_idx, len(df) - 1):
-                        slice_raw = df.iloc[:i+1]
-                        signal = check_z2(slice_raw, symbol=BT_SYM)
+                        signal = z2_signals[i]
                         if signal:
                             atr = df_ind['atr'].iloc[i] if 'atr' in df_ind.columns else 0
                             if atr <= 0:
@@ -612,6 +616,7 @@ def render_visual_backtester():
                             outcome = tuner.simulate_trade(df_ind, i, signal, p)
                             if outcome != 0:
                                 total += 1
+                                r_multiples.append(outcome / p['sl_multi'])
                                 trade_pnl = outcome * atr * (capital * 0.02 / (atr * p['sl_multi']))
                                 capital += trade_pnl
                                 if outcome > 0: wins += 1; buy_x.append(df['timestamp'].iloc[i]); buy_y.append(df['close'].iloc[i])
@@ -619,8 +624,6 @@ def render_visual_backtester():
                                 equity_curve.append(capital)
                                 time_axis.append(df['timestamp'].iloc[i])
 
-                reset_state(BT_SYM)
-
             # ── V6 / V7 (logique existante) ───────────────────────────────────
             else:
                 strat_name = 'v6_aggressive' if strat == "V6 Aggressive" else 'v7_robust'
@@ -633,6 +636,7 @@ def render_visual_backtester():
                     capital = 1000.0
                     equity_curve, time_axis = [capital], [df['timestamp'].iloc[0]]
                     wins, losses, total = 0, 0, 0
+                    r_multiples = []   # résultats en R pour le Monte Carlo
                     start_idx = 200 if strat_name == 'v7_robust' else 25
 
                     for i in range(start_idx, len(df) - 1):
@@ -642,6 +646,7 @@ def render_visual_backtester():
                             outcome = tuner.simulate_trade(df, i, signal, p)
                             if outcome != 0:
                                 total += 1
+                                r_multiples.append(outcome / p['sl_multi'])
                                 trade_pnl = outcome * atr * (capital * 0.02 / (atr * p['sl_multi']))
                                 capital += trade_pnl
                                 if outcome > 0: wins += 1; buy_x.append(df['timestamp'].iloc[i]); buy_y.append(df['close'].iloc[i])
@@ -693,6 +698,27 @@ def render_visual_backtester():
                                      margin=dict(l=0, r=0, t=10, b=0))
                 st.plotly_chart(fig_eq, use_container_width=True)
 
+            # Robustesse Monte Carlo : séquences rééchantillonnées des trades (MONTE_CARLO_SIMS)
+            if total >= 5:
+                from monte_carlo import simulate, N_SIMULATIONS
+                mc = simulate(r_multiples, risk_per_trade=0.02)
+                st.markdown(f'<div class="section-title">🎲 Monte Carlo ({N_SIMULATIONS} séquences)</div>', unsafe_allow_html=True)
+                c1, c2, c3, c4, c5, c6 = st.columns(6)
+                c1.metric("ROI p5",         f"{mc['return_pct'][5]:+.1f}%")
+                c2.metric("ROI médian",     f"{mc['return_pct'][50]:+.1f}%")
+                c3.metric("ROI p95",        f"{mc['return_pct'][95]:+.1f}%")
+                c4.metric("Max DD (p5)",    f"{mc['max_drawdown_pct'][5]:.1f}%")
+                c5.metric("Proba. ruine",   f"{mc['prob_ruin']:.1%}")
+                c6.metric("Proba. perte",   f"{mc['prob_loss']:.1%}")
+                fig_mc = px.histogram(x=mc['final_returns_pct'], nbins=60,
+                                      labels={'x': 'ROI final (%)'}, color_discrete_sequence=['#00CC77'])
+                fig_mc.add_vline(x=mc['return_pct'][5], line_dash="dash", line_color="#FF4B4B",
+                                 annotation_text="p5")
+                fig_mc.add_vline(x=roi, line_color="#FFFFFF", annotation_text="Backtest")
+                fig_mc.update_layout(template="plotly_dark", height=250, showlegend=False,
+                                     margin=dict(l=0, r=0, t=10, b=0), yaxis_title="Séquences")
+                st.plotly_chart(fig_mc, use_container_width=True)
+
         except Exception as e:
             st.error(f"Erreur simulation : {e}")
             import traceback
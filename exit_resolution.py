@@ -0,0 +1,143 @@
+"""
+Résolution des sorties SL / TP / trailing stop pour les backtests
+
+resolve_exit() travaille sur n'importe quelle série de bougies : sur les
+bougies du timeframe de la stratégie (5m, 1h...) il faut supposer le SL
+touché en premier quand une bougie touche les deux niveaux, ce qui biaise
+les résultats. IntrabarIndex résout la même sortie sur les bougies 1m de
+l'archive locale (market_data) : un index précalculé donne, pour chaque
+bougie du timeframe supérieur, sa tranche [début, fin) de bougies 1m.
+
+Trailing stop modélisé comme sur Bybit (set_trailing_stop) : une fois le prix
+d'activation atteint, le stop suit l'extrême favorable à trailing_distance,
+sans jamais reculer sous le SL initial. Distances identiques à open_trade :
+  - scalping_5m : strategy_scalping_5m.get_trail_params (activation 80% TP,
+    lock 10% TP)
+  - autres      : max(0.5×ATR, 0.15% prix) / max(0.5×ATR, 0.10% prix)
+
+Usage :
+    index = IntrabarIndex.from_archive("BTC/USDT:USDT", df_5m["timestamp"], "5m")
+    exit_i, price, reason, exit_ts = index.resolve(i + 1, end, side, sl, tp, trail)
+"""
+import numpy as np
+
+import market_data
+from strategy_scalping_5m import get_trail_params
+
+M1_MS = 60_000
+
+
+def trail_distances(strategy, price, atr, tp_dist):
+    """(activation_dist, trailing_distance) comme dans open_trade"""
+    if strategy == "scalping_5m":
+        return get_trail_params(tp_dist)
+    return max(atr * 0.5, price * 0.0015), max(atr * 0.5, price * 0.0010)
+
+
+def _first(mask):
+    return int(np.argmax(mask)) if mask.any() else -1
+
+
+def resolve_exit(open_, high, low, close, start, end, side, sl, tp, trail=None):
+    """
+    Première sortie sur les bougies [start, end).
+
+    side  : +1 long / -1 short
+    trail : (activation_price, trailing_distance) ou None
+    Retourne (index, prix de sortie, raison) avec raison ∈ SL / TP / TRAIL / END.
+    Les prix d'un short sont traités comme un long sur les prix opposés.
+    """
+    sgn = 1.0 if side > 0 else -1.0
+    sl_s, tp_s = sgn * sl, sgn * tp
+    act_s = sgn * trail[0] if trail else None
+    trail_dist = trail[1] if trail else 0.0
+
+    j, chunk = start, 64
+    activated, extreme = False, None
+    while j < end:
+        k = min(end, j + chunk)
+        if side > 0:
+            hi, lo, op = high[j:k], low[j:k], open_[j:k]
+        else:
+            hi, lo, op = -low[j:k], -high[j:k], -open_[j:k]
+
+        if not activated:
+            sl_hit = lo <= sl_s
+            tp_hit = hi >= tp_s
+            e = _first(sl_hit | tp_hit)
+            a = _first(hi >= act_s) if act_s is not None else -1
+            if e >= 0 and (a < 0 or e <= a):
+                # Même bougie SL + TP (ou SL + activation) : SL en premier (prudent)
+                if sl_hit[e]:
+                    return j + e, sgn * min(sl_s, op[e]), "SL"
+                return j + e, tp, "TP"
+            if a < 0:
+                j, chunk = k, chunk * 2
+                continue
+            # Activation : le trailing part de l'extrême de cette bougie
+            activated, extreme = True, hi[a]
+            hi, lo, op = hi[a + 1:], lo[a + 1:], op[a + 1:]
+            j = j + a + 1
+            if j >= k:
+                continue
+
+        # Trailing actif : le stop de la bougie t dépend de l'extrême jusqu'à t-1
+        ext = np.maximum.accumulate(np.concatenate(([extreme], hi)))
+        stop = np.maximum(sl_s, ext[:-1] - trail_dist)
+        stop_hit = lo <= stop
+        tp_hit = hi >= tp_s
+        e = _first(stop_hit | tp_hit)
+        if e >= 0:
+            if stop_hit[e]:
+                return j + e, sgn * min(stop[e], op[e]), "TRAIL" if stop[e] > sl_s else "SL"
+            return j + e, tp, "TP"
+        extreme = ext[-1]
+        j = j + len(hi)
+        chunk *= 2
+    return end - 1, close[end - 1], "END"
+
+
+class IntrabarIndex:
+    """Bougies 1m d'un symbole + index bougie HTF → tranche 1m"""
+
+    def __init__(self, m1, htf_timestamps, timeframe):
+        self.m1 = m1
+        self.htf_ts = np.asarray(htf_timestamps, dtype=np.int64)
+        self.htf_ms = market_data.TIMEFRAME_MS[timeframe]
+        m1_ts = m1["timestamp"]
+        self.lo = np.searchsorted(m1_ts, self.htf_ts, side="left")
+        self.hi = np.searchsorted(m1_ts, self.htf_ts + self.htf_ms, side="left")
+        # Bougie HTF couverte si toutes ses bougies 1m sont présentes
+        covered = (self.hi - self.lo) == self.htf_ms // M1_MS
+        # uncovered_before[b] = nb de bougies HTF non couvertes dans [0, b)
+        self.uncovered_before = np.concatenate(([0], np.cumsum(~covered)))
+        self.fallbacks = 0
+
+    @classmethod
+    def from_archive(cls, symbol, htf_timestamps, timeframe, root=None):
+        return cls(market_data.load_candles(symbol, "1m", root), htf_timestamps, timeframe)
+
+    def covers(self, start, end):
+        """True si les bougies HTF [start, end) ont toutes leurs bougies 1m"""
+        return end > start and self.uncovered_before[end] == self.uncovered_before[start]
+
+    def resolve(self, start, end, side, sl, tp, trail=None, htf=None):
+        """
+        Sortie sur les bougies HTF [start, end) résolue en 1m.
+        htf : (open, high, low, close) du timeframe supérieur, utilisé en repli
+        si l'archive 1m ne couvre pas la période.
+        Retourne (index HTF, prix, raison, timestamp de sortie).
+        """
+        if not self.covers(start, end):
+            if htf is None:
+                raise ValueError("Archive 1m incomplète pour cette période")
+            self.fallbacks += 1
+            idx, price, reason = resolve_exit(*htf, start, end, side, sl, tp, trail)
+            return idx, price, reason, int(self.htf_ts[idx])
+
+        m1 = self.m1
+        m_start, m_end = int(self.lo[start]), int(self.hi[end - 1])
+        idx, price, reason = resolve_exit(m1["open"], m1["high"], m1["low"], m1["close"],
+                                          m_start, m_end, side, sl, tp, trail)
+        htf_idx = start + int(np.searchsorted(self.hi[start:end], idx, side="right"))
+        return min(htf_idx, end - 1), price, reason, int(m1["timestamp"][idx])
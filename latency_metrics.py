@@ -0,0 +1,194 @@
+"""
+Instrumentation de latence du hot-path des bots
+
+- Spans de timing par étape et par symbole (fetch, indicators, signal,
+  order, save_state, log) avec quantiles p50/p95/p99
+- Comptage des appels REST par endpoint (nombre, poids ccxt, latence,
+  erreurs de rate-limit) via un wrapper sur exchange.request
+- Durée de chaque cycle de bot_loop
+- Export au format texte Prometheus pour la route /metrics
+
+Usage :
+    metrics = get_metrics(BOT_NAME)
+    metrics.instrument_exchange(exchange)
+    with metrics.span("fetch", symbol):
+        df = fetch_data(symbol)
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import ccxt
+
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW_SIZE = 2048   # échantillons conservés par série pour les quantiles
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class LatencyMetrics:
+    """Registre de métriques d'un bot (thread-safe, coût O(1) par observation)"""
+
+    HELP = {
+        "bot_stage_latency_seconds":   ("summary", "Durée d'une étape du hot-path par symbole"),
+        "bot_cycle_duration_seconds":  ("summary", "Durée d'un cycle complet de bot_loop"),
+        "bot_rest_latency_seconds":    ("summary", "Latence des appels REST par endpoint"),
+        "bot_rest_calls_total":        ("counter", "Nombre d'appels REST par endpoint"),
+        "bot_rest_weight_total":       ("counter", "Poids ccxt (rate-limit cost) consommé par endpoint"),
+        "bot_rest_errors_total":       ("counter", "Erreurs REST par endpoint"),
+        "bot_rate_limit_errors_total": ("counter", "Erreurs de rate-limit par endpoint"),
+        "bot_cycles_total":            ("counter", "Nombre de cycles de bot_loop"),
+        "bot_signal_to_fill_seconds":  ("summary", "Délai entre le signal et le fill de l'ordre d'entrée"),
+        "bot_candle_to_fill_seconds":  ("summary", "Délai entre la clôture de bougie et le fill de l'ordre d'entrée"),
+        "bot_entry_slippage_bps":      ("summary", "Slippage du fill vs prix du signal (bps, positif = défavorable)"),
+    }
+
+    def __init__(self, bot_name, window=WINDOW_SIZE):
+        self.bot_name = bot_name
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}   # (name, labels) -> deque de durées
+        self._totals = {}    # (name, labels) -> [count, sum]
+        self._counters = {}  # (name, labels) -> valeur
+
+    def _key(self, name, labels):
+        return name, (("bot", self.bot_name),) + tuple(sorted(labels.items()))
+
+    # ── Enregistrement ────────────────────────────────────────────────────────
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+                self._totals[key] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, stage, symbol=None):
+        """Mesure la durée d'une étape du hot-path"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            labels = {"stage": stage}
+            if symbol:
+                labels["symbol"] = symbol
+            self.observe("bot_stage_latency_seconds", time.perf_counter() - start, **labels)
+
+    def record_cycle(self, started_at):
+        """Enregistre la durée d'un cycle de bot_loop (started_at = time.perf_counter())"""
+        self.observe("bot_cycle_duration_seconds", time.perf_counter() - started_at)
+        self.inc("bot_cycles_total")
+
+    # ── Appels REST ───────────────────────────────────────────────────────────
+    def instrument_exchange(self, exchange):
+        """
+        Enveloppe exchange.request : chaque appel REST (unifié ou implicite
+        private_*/public_*) est compté, pesé et chronométré par endpoint.
+        Un PaperExchange est instrumenté sur l'exchange réel qu'il enveloppe.
+        """
+        exchange = getattr(exchange, "inner", exchange)
+        if getattr(exchange, "_latency_metrics", None) is self:
+            return exchange
+        original_request = exchange.request
+        metrics = self
+
+        def request(path, api="public", method="GET", params={}, headers=None, body=None, config={}):
+            endpoint = f"{method} {path}"
+            start = time.perf_counter()
+            try:
+                return original_request(path, api, method, params, headers, body, config)
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+                metrics.inc("bot_rate_limit_errors_total", endpoint=endpoint)
+                raise
+            except Exception:
+                metrics.inc("bot_rest_errors_total", endpoint=endpoint)
+                raise
+            finally:
+                metrics.observe("bot_rest_latency_seconds", time.perf_counter() - start, endpoint=endpoint)
+                metrics.inc("bot_rest_calls_total", endpoint=endpoint)
+                metrics.inc("bot_rest_weight_total", (config or {}).get("cost", 1), endpoint=endpoint)
+
+        exchange.request = request
+        exchange._latency_metrics = self
+        return exchange
+
+    # ── Lecture / export ──────────────────────────────────────────────────────
+    def quantiles(self, name, **labels):
+        """Retourne {0.5: .., 0.95: .., 0.99: ..} pour une série"""
+        key = self._key(name, labels)
+        with self._lock:
+            values = sorted(self._samples.get(key, ()))
+        return {q: _quantile(values, q) for q in QUANTILES}
+
+    def render_prometheus(self):
+        """Export texte au format d'exposition Prometheus"""
+        with self._lock:
+            samples = {k: sorted(v) for k, v in self._samples.items()}
+            totals = {k: list(v) for k, v in self._totals.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        declared = set()
+
+        def declare(name):
+            if name in declared:
+                return
+            declared.add(name)
+            kind, help_text = self.HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), values in sorted(samples.items()):
+            declare(name)
+            for q in QUANTILES:
+                q_labels = labels + (("quantile", q),)
+                lines.append(f"{name}{_format_labels(q_labels)} {_quantile(values, q):.6f}")
+            count, total = totals[(name, labels)]
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for (name, labels), value in sorted(counters.items()):
+            declare(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Instance globale pour chaque bot
+_registries = {}
+
+
+def get_metrics(bot_name):
+    """Factory pour obtenir le registre de métriques d'un bot"""
+    if bot_name not in _registries:
+        _registries[bot_name] = LatencyMetrics(bot_name)
+    return _registries[bot_name]
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
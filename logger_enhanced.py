@@ -17,12 +17,14 @@ class EnhancedLogger:
         self.bot_name = bot_name
         self.trades_file = "logs/trades_detailed.csv"
         self.signals_file = "logs/signals_log.csv"
+        self.executions_file = "logs/executions.csv"
         self.performance_file = "logs/performance.json"
         self.errors_file = "logs/errors.log"
         
         # Initialiser les fichiers
         self._init_trades_file()
         self._init_signals_file()
+        self._init_executions_file()
         
     def _init_trades_file(self):
         """Initialise le fichier des trades détaillés"""
@@ -83,6 +85,45 @@ class EnhancedLogger:
                     'reason_not_executed'
                 ])
     
+    EXECUTION_COLUMNS = [
+        'timestamp',
+        'bot_name',
+        'symbol',
+        'side',
+        'order_id',
+        'signal_price',
+        'fill_price',
+        'slippage_bps',
+        'commission_paid',
+        'candle_close_time',
+        'signal_time',
+        'order_sent_time',
+        'fill_time',
+        'candle_to_signal_ms',
+        'signal_to_send_ms',
+        'send_to_fill_ms',
+        'candle_to_fill_ms'
+    ]
+
+    def _init_executions_file(self):
+        """Initialise le fichier des exécutions (latences signal → fill)"""
+        if not os.path.exists(self.executions_file):
+            with open(self.executions_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.EXECUTION_COLUMNS)
+
+    def log_execution(self, execution_data):
+        """
+        Log le chemin signal → ordre → fill d'une entrée (horodatages en ms)
+        """
+        try:
+            with open(self.executions_file, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                row = {'timestamp': datetime.now().isoformat(), 'bot_name': self.bot_name, **execution_data}
+                writer.writerow([row.get(col, '') for col in self.EXECUTION_COLUMNS])
+        except Exception as e:
+            self.log_error(f"Erreur log_execution: {e}")
+    
     def log_signal(self, signal_data):
         """
         Log un signal (même non executé)
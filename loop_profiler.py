@@ -0,0 +1,146 @@
+"""
+Profileur par échantillonnage à la demande pour la boucle de trading
+
+Un thread échantillonne la pile du thread cible (bot_loop) à fréquence fixe
+pendant N secondes, puis écrit un fichier de piles « collapsed »
+(format flamegraph.pl / speedscope / inferno) dans logs/.
+
+Aucun coût quand il est inactif : rien n'est installé dans la boucle,
+le thread d'échantillonnage n'existe que pendant une capture.
+
+Déclenchement :
+  - route API   : GET /api/profile?seconds=30&hz=100
+  - signal Unix : kill -USR1 <pid>  (durée/fréquence par défaut)
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_SECONDS = float(os.getenv("PROFILE_SECONDS", "30"))
+DEFAULT_HZ = float(os.getenv("PROFILE_HZ", "100"))
+MAX_SECONDS = 600
+MAX_HZ = 1000
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame):
+    """Pile du frame courant, de la racine vers la feuille, au format collapsed"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class LoopProfiler:
+    def __init__(self, bot_name, output_dir="logs"):
+        self.bot_name = bot_name
+        self.output_dir = output_dir
+        self.target_thread = None
+        self._lock = threading.Lock()
+        self._running = None   # dict décrivant la capture en cours
+        self.last_output = None
+
+    def attach(self, thread_ident=None):
+        """Désigne le thread à échantillonner (par défaut : le thread appelant)"""
+        self.target_thread = thread_ident or threading.get_ident()
+
+    def is_running(self):
+        return self._running is not None
+
+    def status(self):
+        running = self._running
+        return {
+            "running": running is not None,
+            "started_at": running["started_at"] if running else None,
+            "seconds": running["seconds"] if running else None,
+            "hz": running["hz"] if running else None,
+            "last_output": self.last_output,
+        }
+
+    def start(self, seconds=DEFAULT_SECONDS, hz=DEFAULT_HZ):
+        """Lance une capture en arrière-plan. Retourne False si une capture est déjà en cours."""
+        if self.target_thread is None:
+            raise RuntimeError("Profiler non attaché à un thread (appeler attach())")
+        seconds = max(1.0, min(float(seconds), MAX_SECONDS))
+        hz = max(1.0, min(float(hz), MAX_HZ))
+        with self._lock:
+            if self._running is not None:
+                return False
+            self._running = {
+                "started_at": datetime.now().isoformat(),
+                "seconds": seconds,
+                "hz": hz,
+            }
+        threading.Thread(target=self._sample, args=(seconds, hz), daemon=True,
+                         name="loop-profiler").start()
+        return True
+
+    def _sample(self, seconds, hz):
+        stacks = Counter()
+        interval = 1.0 / hz
+        deadline = time.monotonic() + seconds
+        next_tick = time.monotonic()
+        samples = 0
+        try:
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(self.target_thread)
+                if frame is None:
+                    break   # thread terminé
+                stacks[_collapse(frame)] += 1
+                samples += 1
+                del frame
+                next_tick += interval
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_tick = time.monotonic()   # on a pris du retard, on ne rattrape pas
+            self.last_output = self._write(stacks)
+            print(f"🔬 Profil {self.bot_name}: {samples} échantillons → {self.last_output}", flush=True)
+        except Exception as e:
+            print(f"⚠️ Profil {self.bot_name} échoué: {e}", flush=True)
+        finally:
+            self._running = None
+
+    def _write(self, stacks):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.output_dir, f"profile_{self.bot_name}_{stamp}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def install_signal_handler(self, signum=getattr(signal, "SIGUSR1", None)):
+        """Déclenche une capture par signal (à appeler depuis le thread principal, après attach())"""
+        if signum is None:
+            return False
+
+        def handler(_signum, _frame):
+            # Le handler interrompt le thread principal n'importe où, y compris
+            # pendant start() qui tient self._lock (non réentrant) : il ne fait
+            # que lancer un thread qui démarre la capture
+            try:
+                threading.Thread(target=self._start_from_signal, daemon=True,
+                                 name="loop-profiler-signal").start()
+            except Exception:
+                pass
+
+        signal.signal(signum, handler)
+        return True
+
+    def _start_from_signal(self):
+        try:
+            if not self.start():
+                print(f"⚠️ Profil {self.bot_name}: capture déjà en cours", flush=True)
+        except Exception as e:
+            print(f"⚠️ Profil {self.bot_name} non démarré: {e}", flush=True)
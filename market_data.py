@@ -0,0 +1,421 @@
+"""
+Données de marché hors-ligne : enregistrement et génération synthétique
+
+Stockage : une série par (symbole, timeframe) dans
+    data/market/<SYMBOLE>/<timeframe>/
+        timestamp.i8  open.f8  high.f8  low.f8  close.f8  volume.f8  meta.json
+Chaque colonne est un fichier binaire brut à largeur fixe (int64 / float64
+little-endian), chargé en np.memmap : ouverture O(1), aucune copie tant qu'on
+ne modifie pas les données.
+
+Les séries s'allongent par ajout en fin de fichier (append_candles) : sync()
+télécharge uniquement les bougies manquantes, page par page (since=), ce
+qui permet de constituer des mois/années d'historique 1m pour les backtests.
+
+Deux sources :
+  - sync() / record() : archive l'OHLCV live Bybit (1m / 5m / 4h par défaut)
+  - generate() : régimes synthétiques (tendance, range, chocs de volatilité,
+                 gaps) de longueur arbitraire, reproductibles via la graine
+
+Usage :
+    python market_data.py record --symbols BTC/USDT:USDT,ETH/USDT:USDT
+    python market_data.py sync --symbols BTC/USDT:USDT --timeframes 1m --days 365
+    python market_data.py synth --symbol SYN/USDT:USDT --timeframe 1m --bars 1000000 --seed 7
+    python market_data.py info
+
+    df = load_dataframe("BTC/USDT:USDT", "5m")
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", "data/market")
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+DTYPES = {
+    "timestamp": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+TIMEFRAME_MS = {
+    # Sous la minute : bougies construites depuis les trades publics (trade_bars.py)
+    "5s": 5_000, "15s": 15_000, "30s": 30_000,
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+RECORD_TIMEFRAMES = ("1m", "5m", "4h")
+PAGE_LIMIT = 1000   # max bougies par requête kline Bybit
+
+
+# =========================
+# STOCKAGE
+# =========================
+def _safe_symbol(symbol):
+    return symbol.replace("/", "_").replace(":", "_")
+
+
+def series_dir(symbol, timeframe, root=None):
+    return os.path.join(root or MARKET_DATA_DIR, _safe_symbol(symbol), timeframe)
+
+
+def _column_path(directory, column):
+    suffix = "i8" if column == "timestamp" else "f8"
+    return os.path.join(directory, f"{column}.{suffix}")
+
+
+def _as_columns(candles):
+    """DataFrame / liste ccxt / dict de colonnes → dict de ndarrays typés"""
+    if isinstance(candles, pd.DataFrame):
+        return {c: candles[c].to_numpy(dtype=DTYPES[c]) for c in COLUMNS}
+    if isinstance(candles, dict):
+        return {c: np.asarray(candles[c], dtype=DTYPES[c]) for c in COLUMNS}
+    arr = np.asarray(candles, dtype=np.float64).reshape(-1, len(COLUMNS))
+    return {c: arr[:, i].astype(DTYPES[c]) for i, c in enumerate(COLUMNS)}
+
+
+def write_candles(symbol, timeframe, candles, root=None, source="bybit"):
+    """Écrit (remplace) une série complète. Écriture atomique colonne par colonne."""
+    columns = _as_columns(candles)
+    directory = series_dir(symbol, timeframe, root)
+    os.makedirs(directory, exist_ok=True)
+    for column in COLUMNS:
+        path = _column_path(directory, column)
+        tmp = path + ".tmp"
+        columns[column].tofile(tmp)
+        os.replace(tmp, path)
+    _write_meta(directory, symbol, timeframe, source, len(columns["timestamp"]))
+    return directory
+
+
+def _write_meta(directory, symbol, timeframe, source, count):
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "source": source,
+            "count": count,
+            "updated_at": int(time.time()),
+        }, f)
+
+
+def load_candles(symbol, timeframe, root=None):
+    """Retourne {colonne: np.memmap en lecture seule} (tableaux vides si la série n'existe pas)"""
+    directory = series_dir(symbol, timeframe, root)
+    columns = {}
+    for column in COLUMNS:
+        path = _column_path(directory, column)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return {c: np.empty(0, dtype=DTYPES[c]) for c in COLUMNS}
+        columns[column] = np.memmap(path, dtype=DTYPES[column], mode="r")
+    # Une écriture interrompue peut laisser des colonnes de longueurs différentes
+    n = min(len(col) for col in columns.values())
+    return {c: col[:n] for c, col in columns.items()}
+
+
+def append_candles(symbol, timeframe, candles, root=None, source="bybit"):
+    """
+    Ajoute en fin de série les bougies postérieures à la dernière stockée.
+    Coût proportionnel au nombre de nouvelles bougies. Retourne le nombre ajouté.
+    """
+    new = _as_columns(candles)
+    existing = load_candles(symbol, timeframe, root)
+    n_existing = len(existing["timestamp"])
+    if n_existing == 0:
+        write_candles(symbol, timeframe, new, root, source)
+        return len(new["timestamp"])
+
+    keep = new["timestamp"] > existing["timestamp"][-1]
+    del existing   # libère les memmaps avant d'écrire
+    if not keep.any():
+        return 0
+
+    directory = series_dir(symbol, timeframe, root)
+    for column in COLUMNS:
+        path = _column_path(directory, column)
+        # Tronque une éventuelle écriture interrompue avant d'ajouter
+        os.truncate(path, n_existing * DTYPES[column].itemsize)
+        with open(path, "ab") as f:
+            new[column][keep].tofile(f)
+    added = int(keep.sum())
+    meta = read_meta(symbol, timeframe, root) or {}
+    _write_meta(directory, symbol, timeframe, meta.get("source", source), n_existing + added)
+    return added
+
+
+def load_dataframe(symbol, timeframe, root=None, start_ms=None, end_ms=None):
+    """Charge une série (ou une fenêtre [start_ms, end_ms)) au format DataFrame ccxt"""
+    columns = load_candles(symbol, timeframe, root)
+    ts = columns["timestamp"]
+    lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side="left"))
+    hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side="left"))
+    return pd.DataFrame({c: np.array(columns[c][lo:hi]) for c in COLUMNS})
+
+
+def read_meta(symbol, timeframe, root=None):
+    path = os.path.join(series_dir(symbol, timeframe, root), "meta.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def available(root=None):
+    """Liste des séries présentes sur disque (métadonnées)"""
+    root = root or MARKET_DATA_DIR
+    series = []
+    if not os.path.isdir(root):
+        return series
+    for sym_dir in sorted(os.listdir(root)):
+        for tf in sorted(os.listdir(os.path.join(root, sym_dir))):
+            meta_path = os.path.join(root, sym_dir, tf, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    series.append(json.load(f))
+    return series
+
+
+# =========================
+# ENREGISTREMENT LIVE
+# =========================
+def _merge(existing, new):
+    """Fusionne deux séries triées ; en cas de doublon, la bougie la plus récente gagne"""
+    if len(existing["timestamp"]) == 0:
+        return new
+    merged = {c: np.concatenate([np.asarray(existing[c]), new[c]]) for c in COLUMNS}
+    # np.unique garde la première occurrence : on inverse pour garder la dernière
+    rev_ts = merged["timestamp"][::-1]
+    _, idx = np.unique(rev_ts, return_index=True)
+    keep = len(rev_ts) - 1 - idx
+    return {c: merged[c][keep] for c in COLUMNS}
+
+
+def _iter_pages(exchange, symbol, timeframe, since_ms, until_ms, page_limit):
+    """
+    Pages de bougies clôturées dans [since_ms, until_ms), via fetch_ohlcv(since=).
+    Une page vide (avant le listing du symbole, maintenance) ne stoppe pas la
+    pagination : le curseur avance d'une page.
+    """
+    tf_ms = TIMEFRAME_MS[timeframe]
+    cursor = since_ms
+    while cursor < until_ms:
+        page = exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=page_limit)
+        page = [c for c in page if cursor <= c[0] < until_ms]
+        if not page:
+            cursor += page_limit * tf_ms
+            continue
+        yield _as_columns(page)
+        cursor = int(page[-1][0]) + tf_ms
+
+
+def sync(exchange, symbol, timeframe, since_ms=None, root=None, page_limit=PAGE_LIMIT):
+    """
+    Complète l'archive jusqu'à la dernière bougie clôturée.
+
+    - reprend après la dernière bougie stockée (ajout page par page)
+    - si since_ms précède le début de l'archive, télécharge aussi l'historique
+      manquant (réécriture ponctuelle de la série)
+    - sans archive ni since_ms : les `page_limit` dernières bougies
+    Retourne le nombre de bougies ajoutées.
+    """
+    tf_ms = TIMEFRAME_MS[timeframe]
+    now_ms = int(time.time() * 1000)
+    until_ms = (now_ms // tf_ms) * tf_ms   # ouverture de la bougie en cours (exclue)
+    if since_ms is not None:
+        since_ms = (int(since_ms) // tf_ms) * tf_ms
+
+    existing = load_candles(symbol, timeframe, root)
+    first_ts = int(existing["timestamp"][0]) if len(existing["timestamp"]) else None
+    last_ts = int(existing["timestamp"][-1]) if len(existing["timestamp"]) else None
+    del existing
+
+    added = 0
+    if first_ts is not None and since_ms is not None and since_ms < first_ts:
+        pages = list(_iter_pages(exchange, symbol, timeframe, since_ms, first_ts, page_limit))
+        if pages:
+            older = {c: np.concatenate([p[c] for p in pages]) for c in COLUMNS}
+            merged = _merge(older, {c: np.array(col) for c, col in load_candles(symbol, timeframe, root).items()})
+            write_candles(symbol, timeframe, merged, root, source="bybit")
+            added += len(older["timestamp"])
+
+    if last_ts is not None:
+        cursor = last_ts + tf_ms
+    elif since_ms is not None:
+        cursor = since_ms
+    else:
+        cursor = until_ms - page_limit * tf_ms
+
+    for page in _iter_pages(exchange, symbol, timeframe, cursor, until_ms, page_limit):
+        added += append_candles(symbol, timeframe, page, root, source="bybit")
+    return added
+
+
+def record(exchange, symbols, timeframes=RECORD_TIMEFRAMES, limit=1000, root=None):
+    """
+    Enregistre au moins les `limit` dernières bougies clôturées de chaque
+    (symbole, timeframe), en complétant l'archive existante.
+    """
+    counts = {}
+    now_ms = int(time.time() * 1000)
+    for symbol in symbols:
+        for tf in timeframes:
+            since_ms = now_ms - (limit + 1) * TIMEFRAME_MS[tf]
+            try:
+                added = sync(exchange, symbol, tf, since_ms=since_ms, root=root)
+            except Exception as e:
+                print(f"⚠️ {symbol} {tf}: {e}", flush=True)
+                continue
+            meta = read_meta(symbol, tf, root) or {}
+            counts[(symbol, tf)] = meta.get("count", 0)
+            print(f"💾 {symbol} {tf}: +{added} → {counts[(symbol, tf)]} bougies", flush=True)
+    return counts
+
+
+# =========================
+# GÉNÉRATION SYNTHÉTIQUE
+# =========================
+# drift en fraction de la volatilité par bougie, vol en multiple de la volatilité de base,
+# revert = retour à la moyenne (MA(1) négatif) pour les ranges
+REGIMES = {
+    "trend_up":   {"drift": 0.15,  "vol": 1.0, "revert": 0.0},
+    "trend_down": {"drift": -0.15, "vol": 1.0, "revert": 0.0},
+    "range":      {"drift": 0.0,   "vol": 0.8, "revert": 0.9},
+    "shock":      {"drift": 0.0,   "vol": 4.0, "revert": 0.0},
+}
+REGIME_WEIGHTS = {"trend_up": 0.25, "trend_down": 0.25, "range": 0.4, "shock": 0.1}
+
+
+def _random_schedule(rng, n_bars, mean_length):
+    names = list(REGIME_WEIGHTS)
+    weights = np.array([REGIME_WEIGHTS[n] for n in names])
+    schedule, total = [], 0
+    while total < n_bars:
+        name = names[rng.choice(len(names), p=weights / weights.sum())]
+        length = int(rng.geometric(1.0 / mean_length))
+        if name == "shock":
+            length = max(1, length // 10)   # les chocs sont brefs
+        length = min(length, n_bars - total)
+        schedule.append((name, length))
+        total += length
+    return schedule
+
+
+def generate(n_bars, seed=42, timeframe="1m", start_price=100.0, regimes=None,
+             mean_regime_length=500, gap_prob=0.0005, base_vol=0.0015,
+             start_ms=1_600_000_000_000):
+    """
+    Génère n_bars bougies OHLCV synthétiques.
+
+    regimes : liste de (nom, nb_bougies) parmi REGIMES, ou None pour un
+    enchaînement aléatoire (longueur moyenne mean_regime_length).
+    base_vol : volatilité log par bougie en 1m, mise à l'échelle en √minutes.
+    Retourne un dict de colonnes (même format que load_candles).
+    """
+    rng = np.random.default_rng(seed)
+    tf_ms = TIMEFRAME_MS[timeframe]
+    vol_bar = base_vol * np.sqrt(tf_ms / 60_000)
+
+    if regimes is None:
+        regimes = _random_schedule(rng, n_bars, mean_regime_length)
+    names = [name for name, _ in regimes]
+    lengths = np.array([length for _, length in regimes])
+    if lengths.sum() < n_bars:
+        raise ValueError(f"Régimes trop courts: {lengths.sum()} < {n_bars} bougies")
+
+    drift = np.repeat([REGIMES[n]["drift"] for n in names], lengths)[:n_bars] * vol_bar
+    vol = np.repeat([REGIMES[n]["vol"] for n in names], lengths)[:n_bars] * vol_bar
+    revert = np.repeat([REGIMES[n]["revert"] for n in names], lengths)[:n_bars]
+
+    noise = rng.standard_normal(n_bars)
+    shocks = noise.copy()
+    shocks[1:] -= revert[1:] * noise[:-1]
+    returns = drift + vol * shocks
+
+    gaps = np.where(rng.random(n_bars) < gap_prob, rng.normal(0, 10 * vol_bar, n_bars), 0.0)
+    gaps[0] = 0.0
+
+    log_close = np.log(start_price) + np.cumsum(gaps + returns)
+    close = np.exp(log_close)
+    open_ = np.exp(log_close - returns)   # = clôture précédente × exp(gap)
+    wick_up = np.exp(np.abs(rng.standard_normal(n_bars)) * vol * 0.5)
+    wick_down = np.exp(-np.abs(rng.standard_normal(n_bars)) * vol * 0.5)
+    high = np.maximum(open_, close) * wick_up
+    low = np.minimum(open_, close) * wick_down
+    volume = rng.lognormal(7.0, 0.5, n_bars) * (1.0 + np.abs(returns) / vol_bar)
+
+    return {
+        "timestamp": start_ms + np.arange(n_bars, dtype=np.int64) * tf_ms,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+    }
+
+
+def synthetic_dataframe(n_bars, seed=42, timeframe="1m", **kwargs):
+    """generate() au format DataFrame ccxt"""
+    return pd.DataFrame(generate(n_bars, seed=seed, timeframe=timeframe, **kwargs))
+
+
+# =========================
+# CLI
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="Enregistrement / génération de données de marché")
+    parser.add_argument("--root", default=MARKET_DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="enregistre l'OHLCV live Bybit")
+    rec.add_argument("--symbols", required=True, help="liste séparée par des virgules")
+    rec.add_argument("--timeframes", default=",".join(RECORD_TIMEFRAMES))
+    rec.add_argument("--limit", type=int, default=1000)
+
+    syn = sub.add_parser("synth", help="génère une série synthétique")
+    syn.add_argument("--symbol", default="SYN/USDT:USDT")
+    syn.add_argument("--timeframe", default="1m")
+    syn.add_argument("--bars", type=int, default=100_000)
+    syn.add_argument("--seed", type=int, default=42)
+    syn.add_argument("--start-price", type=float, default=100.0)
+
+    syc = sub.add_parser("sync", help="archive l'historique Bybit (pagination since=)")
+    syc.add_argument("--symbols", required=True, help="liste séparée par des virgules")
+    syc.add_argument("--timeframes", default="1m")
+    syc.add_argument("--days", type=float, default=30)
+
+    sub.add_parser("info", help="liste les séries enregistrées")
+
+    args = parser.parse_args()
+
+    if args.command in ("record", "sync"):
+        import ccxt
+        exchange = ccxt.bybit({"enableRateLimit": True, "options": {"defaultType": "linear"}})
+        if args.command == "record":
+            record(exchange, args.symbols.split(","), args.timeframes.split(","), args.limit, args.root)
+        else:
+            since_ms = int((time.time() - args.days * 86400) * 1000)
+            for symbol in args.symbols.split(","):
+                for tf in args.timeframes.split(","):
+                    added = sync(exchange, symbol, tf, since_ms=since_ms, root=args.root)
+                    meta = read_meta(symbol, tf, args.root) or {}
+                    print(f"💾 {symbol} {tf}: +{added} → {meta.get('count', 0)} bougies", flush=True)
+    elif args.command == "synth":
+        candles = generate(args.bars, seed=args.seed, timeframe=args.timeframe,
+                           start_price=args.start_price)
+        path = write_candles(args.symbol, args.timeframe, candles, args.root,
+                             source=f"synthetic:seed={args.seed}")
+        print(f"🧪 {args.symbol} {args.timeframe}: {args.bars} bougies → {path}")
+    else:
+        for meta in available(args.root):
+            print(f"{meta['symbol']:<20} {meta['timeframe']:>4} {meta['count']:>10} bougies  ({meta['source']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Structure de marché incrémentale : pivots, jambe d'impulsion, HH/HL/LH/LL
+
+Les stratégies Sniper OTE et BIOS/OTE recalculaient la structure à chaque
+appel : boucle Python sur les 20 dernières bougies H4 pour les pivots
+(detect_dow_trend), argmax/argmin sur 50 bougies M1 pour le swing
+(find_last_swing). MarketStructure garde cet état par symbole et timeframe
+et le met à jour en O(1) amorti par bougie clôturée :
+  - pivots confirmés (haut ≥ ses deux voisins, bas ≤ ses deux voisins),
+    dans la fenêtre de `pivot_lookback` bougies
+  - jambe d'impulsion courante sur `leg_lookback` bougies, par files
+    monotones : plus haut (1re occurrence) et plus bas qui le précède, et
+    symétrique pour un short
+  - état HH/HL/LH/LL des deux derniers pivots → tendance de Dow
+
+sync(df) n'intègre que les nouvelles bougies d'un cadre OHLCV (repérées par
+leur timestamp) ; la dernière bougie du cadre, éventuellement en formation,
+n'est jamais intégrée mais combinée à la lecture. Les résultats sont donc
+identiques à detect_dow_trend / find_last_swing sur le même cadre.
+
+Usage :
+    ms = STRUCTURES.get(symbol, "4h")
+    ms.sync(df_h4)
+    ms.trend(), ms.structure(), ms.last_swing("long")
+"""
+from collections import deque
+
+TIME_COLUMNS = ("time", "timestamp")
+
+
+class _SlidingExtreme:
+    """
+    Minimum (sign=1) ou maximum (sign=-1) glissant par file monotone.
+    En cas d'égalité l'indice le plus ancien est conservé (comme argmin/argmax).
+    """
+
+    def __init__(self, sign):
+        self.sign = sign
+        self._q = deque()   # (indice, valeur signée), valeurs croissantes
+
+    def push(self, index, value):
+        v = self.sign * value
+        q = self._q
+        while q and q[-1][1] > v:
+            q.pop()
+        q.append((index, v))
+
+    def expire(self, start):
+        """Retire les indices < start"""
+        q = self._q
+        while q and q[0][0] < start:
+            q.popleft()
+
+    @property
+    def index(self):
+        return self._q[0][0] if self._q else None
+
+    @property
+    def value(self):
+        return self.sign * self._q[0][1] if self._q else None
+
+
+class _Leg:
+    """
+    Jambe d'impulsion sur une fenêtre glissante de bougies clôturées.
+    Long  : plus haut (extrémité) et plus bas des bougies qui le précèdent.
+    Short : plus bas (extrémité) et plus haut des bougies qui le précèdent.
+    """
+
+    def __init__(self, direction):
+        long_ = direction == 'long'
+        self.end = _SlidingExtreme(-1 if long_ else 1)     # extrémité de la jambe
+        self.origin_all = _SlidingExtreme(1 if long_ else -1)
+        # Origine sur [début de fenêtre, extrémité) : les deux bornes ne font
+        # qu'avancer, une file monotone suffit
+        self.origin = _SlidingExtreme(1 if long_ else -1)
+        self.origin_end = 0
+
+    def update(self, index, end_value, origin_value, window_start, origin_values):
+        self.end.push(index, end_value)
+        self.end.expire(window_start)
+        self.origin_all.push(index, origin_value)
+        self.origin_all.expire(window_start)
+
+        end_index = self.end.index
+        first = max(self.origin_end, window_start)
+        offset = index + 1 - len(origin_values)
+        for k in range(first, end_index):
+            self.origin.push(k, origin_values[k - offset])
+        self.origin_end = max(self.origin_end, end_index)
+        self.origin.expire(window_start)
+
+
+class MarketStructure:
+    """Structure d'un symbole sur un timeframe, mise à jour bougie par bougie"""
+
+    def __init__(self, pivot_lookback=20, leg_lookback=50):
+        self.pivot_lookback = pivot_lookback
+        self.leg_lookback = leg_lookback
+        self.reset()
+
+    def reset(self):
+        self.count = 0                  # bougies clôturées intégrées
+        self.last_time = None
+        keep = max(self.leg_lookback, 3)
+        self._highs = deque(maxlen=keep)
+        self._lows = deque(maxlen=keep)
+        self.pivot_highs = deque()      # [(indice, prix)] confirmés
+        self.pivot_lows = deque()
+        self._legs = {'long': _Leg('long'), 'short': _Leg('short')}
+        self._open = None               # (high, low) de la dernière bougie du cadre
+        self.frame_length = 0
+
+    # ── Mise à jour ──────────────────────────────────────────────────────────
+    def update(self, high, low, time=None):
+        """Intègre une bougie clôturée (O(1) amorti)"""
+        i = self.count
+        highs, lows = self._highs, self._lows
+        highs.append(high)
+        lows.append(low)
+        self.count += 1
+        self.last_time = time
+
+        # Pivot de la bougie précédente, confirmé par celle-ci
+        if len(highs) >= 3:
+            if highs[-2] >= highs[-3] and highs[-2] >= high:
+                self.pivot_highs.append((i - 1, highs[-2]))
+            if lows[-2] <= lows[-3] and lows[-2] <= low:
+                self.pivot_lows.append((i - 1, lows[-2]))
+        # Pivots encore utiles : fenêtre de la prochaine lecture
+        oldest = self.count + 2 - self.pivot_lookback
+        for pivots in (self.pivot_highs, self.pivot_lows):
+            while pivots and pivots[0][0] < oldest:
+                pivots.popleft()
+
+        # Jambes sur les leg_lookback - 1 bougies clôturées qui précèdent la
+        # bougie ouverte
+        start = self.count + 1 - self.leg_lookback
+        self._legs['long'].update(i, high, low, start, lows)
+        self._legs['short'].update(i, low, high, start, highs)
+
+    def sync(self, df):
+        """
+        Aligne l'état sur un cadre OHLCV : intègre les bougies clôturées
+        nouvelles (toutes sauf la dernière) et mémorise la dernière.
+        Si le cadre ne prolonge pas l'état (trou, autre symbole, pas de
+        colonne de temps), l'état est reconstruit depuis le cadre.
+        """
+        n = len(df)
+        if n == 0:
+            return self
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        column = next((c for c in TIME_COLUMNS if c in df.columns), None)
+        times = df[column].to_numpy() if column else None
+
+        first = 0
+        if times is not None and self.last_time is not None:
+            matches = (times[:n - 1] == self.last_time).nonzero()[0]
+            if len(matches):
+                first = int(matches[-1]) + 1
+            else:
+                self.reset()
+        else:
+            self.reset()
+
+        for k in range(first, n - 1):
+            self.update(float(high[k]), float(low[k]), times[k] if times is not None else None)
+        self._open = (float(high[-1]), float(low[-1]))
+        self.frame_length = n
+        return self
+
+    # ── Lectures (O(1)) ──────────────────────────────────────────────────────
+    def _window_pivots(self, pivots, provisional):
+        """Deux derniers pivots de la fenêtre, pivot provisoire de l'avant-dernière bougie inclus"""
+        last = [pivots[k][1] for k in range(-min(2, len(pivots)), 0)]
+        if provisional is not None:
+            last = (last + [provisional])[-2:]
+        return last
+
+    def _provisional_pivots(self):
+        """Pivots de l'avant-dernière bougie du cadre, confirmés par la bougie ouverte"""
+        if self._open is None or len(self._highs) < 2 or self.pivot_lookback < 3:
+            return None, None
+        open_high, open_low = self._open
+        h1, h2 = self._highs[-2], self._highs[-1]
+        l1, l2 = self._lows[-2], self._lows[-1]
+        ph = h2 if h2 >= h1 and h2 >= open_high else None
+        pl = l2 if l2 <= l1 and l2 <= open_low else None
+        return ph, pl
+
+    def structure(self):
+        """
+        État des deux derniers pivots de la fenêtre :
+        {'highs': 'HH'|'LH'|None, 'lows': 'HL'|'LL'|None, 'trend': 'long'|'short'|None}
+        """
+        ph, pl = self._provisional_pivots()
+        highs = self._window_pivots(self.pivot_highs, ph)
+        lows = self._window_pivots(self.pivot_lows, pl)
+        state = {'highs': None, 'lows': None, 'trend': None}
+        if len(highs) < 2 or len(lows) < 2:
+            return state
+        if highs[-1] > highs[-2]:
+            state['highs'] = 'HH'
+        elif highs[-1] < highs[-2]:
+            state['highs'] = 'LH'
+        if lows[-1] > lows[-2]:
+            state['lows'] = 'HL'
+        elif lows[-1] < lows[-2]:
+            state['lows'] = 'LL'
+        if state['highs'] == 'HH' and state['lows'] == 'HL':
+            state['trend'] = 'long'
+        elif state['highs'] == 'LH' and state['lows'] == 'LL':
+            state['trend'] = 'short'
+        return state
+
+    def trend(self):
+        """Tendance de Dow ('long', 'short' ou None), comme detect_dow_trend"""
+        if self.frame_length < self.pivot_lookback + 2:
+            return None
+        return self.structure()['trend']
+
+    def last_swing(self, trend):
+        """
+        Jambe d'impulsion courante, comme find_last_swing :
+          long  → (swing_low, swing_high)
+          short → (swing_high, swing_low)
+        Retourne (None, None) si l'extrémité est dans les 3 premières bougies.
+        """
+        if self.frame_length < self.leg_lookback or self._open is None:
+            return None, None
+        leg = self._legs['long' if trend == 'long' else 'short']
+        open_high, open_low = self._open
+        open_end, open_origin = (open_high, open_low) if trend == 'long' else (open_low, open_high)
+        sign = leg.end.sign
+
+        end_value = leg.end.value
+        if end_value is None or sign * open_end < sign * end_value:
+            # La bougie ouverte est l'extrémité : origine sur toute la fenêtre clôturée
+            if self.leg_lookback - 1 < 3:
+                return None, None
+            return leg.origin_all.value, open_end
+
+        window_start = self.count + 1 - self.leg_lookback
+        if leg.end.index - window_start < 3:
+            return None, None
+        return leg.origin.value, end_value
+
+
+class StructureRegistry:
+    """Une MarketStructure par (symbole, timeframe)"""
+
+    def __init__(self, pivot_lookback=20, leg_lookback=50):
+        self.pivot_lookback = pivot_lookback
+        self.leg_lookback = leg_lookback
+        self._structures = {}
+
+    def get(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._structures:
+            self._structures[key] = MarketStructure(self.pivot_lookback, self.leg_lookback)
+        return self._structures[key]
+
+    def sync(self, symbol, timeframe, df):
+        return self.get(symbol, timeframe).sync(df)
@@ -0,0 +1,86 @@
+"""
+Analyse de robustesse Monte Carlo des séquences de trades d'un backtest
+
+À partir des résultats par trade en multiples de R (1R = perte au SL),
+simule des milliers de séquences en numpy (une matrice simulations × trades,
+traitée par blocs) avec un risque fixe par trade et capital composé :
+  - bootstrap : tirage avec remise (incertitude sur le win rate et l'edge)
+  - shuffle   : permutation des trades observés (même rendement final,
+                seul l'ordre — donc le drawdown — change)
+
+Résultats : percentiles du rendement final et du drawdown maximal,
+probabilité de perte et probabilité de ruine (drawdown ≥ ruin_drawdown).
+
+Usage :
+    mc = simulate(outcomes_atr / sl_multi, risk_per_trade=0.02)
+    mc["return_pct"][5], mc["max_drawdown_pct"][95], mc["prob_ruin"]
+"""
+import os
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+N_SIMULATIONS = int(os.getenv("MONTE_CARLO_SIMS", "5000"))
+RUIN_DRAWDOWN = float(os.getenv("MONTE_CARLO_RUIN_DD", "0.5"))      # -50% = ruine
+MAX_RUIN_PROB = float(os.getenv("MONTE_CARLO_MAX_RUIN", "0.05"))
+BLOCK_CELLS = 2_000_000   # taille max d'un bloc simulations × trades (~16 Mo en float64)
+
+
+def _percentiles(values):
+    return {p: round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def simulate(r_multiples, risk_per_trade=0.02, n_sims=N_SIMULATIONS, n_trades=None,
+             method="bootstrap", ruin_drawdown=RUIN_DRAWDOWN, seed=42):
+    """
+    r_multiples : résultat de chaque trade en R (ex: outcome_atr / sl_multi)
+    n_trades    : longueur des séquences simulées (défaut : nombre de trades observés)
+    Retourne un dict de percentiles (en %) et de probabilités.
+    """
+    r = np.asarray(r_multiples, dtype=np.float64)
+    if r.size == 0:
+        return None
+    n = n_trades or r.size
+    if method == "shuffle":
+        n = r.size
+    rng = np.random.default_rng(seed)
+    # log(1 + risque × R), plancher à -99.99% par trade
+    log_growth = np.log1p(np.maximum(risk_per_trade * r, -0.9999))
+
+    final = np.empty(n_sims)
+    max_dd = np.empty(n_sims)
+    block = max(1, BLOCK_CELLS // n)
+    for lo in range(0, n_sims, block):
+        hi = min(n_sims, lo + block)
+        if method == "shuffle":
+            idx = rng.permuted(np.broadcast_to(np.arange(n), (hi - lo, n)), axis=1)
+        else:
+            idx = rng.integers(0, r.size, size=(hi - lo, n))
+        log_eq = np.cumsum(log_growth[idx], axis=1)
+        # Pic incluant le capital initial (log = 0)
+        peak = np.maximum(np.maximum.accumulate(log_eq, axis=1), 0.0)
+        max_dd[lo:hi] = np.expm1((log_eq - peak).min(axis=1))
+        final[lo:hi] = np.expm1(log_eq[:, -1])
+
+    return {
+        "method": method,
+        "n_sims": n_sims,
+        "n_trades": n,
+        "risk_per_trade": risk_per_trade,
+        "return_pct": _percentiles(final * 100),
+        # Drawdowns négatifs : le 5e percentile est le pire cas
+        "max_drawdown_pct": _percentiles(max_dd * 100),
+        "prob_loss": round(float((final < 0).mean()), 4),
+        "prob_ruin": round(float((max_dd <= -ruin_drawdown).mean()), 4),
+        "final_returns_pct": final * 100,
+    }
+
+
+def risk_adjusted_score(mc):
+    """Critère de classement prudent : rendement au 5e percentile"""
+    return mc["return_pct"][5] if mc else -float("inf")
+
+
+def summary(mc):
+    """Version sérialisable (sans la distribution complète)"""
+    return {k: v for k, v in mc.items() if k != "final_returns_pct"} if mc else None
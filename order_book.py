@@ -0,0 +1,345 @@
+"""
+Carnet d'ordres L2 local par symbole (snapshot + deltas)
+
+Le sizing ne regardait que l'ATR : sur les alts peu liquides, un ordre market
+traverse plusieurs niveaux et le prix exécuté s'éloigne du prix du signal.
+OrderBook garde une copie locale du carnet et répond en quelques
+microsecondes, sans appel réseau :
+  - best_bid / best_ask / mid / spread / spread_bps
+  - vwap(side, qty)              prix moyen d'exécution d'un ordre market
+  - slippage_bps(side, qty)      écart de ce prix moyen au mid
+  - depth_within(side, bps)      quantité disponible à moins de N bps du mid
+  - max_qty(side, bps)           plus grosse quantité dont le VWAP reste à N bps
+                                 du meilleur prix (best ask / best bid)
+  - limit_price(side, qty)       prix limite qui exécuterait qty (dernier niveau)
+
+Les mises à jour suivent le format des messages publics Bybit V5
+(topic orderbook.<depth>.<SYMBOL>, type snapshot / delta, niveaux [prix,
+taille], taille 0 = niveau supprimé, u = 1 = redémarrage du flux). Les
+deltas périmés (u déjà vu) ou reçus avant un snapshot sont ignorés.
+
+OrderBookRegistry tient un carnet par symbole : handle_message() pour un flux
+websocket, refresh() pour un snapshot REST (fetch_order_book) converti au même
+format, rafraîchi automatiquement par book() quand il a plus de
+ORDER_BOOK_MAX_AGE_MS. Tous les messages appliqués peuvent être enregistrés
+(JSONL, ORDER_BOOK_RECORD) puis rejoués hors ligne avec replay().
+
+Usage :
+    books = OrderBookRegistry(exchange)
+    book = books.book("BTC/USDT:USDT")
+    if book and book.slippage_bps("buy", qty) > 5: ...
+"""
+import bisect
+import itertools
+import json
+import os
+import threading
+import time
+
+ORDER_BOOK_DEPTH = int(os.getenv("ORDER_BOOK_DEPTH", "50"))
+ORDER_BOOK_MAX_AGE_MS = int(os.getenv("ORDER_BOOK_MAX_AGE_MS", "2000"))
+ORDER_BOOK_RECORD = os.getenv("ORDER_BOOK_RECORD", "")
+
+
+def market_id(symbol):
+    """BTC/USDT:USDT -> BTCUSDT (identifiant des messages Bybit)"""
+    return symbol.split(":")[0].replace("/", "")
+
+
+class _Side:
+    """Un côté du carnet : tailles par prix + clés triées du meilleur au pire"""
+    __slots__ = ("sign", "sizes", "keys")
+
+    def __init__(self, sign):
+        self.sign = sign      # asks : +1 (croissant) / bids : -1 (décroissant)
+        self.sizes = {}
+        self.keys = []        # sign × prix, croissant = meilleur d'abord
+
+    def clear(self):
+        self.sizes.clear()
+        self.keys.clear()
+
+    def set(self, price, size):
+        key = self.sign * price
+        if size > 0:
+            if price not in self.sizes:
+                bisect.insort(self.keys, key)
+            self.sizes[price] = size
+        elif self.sizes.pop(price, None) is not None:
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def best(self):
+        return self.sign * self.keys[0] if self.keys else None
+
+    def levels(self):
+        """(prix, taille) du meilleur au pire"""
+        sign, sizes = self.sign, self.sizes
+        for key in self.keys:
+            price = sign * key
+            yield price, sizes[price]
+
+
+class OrderBook:
+    def __init__(self, symbol, depth=ORDER_BOOK_DEPTH):
+        self.symbol = symbol
+        self.depth = depth
+        self.bids = _Side(-1)
+        self.asks = _Side(1)
+        self.update_id = None
+        self.seq = None
+        self.ts = None           # horodatage exchange du dernier message (ms)
+        self.received_at = None  # horodatage local (monotonic)
+        self.updates = 0
+
+    # ── Mises à jour ──────────────────────────────────────────────────────────
+    def apply_snapshot(self, bids, asks, update_id=None, seq=None, ts=None):
+        self.bids.clear()
+        self.asks.clear()
+        self._apply(bids, asks, update_id, seq, ts)
+
+    def apply_delta(self, bids, asks, update_id=None, seq=None, ts=None):
+        """Applique un delta ; False s'il est ignoré (pas de snapshot ou périmé)"""
+        if self.update_id is None:
+            return False
+        if update_id is not None and update_id <= self.update_id:
+            return False
+        self._apply(bids, asks, update_id, seq, ts)
+        return True
+
+    def _apply(self, bids, asks, update_id, seq, ts):
+        for price, size in bids:
+            self.bids.set(float(price), float(size))
+        for price, size in asks:
+            self.asks.set(float(price), float(size))
+        self.update_id = update_id if update_id is not None else (self.update_id or 0) + 1
+        self.seq = seq
+        self.ts = ts
+        self.received_at = time.monotonic()
+        self.updates += 1
+
+    @property
+    def ready(self):
+        return bool(self.bids.keys and self.asks.keys)
+
+    def age_ms(self):
+        if self.received_at is None:
+            return float("inf")
+        return (time.monotonic() - self.received_at) * 1000
+
+    # ── Requêtes ──────────────────────────────────────────────────────────────
+    @property
+    def best_bid(self):
+        return self.bids.best()
+
+    @property
+    def best_ask(self):
+        return self.asks.best()
+
+    @property
+    def mid(self):
+        if not self.ready:
+            return None
+        return (self.bids.best() + self.asks.best()) / 2
+
+    @property
+    def spread(self):
+        if not self.ready:
+            return None
+        return self.asks.best() - self.bids.best()
+
+    @property
+    def spread_bps(self):
+        mid = self.mid
+        return self.spread / mid * 10_000 if mid else None
+
+    def _taker_side(self, side):
+        # Un achat market consomme les asks, une vente les bids
+        return self.asks if side in ("buy", "long") else self.bids
+
+    def vwap(self, side, qty):
+        """(prix moyen, quantité exécutable) d'un ordre market de qty"""
+        remaining = qty
+        cost = 0.0
+        for price, size in self._taker_side(side).levels():
+            take = size if size < remaining else remaining
+            cost += take * price
+            remaining -= take
+            if remaining <= 0:
+                break
+        filled = qty - max(remaining, 0.0)
+        return (cost / filled if filled > 0 else None), filled
+
+    def slippage_bps(self, side, qty):
+        """Écart (bps, positif = défavorable) entre le VWAP de qty et le mid ; inf si carnet trop mince"""
+        price, filled = self.vwap(side, qty)
+        mid = self.mid
+        if price is None or mid is None or filled < qty * (1 - 1e-9):
+            return float("inf")
+        sign = 1 if side in ("buy", "long") else -1
+        return sign * (price - mid) / mid * 10_000
+
+    def depth_within(self, side, bps):
+        """Quantité disponible pour un ordre `side` à moins de bps du mid"""
+        mid = self.mid
+        if mid is None:
+            return 0.0
+        book = self._taker_side(side)
+        limit = mid * (1 + book.sign * bps / 10_000)
+        total = 0.0
+        for price, size in book.levels():
+            if book.sign * (price - limit) > 0:
+                break
+            total += size
+        return total
+
+    def max_qty(self, side, bps):
+        """
+        Plus grosse quantité dont le VWAP reste à moins de bps du meilleur prix
+        (best ask pour un achat, best bid pour une vente). Mesuré depuis le touch
+        et non le mid : le spread se paie quelle que soit la taille, un carnet au
+        spread large ne doit pas ramener la taille à 0.
+        """
+        book = self._taker_side(side)
+        touch = book.best()
+        if touch is None:
+            return 0.0
+        # VWAP ≤ limite  ⇔  Σ taille × (sign × (prix − limite)) ≤ 0
+        limit = book.sign * touch * (1 + book.sign * bps / 10_000)
+        qty = 0.0
+        excess = 0.0   # Σ taille × (clé − limite), négatif tant que le VWAP est sous la limite
+        for key in book.keys:
+            size = book.sizes[book.sign * key]
+            over = key - limit
+            if excess + size * over <= 0:
+                qty += size
+                excess += size * over
+                continue
+            # Niveau entier trop cher : seulement la part qui garde le VWAP sous la limite
+            qty += -excess / over
+            break
+        return qty
+
+    def limit_price(self, side, qty):
+        """Prix du dernier niveau touché par qty (limite IOC équivalente au market), None si trop mince"""
+        remaining = qty
+        for price, size in self._taker_side(side).levels():
+            remaining -= size
+            if remaining <= 0:
+                return price
+        return None
+
+    def top(self, n=5):
+        """n meilleurs niveaux de chaque côté"""
+        return {"bids": list(itertools.islice(self.bids.levels(), n)),
+                "asks": list(itertools.islice(self.asks.levels(), n))}
+
+
+class OrderBookRegistry:
+    def __init__(self, exchange=None, depth=ORDER_BOOK_DEPTH, max_age_ms=ORDER_BOOK_MAX_AGE_MS,
+                 record_path=ORDER_BOOK_RECORD):
+        self.exchange = exchange
+        self.depth = depth
+        self.max_age_ms = max_age_ms
+        self.record_path = record_path
+        self.books = {}
+        self._ids = {}          # identifiant Bybit -> symbole unifié
+        self._lock = threading.RLock()
+        self.errors = 0
+
+    def get(self, symbol):
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = OrderBook(symbol, self.depth)
+                self._ids[market_id(symbol)] = symbol
+            return book
+
+    def book(self, symbol, max_age_ms=None):
+        """Carnet à jour (snapshot REST si trop vieux), None si indisponible"""
+        book = self.get(symbol)
+        max_age_ms = self.max_age_ms if max_age_ms is None else max_age_ms
+        if book.age_ms() > max_age_ms and self.exchange is not None:
+            self.refresh(symbol)
+        return book if book.ready else None
+
+    def refresh(self, symbol):
+        """Snapshot REST ccxt appliqué comme un message snapshot Bybit"""
+        try:
+            raw = self.exchange.fetch_order_book(symbol, self.depth)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ [{symbol}] Carnet indisponible: {e}", flush=True)
+            return False
+        nonce = raw.get("nonce")
+        ts = raw.get("timestamp") or int(time.time() * 1000)
+        self.handle_message({
+            "topic": f"orderbook.{self.depth}.{market_id(symbol)}",
+            "type": "snapshot",
+            "ts": ts,
+            # Un snapshot REST n'a pas d'identifiant de flux comparable : u = 0
+            # accepte les deltas websocket suivants
+            "data": {"s": market_id(symbol), "b": raw["bids"][:self.depth],
+                     "a": raw["asks"][:self.depth], "u": 0, "seq": nonce},
+        })
+        return True
+
+    def handle_message(self, message):
+        """Message public Bybit V5 orderbook (dict ou JSON) ; retourne le carnet mis à jour"""
+        if isinstance(message, (str, bytes)):
+            message = json.loads(message)
+        if not str(message.get("topic", "")).startswith("orderbook."):
+            return None
+        data = message["data"]
+        symbol = self._ids.get(data["s"])
+        if symbol is None:
+            symbol = data["s"]
+        update_id = data.get("u")
+        with self._lock:
+            book = self.get(symbol)
+            if message.get("type") == "snapshot" or update_id == 1:
+                book.apply_snapshot(data.get("b", ()), data.get("a", ()), update_id, data.get("seq"), message.get("ts"))
+            elif not book.apply_delta(data.get("b", ()), data.get("a", ()), update_id, data.get("seq"), message.get("ts")):
+                return None
+        if self.record_path:
+            record_message(self.record_path, message)
+        return book
+
+    def status(self):
+        with self._lock:
+            return {
+                symbol: {
+                    "ready": book.ready,
+                    "age_ms": round(book.age_ms(), 1) if book.received_at else None,
+                    "spread_bps": round(book.spread_bps, 2) if book.ready else None,
+                    "updates": book.updates,
+                }
+                for symbol, book in self.books.items()
+            }
+
+
+# =========================
+# ENREGISTREMENT / REJEU
+# =========================
+def record_message(path, message):
+    """Ajoute un message au fichier JSONL d'enregistrement"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(message, separators=(",", ":")) + "\n")
+
+
+def replay(path, registry=None):
+    """
+    Rejoue un enregistrement JSONL dans un registre (nouveau par défaut) ;
+    génère (message, carnet) après chaque message appliqué.
+    """
+    registry = registry if registry is not None else OrderBookRegistry(record_path="")
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            book = registry.handle_message(message)
+            if book is not None:
+                yield message, book
@@ -0,0 +1,489 @@
+"""
+Exchange simulé (paper trading) derrière la même API d'ordres que le live
+
+PaperExchange enveloppe l'exchange ccxt réel : les données de marché
+(fetch_ohlcv, fetch_ticker(s), market...) passent par l'exchange réel, les
+ordres et positions sont simulés localement. Les bots n'ont rien à changer :
+config.py l'installe quand PAPER_EXCHANGE=1, et le même code que le live
+tourne en ombre à l'échelle de la production.
+
+Simulation (mode one-way Bybit, une position nette par symbole) :
+  - ordres market : prix courant ± slippage, frais taker (cost_model)
+  - ordres limit  : au repos jusqu'au croisement, remplis au prix limite
+    (frais maker) ; une limite déjà franchie part au marché
+  - ordres conditionnels (triggerPrice / triggerDirection)
+  - TP/SL de position comme trading-stop V5 : Full (toute la position) ou
+    Partial (tpSize / slSize, plusieurs niveaux), TP limit (tpLimitPrice),
+    refus d'un stop du mauvais côté du prix comme Bybit
+  - trailing stop Bybit (trailingStop + activePrice) : suit l'extrême
+    favorable à distance fixe une fois le prix d'activation atteint
+  - PnL réalisé, frais et historique (execution_list, closed_pnl, wallet)
+
+Les prix arrivent en lot via update_prices({symbole: prix}) : à chaque
+fetch_ticker(s) / fetch_ohlcv des bots, et par un flux interne (fetch_tickers
+groupé des seuls symboles en position ou avec ordres, PAPER_FEED_INTERVAL).
+Un symbole sans position ni ordre ne coûte qu'une affectation par tick.
+"""
+import itertools
+import os
+import threading
+import time
+
+from cost_model import CostModel
+from position_monitor import PositionMonitor
+
+PAPER_BALANCE = float(os.getenv("PAPER_BALANCE", "1000"))
+PAPER_FEED = os.getenv("PAPER_FEED", "1") == "1"
+PAPER_FEED_INTERVAL = float(os.getenv("PAPER_FEED_INTERVAL", "0.5"))
+
+SIDE_SIGN = {"buy": 1, "sell": -1}
+RET_OK = {"retCode": 0, "retMsg": "OK", "result": {}}
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _number(value):
+    """Prix ccxt/Bybit : nombre, chaîne ou {'triggerPrice': ...} ; None ou 0 = absent"""
+    if isinstance(value, dict):
+        value = value.get("triggerPrice", value.get("price"))
+    if value in (None, ""):
+        return None
+    value = float(value)
+    return value or None
+
+
+def _direction(value):
+    """triggerDirection ccxt ('ascending'/'descending') ou Bybit (1/2)"""
+    if value in ("ascending", "above", 1, "1"):
+        return 1
+    if value in ("descending", "below", 2, "2"):
+        return -1
+    return None
+
+
+class _Position:
+    __slots__ = ("side", "qty", "entry", "leverage", "opened_ms",
+                 "trail", "trail_active", "trail_activated", "trail_extreme")
+
+    def __init__(self, side, qty, entry, leverage):
+        self.side = side            # +1 long / -1 short
+        self.qty = qty
+        self.entry = entry
+        self.leverage = leverage
+        self.opened_ms = _now_ms()
+        self.trail = None           # distance du trailing stop
+        self.trail_active = None    # prix d'activation
+        self.trail_activated = False
+        self.trail_extreme = None
+
+
+class PaperExchange:
+    is_paper = True
+
+    def __init__(self, inner, balance=PAPER_BALANCE, cost_model=None, feed=PAPER_FEED,
+                 feed_interval=PAPER_FEED_INTERVAL):
+        self.inner = inner
+        self.cost_model = cost_model or CostModel()
+        self.balance = float(balance)          # solde réalisé (PnL et frais inclus)
+        self.leverage = {}
+        self.last_price = {}
+        self.positions = {}                    # symbole -> _Position
+        self.orders = {}                       # symbole -> [ordres au repos / conditionnels]
+        self.fills = []
+        self.closed = []
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._feed = PositionMonitor(inner, self.watched_symbols, self.update_prices,
+                                     interval=feed_interval, name="paper") if feed else None
+
+    def __getattr__(self, name):
+        # Données de marché, précisions, parse_timeframe... : exchange réel
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    # ── Prix ──────────────────────────────────────────────────────────────────
+    def watched_symbols(self):
+        with self._lock:
+            return list(set(self.positions).union(s for s, orders in self.orders.items() if orders))
+
+    def update_prices(self, prices):
+        """Nouveaux prix {symbole: prix} : ordres, TP/SL et trailing déclenchés"""
+        with self._lock:
+            last = self.last_price
+            for symbol, price in prices.items():
+                last[symbol] = price
+                if symbol in self.positions or self.orders.get(symbol):
+                    self._process(symbol, price)
+
+    def _price(self, symbol):
+        price = self.last_price.get(symbol)
+        if price is None:
+            self.fetch_ticker(symbol)
+            price = self.last_price[symbol]
+        return price
+
+    def fetch_ticker(self, symbol, params=None):
+        ticker = self.inner.fetch_ticker(symbol, params or {})
+        if ticker.get("last"):
+            self.update_prices({symbol: float(ticker["last"])})
+        return ticker
+
+    def fetch_tickers(self, symbols=None, params=None):
+        tickers = self.inner.fetch_tickers(symbols, params or {})
+        self.update_prices({s: float(t["last"]) for s, t in tickers.items() if t.get("last")})
+        return tickers
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params=None):
+        candles = self.inner.fetch_ohlcv(symbol, timeframe, since, limit, params or {})
+        # Seule la bougie en cours fait un prix : une page historique (since=,
+        # market_data.sync de l'AutoTuner) ne doit pas déclencher de fills
+        if candles and (since is None or self._is_current(candles[-1][0], timeframe)):
+            self.update_prices({symbol: float(candles[-1][4])})
+        return candles
+
+    def _is_current(self, open_ms, timeframe):
+        """True si la bougie ouverte à open_ms est la bougie en cours"""
+        try:
+            tf_ms = self.inner.parse_timeframe(timeframe) * 1000
+        except Exception:
+            return False
+        return open_ms + tf_ms > _now_ms()
+
+    # ── Exécution ─────────────────────────────────────────────────────────────
+    def _fill(self, symbol, side, qty, price, maker=False, reduce_only=False, order_id=None, reason=""):
+        """Exécute qty au prix donné (slippage déjà appliqué). Retourne la quantité exécutée."""
+        sign = SIDE_SIGN[side]
+        pos = self.positions.get(symbol)
+        if reduce_only:
+            if pos is None or pos.side == sign:
+                return 0.0
+            qty = min(qty, pos.qty)
+        if qty <= 0:
+            return 0.0
+
+        fee = price * qty * (self.cost_model.maker_fee if maker else self.cost_model.taker_fee)
+        self.balance -= fee
+        remaining = qty
+        if pos is not None and pos.side != sign:
+            closing = min(remaining, pos.qty)
+            pnl = (price - pos.entry) * closing * pos.side
+            self.balance += pnl
+            pos.qty -= closing
+            remaining -= closing
+            self.closed.append({
+                "symbol": symbol, "orderId": order_id, "side": "Sell" if pos.side > 0 else "Buy", "qty": closing,
+                "avgEntryPrice": pos.entry, "avgExitPrice": price, "closedPnl": pnl - fee,
+                "exitReason": reason, "createdTime": pos.opened_ms, "updatedTime": _now_ms(),
+            })
+            if pos.qty <= 1e-12:
+                del self.positions[symbol]
+                # Plus de position : ses TP/SL et ordres reduce-only disparaissent
+                self.orders[symbol] = [o for o in self.orders.get(symbol, []) if not o["reduce_only"]]
+                pos = None
+        if remaining > 1e-12:
+            if pos is None:
+                self.positions[symbol] = _Position(sign, remaining, price, self.leverage.get(symbol, 1))
+            else:
+                pos.entry = (pos.entry * pos.qty + price * remaining) / (pos.qty + remaining)
+                pos.qty += remaining
+
+        self.fills.append({
+            "symbol": symbol, "orderId": order_id, "side": side.capitalize(), "execQty": qty,
+            "execPrice": price, "execFee": fee, "execTime": _now_ms(), "isMaker": maker,
+            "reason": reason,
+        })
+        return qty
+
+    def _market_price(self, symbol, side, qty):
+        price = self._price(symbol)
+        slip = float(self.cost_model.slippage_bps(price * qty, float("inf"))) / 10_000
+        return price * (1 + SIDE_SIGN[side] * slip)
+
+    def _process(self, symbol, price):
+        # 1. Ordres au repos et conditionnels (stops avant limites : prudent)
+        orders = self.orders.get(symbol)
+        if orders:
+            triggered = [o for o in orders if o["trigger"] is not None
+                         and (price - o["trigger"]) * o["direction"] >= 0]
+            crossed = [o for o in orders if o["trigger"] is None
+                       and (price - o["price"]) * SIDE_SIGN[o["side"]] <= 0]
+            for order in triggered + crossed:
+                if order not in self.orders.get(symbol, []):
+                    continue   # retiré par une exécution précédente de ce tick
+                self.orders[symbol].remove(order)
+                self._execute(symbol, order, price)
+
+        # 2. Trailing stop de position
+        pos = self.positions.get(symbol)
+        if pos is None or pos.trail is None:
+            return
+        favorable = pos.side * price
+        if not pos.trail_activated:
+            if pos.trail_active is not None and favorable < pos.side * pos.trail_active:
+                return
+            pos.trail_activated = True
+            pos.trail_extreme = favorable
+        pos.trail_extreme = max(pos.trail_extreme, favorable)
+        if favorable <= pos.trail_extreme - pos.trail:
+            side = "sell" if pos.side > 0 else "buy"
+            self._fill(symbol, side, pos.qty, self._market_price(symbol, side, pos.qty),
+                       reduce_only=True, order_id=f"paper-{next(self._ids)}", reason="TRAIL")
+
+    def _execute(self, symbol, order, price):
+        pos = self.positions.get(symbol)
+        qty = order["qty"]
+        if qty is None:   # TP/SL Full : toute la position
+            qty = pos.qty if pos else 0.0
+        if order["trigger"] is not None and order["price"] is None:
+            fill_price, maker = self._market_price(symbol, order["side"], qty), False
+        elif order["trigger"] is not None:
+            fill_price, maker = order["price"], True   # TP limit déclenché
+        else:
+            fill_price, maker = order["price"], True   # limite croisée
+        self._fill_order(order, qty, fill_price, maker)
+
+    def _fill_order(self, order, qty, price, maker):
+        filled = self._fill(order["symbol"], order["side"], qty, price, maker,
+                            order["reduce_only"], order["id"], order["kind"])
+        order.update(status="closed", filled=filled, average=price,
+                     fee=self.fills[-1]["execFee"] if filled else 0.0)
+
+    def _new_order(self, symbol, side, qty, kind, price=None, trigger=None, direction=None, reduce_only=False):
+        return {"id": f"paper-{next(self._ids)}", "symbol": symbol, "side": side, "qty": qty,
+                "kind": kind, "price": price, "trigger": trigger, "direction": direction,
+                "reduce_only": reduce_only, "status": "open", "filled": 0.0, "average": None, "fee": 0.0,
+                "timestamp": _now_ms()}
+
+    def _set_exit(self, symbol, kind, trigger, size=None, limit=None):
+        """TP ou SL de position ; size None = Full (remplace le précédent)"""
+        pos = self.positions[symbol]
+        orders = self.orders.setdefault(symbol, [])
+        if size is None:
+            orders[:] = [o for o in orders if not (o["kind"] == kind and o["qty"] is None)]
+        if trigger is None:
+            if size is None:
+                return
+            orders[:] = [o for o in orders if o["kind"] != kind]
+            return
+        # SL sous le prix pour un long, TP au-dessus (inverse pour un short)
+        direction = -pos.side if kind == "SL" else pos.side
+        side = "sell" if pos.side > 0 else "buy"
+        orders.append(self._new_order(symbol, side, size, kind, limit, trigger, direction, reduce_only=True))
+
+    def _check_exit_side(self, symbol, kind, trigger):
+        pos = self.positions[symbol]
+        price = self._price(symbol)
+        expected = -pos.side if kind == "SL" else pos.side
+        return trigger is None or (trigger - price) * expected > 0
+
+    # ── API ordres (ccxt) ─────────────────────────────────────────────────────
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        params = dict(params or {})
+        amount = float(amount)
+        reduce_only = bool(params.get("reduceOnly", False))
+        with self._lock:
+            if self._feed is not None:
+                self._feed.start()
+            trigger = _number(params.get("triggerPrice") or params.get("stopPrice"))
+            if trigger is not None:
+                direction = _direction(params.get("triggerDirection"))
+                if direction is None:
+                    direction = 1 if trigger > self._price(symbol) else -1
+                limit = float(price) if type == "limit" and price else None
+                order = self._new_order(symbol, side, amount, "STOP", limit, trigger, direction, reduce_only)
+                self.orders.setdefault(symbol, []).append(order)
+                return self._order_view(order, type)
+
+            last = self._price(symbol)
+            marketable = type == "market" or (price is not None and (last - float(price)) * SIDE_SIGN[side] <= 0)
+            if not marketable:
+                order = self._new_order(symbol, side, amount, "LIMIT", float(price), reduce_only=reduce_only)
+                self.orders.setdefault(symbol, []).append(order)
+                return self._order_view(order, type)
+
+            order = self._new_order(symbol, side, amount, "MARKET", reduce_only=reduce_only)
+            self._fill_order(order, amount, self._market_price(symbol, side, amount), maker=False)
+            if symbol in self.positions:
+                self._attach_exits(symbol, params)
+            return self._order_view(order, type)
+
+    def create_market_order(self, symbol, side, amount, price=None, params=None):
+        return self.create_order(symbol, "market", side, amount, price, params)
+
+    def create_limit_order(self, symbol, side, amount, price, params=None):
+        return self.create_order(symbol, "limit", side, amount, price, params)
+
+    def _attach_exits(self, symbol, params):
+        """TP/SL transmis avec l'ordre d'entrée (paramètres Bybit V5 ou ccxt unifiés)"""
+        partial = params.get("tpslMode") == "Partial"
+        for kind, key, size_key, limit_key, type_key in (
+                ("SL", "stopLoss", "slSize", "slLimitPrice", "slOrderType"),
+                ("TP", "takeProfit", "tpSize", "tpLimitPrice", "tpOrderType")):
+            trigger = _number(params.get(key))
+            if trigger is None:
+                continue
+            limit = _number(params.get(limit_key)) if params.get(type_key) == "Limit" else None
+            if limit is None and isinstance(params.get(key), dict):
+                limit = _number(params[key].get("price"))
+            size = float(params[size_key]) if partial and params.get(size_key) else None
+            self._set_exit(symbol, kind, trigger, size, limit)
+
+    def cancel_order(self, id, symbol=None, params=None):
+        with self._lock:
+            for sym, orders in self.orders.items():
+                for order in orders:
+                    if order["id"] == id:
+                        orders.remove(order)
+                        order["status"] = "canceled"
+                        return self._order_view(order)
+        raise KeyError(f"Ordre paper inconnu: {id}")
+
+    def cancel_all_orders(self, symbol=None, params=None):
+        with self._lock:
+            symbols = [symbol] if symbol else list(self.orders)
+            canceled = [o for s in symbols for o in self.orders.pop(s, [])]
+        return [self._order_view(dict(o, status="canceled")) for o in canceled]
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        with self._lock:
+            symbols = [symbol] if symbol else list(self.orders)
+            return [self._order_view(o) for s in symbols for o in self.orders.get(s, [])]
+
+    def _order_view(self, order, type=None):
+        filled = order["filled"]
+        amount = order["qty"] if order["qty"] is not None else filled
+        return {
+            "id": order["id"], "clientOrderId": None, "symbol": order["symbol"],
+            "type": type or ("market" if order["price"] is None else "limit"),
+            "side": order["side"], "amount": amount, "price": order["price"],
+            "triggerPrice": order["trigger"], "average": order["average"], "filled": filled,
+            "remaining": max(0.0, (amount or 0) - filled), "status": order["status"],
+            "reduceOnly": order["reduce_only"], "timestamp": order["timestamp"],
+            "fee": {"cost": order["fee"], "currency": "USDT"},
+            "info": {"orderId": order["id"], "paper": True},
+        }
+
+    # ── Positions et solde ────────────────────────────────────────────────────
+    def set_leverage(self, leverage, symbol=None, params=None):
+        self.leverage[symbol] = int(leverage)
+        return {"retCode": 0, "retMsg": "OK"}
+
+    def _position_view(self, symbol):
+        pos = self.positions.get(symbol)
+        if pos is None:
+            return {"symbol": symbol, "contracts": 0.0, "side": None, "entryPrice": None,
+                    "unrealizedPnl": 0.0, "percentage": 0.0, "info": {"paper": True}}
+        mark = self.last_price.get(symbol, pos.entry)
+        upnl = (mark - pos.entry) * pos.qty * pos.side
+        margin = pos.entry * pos.qty / pos.leverage
+        exits = {o["kind"]: o["trigger"] for o in self.orders.get(symbol, []) if o["qty"] is None}
+        return {
+            "symbol": symbol, "contracts": pos.qty, "contractSize": 1.0,
+            "side": "long" if pos.side > 0 else "short", "entryPrice": pos.entry,
+            "markPrice": mark, "notional": mark * pos.qty, "leverage": pos.leverage,
+            "unrealizedPnl": upnl, "percentage": upnl / margin * 100 if margin else 0.0,
+            "initialMargin": margin, "stopLossPrice": exits.get("SL"),
+            "takeProfitPrice": exits.get("TP"), "timestamp": pos.opened_ms,
+            "info": {"paper": True, "trailingStop": pos.trail, "activePrice": pos.trail_active},
+        }
+
+    def fetch_position(self, symbol, params=None):
+        with self._lock:
+            return self._position_view(symbol)
+
+    def fetch_positions(self, symbols=None, params=None):
+        with self._lock:
+            if symbols is None:
+                return [self._position_view(s) for s in self.positions]
+            return [self._position_view(s) for s in symbols]
+
+    def equity(self):
+        with self._lock:
+            return self.balance + sum((self.last_price.get(s, p.entry) - p.entry) * p.qty * p.side
+                                      for s, p in self.positions.items())
+
+    def fetch_balance(self, params=None):
+        with self._lock:
+            used = sum(p.entry * p.qty / p.leverage for p in self.positions.values())
+            total = self.equity()
+            free = max(0.0, total - used)
+        return {"USDT": {"free": free, "used": used, "total": total},
+                "free": {"USDT": free}, "used": {"USDT": used}, "total": {"USDT": total},
+                "info": {"paper": True}}
+
+    # ── Endpoints Bybit V5 implicites utilisés par les bots ──────────────────
+    def _unified(self, market_id):
+        for symbol in itertools.chain(self.positions, self.orders, self.last_price):
+            if symbol.split(":")[0].replace("/", "") == market_id:
+                return symbol
+        try:
+            return self.inner.safe_symbol(market_id, None, None, "swap")
+        except Exception:
+            return market_id
+
+    def private_post_v5_position_trading_stop(self, params):
+        with self._lock:
+            symbol = self._unified(params["symbol"])
+            if symbol not in self.positions:
+                return {"retCode": 10001, "retMsg": "can not set tp/sl/ts for zero position", "result": {}}
+            partial = params.get("tpslMode") == "Partial"
+            for kind, key in (("SL", "stopLoss"), ("TP", "takeProfit")):
+                if key in params and not self._check_exit_side(symbol, kind, _number(params[key])):
+                    return {"retCode": 10001, "retMsg": f"{key} du mauvais côté du prix", "result": {}}
+            for kind, key, size_key, limit_key, type_key in (
+                    ("SL", "stopLoss", "slSize", "slLimitPrice", "slOrderType"),
+                    ("TP", "takeProfit", "tpSize", "tpLimitPrice", "tpOrderType")):
+                if key not in params:
+                    continue
+                limit = _number(params.get(limit_key)) if params.get(type_key) == "Limit" else None
+                size = float(params[size_key]) if partial and params.get(size_key) else None
+                self._set_exit(symbol, kind, _number(params[key]), size, limit)
+            if "trailingStop" in params:
+                pos = self.positions[symbol]
+                pos.trail = _number(params["trailingStop"])
+                pos.trail_active = _number(params.get("activePrice"))
+                pos.trail_activated = False
+            return dict(RET_OK)
+
+    def private_get_v5_execution_list(self, params):
+        with self._lock:
+            rows = [f for f in self.fills
+                    if (not params.get("orderId") or f["orderId"] == params["orderId"])
+                    and (not params.get("symbol") or self._unified(params["symbol"]) == f["symbol"])]
+        return {"retCode": 0, "result": {"list": [
+            {**f, "execPrice": str(f["execPrice"]), "execQty": str(f["execQty"]),
+             "execFee": str(f["execFee"]), "execTime": str(f["execTime"])} for f in reversed(rows)]}}
+
+    def private_get_v5_position_closed_pnl(self, params):
+        with self._lock:
+            rows = [c for c in reversed(self.closed)
+                    if not params.get("symbol") or self._unified(params["symbol"]) == c["symbol"]]
+        rows = rows[:int(params.get("limit", 50))]
+        return {"retCode": 0, "result": {"list": [
+            {**c, "closedPnl": str(c["closedPnl"]), "avgExitPrice": str(c["avgExitPrice"]),
+             "avgEntryPrice": str(c["avgEntryPrice"])} for c in rows]}}
+
+    def private_get_v5_account_wallet_balance(self, params=None):
+        balance = self.fetch_balance()["USDT"]
+        return {"retCode": 0, "result": {"list": [{
+            "accountType": (params or {}).get("accountType", "UNIFIED"),
+            "totalEquity": str(balance["total"]),
+            "totalAvailableBalance": str(balance["free"]),
+            "coin": [{"coin": "USDT", "walletBalance": str(self.balance),
+                      "equity": str(balance["total"]), "availableToWithdraw": str(balance["free"])}],
+        }]}}
+
+    def status(self):
+        with self._lock:
+            return {
+                "balance": round(self.balance, 4),
+                "equity": round(self.equity(), 4),
+                "positions": len(self.positions),
+                "open_orders": sum(len(o) for o in self.orders.values()),
+                "fills": len(self.fills),
+                "closed_trades": len(self.closed),
+                "feed": self._feed.status() if self._feed else None,
+            }
@@ -0,0 +1,366 @@
+"""
+Backtester portefeuille multi-symboles, piloté par événements
+
+Les bougies de tous les symboles forment un seul flux ordonné dans le temps.
+Seuls deux types d'événements modifient l'état du portefeuille :
+  - un signal (colonnes précalculées signal / score / atr) sur une bougie
+  - la sortie d'une position (SL / TP / fin de données)
+La sortie d'une position ne dépend que des prix de son symbole : elle est
+résolue en numpy au moment de l'entrée (exit_resolution, en 1m si un
+IntrabarIndex est fourni) et placée dans un tas d'événements.
+La boucle Python ne parcourt donc que les signaux, pas toutes les bougies.
+
+Gating identique à open_trade / check_risk_limits (bot_multisymbol_v6_3) :
+  - guards MAX_DAILY_LOSS_PCT (sur CAPITAL) et MAX_CONSECUTIVE_LOSSES,
+    remis à zéro à minuit UTC
+  - cooldown par symbole (COOLDOWN_SECONDS depuis la dernière tentative)
+  - une seule position par symbole, MAX_POSITIONS simultanées,
+    pas deux positions sur la même devise de base
+  - sizing calculate_position_size sur 90% du solde libre (capital composé),
+    SL/TP minimum 0.30% / 0.50%, minimum 5 USDT, marge ≤ 85% du solde libre
+
+Usage :
+    frames = {sym: precompute_signals(df, apply_ind, check_sig, warmup) for sym, df in ...}
+    result = PortfolioBacktester(sl_multi=1.5, tp_multi=3.0).run(frames)
+
+    # Sorties en 1m depuis l'archive + trailing stop de scalping_5m
+    intrabar = {sym: IntrabarIndex.from_archive(sym, df["timestamp"], "5m") for sym, df in frames.items()}
+    result = PortfolioBacktester(trail_strategy="scalping_5m").run(frames, intrabar=intrabar)
+    print(result["stats"])
+
+    python portfolio_backtester.py --symbols BTC/USDT:USDT,ETH/USDT:USDT --timeframe 5m --days 180
+    python portfolio_backtester.py --symbols BTC/USDT:USDT --intrabar --trail
+"""
+import argparse
+import heapq
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from exit_resolution import IntrabarIndex, resolve_exit, trail_distances
+
+DAY_MS = 86_400_000
+MIN_NOTIONAL_USDT = 5.0
+MIN_SL_PCT = 0.0030   # SL minimum 0.30% du prix (bruit)
+MIN_TP_PCT = 0.0050   # TP minimum 0.50% du prix (frais)
+
+SIGNAL_CODES = {"long": 1, "short": -1}
+
+
+def get_base_currency(symbol):
+    """Extrait la devise de base d'un symbole. Ex: BTC/USDT:USDT → BTC"""
+    return symbol.split('/')[0]
+
+
+def precompute_signals(df, apply_ind, check_sig, warmup=25):
+    """
+    Ajoute les colonnes signal (+1 long / -1 short / 0), score et atr en
+    rejouant check_signal bougie par bougie (comme en live, sans lookahead).
+    Coûteux : à faire une fois par série puis réutiliser le résultat.
+    """
+    df_ind = apply_ind(df.copy())
+    n = len(df_ind)
+    signal = np.zeros(n, dtype=np.int8)
+    score = np.zeros(n)
+    atr = np.zeros(n)
+    for i in range(warmup, n):
+        sig, sc, a = check_sig(df_ind.iloc[:i + 1])
+        if sig:
+            signal[i] = SIGNAL_CODES[sig]
+            score[i] = sc
+            atr[i] = a
+    out = df_ind[["timestamp", "open", "high", "low", "close", "volume"]].copy()
+    out["signal"] = signal
+    out["score"] = score
+    out["atr"] = atr
+    return out
+
+
+class PortfolioBacktester:
+    def __init__(self, capital=None, risk_per_trade=None, leverage=None, max_positions=None,
+                 cooldown_seconds=None, max_daily_loss_pct=None, max_consecutive_losses=None,
+                 sl_multi=None, tp_multi=None, threshold=None, max_holding_bars=None,
+                 trail_strategy=None, cost_model=None):
+        # Mêmes variables d'environnement et défauts que config.py
+        self.capital = capital if capital is not None else float(os.getenv("CAPITAL", "200"))
+        self.risk_per_trade = risk_per_trade if risk_per_trade is not None else float(os.getenv("RISK_PER_TRADE", "0.05"))
+        self.leverage = leverage if leverage is not None else int(os.getenv("LEVERAGE", "2"))
+        self.max_positions = max_positions if max_positions is not None else int(os.getenv("MAX_POSITIONS", "2"))
+        self.cooldown_ms = 1000 * (cooldown_seconds if cooldown_seconds is not None else int(os.getenv("COOLDOWN_SECONDS", "300")))
+        self.max_daily_loss_pct = max_daily_loss_pct if max_daily_loss_pct is not None else float(os.getenv("MAX_DAILY_LOSS_PCT", "10"))
+        self.max_consecutive_losses = max_consecutive_losses if max_consecutive_losses is not None else int(os.getenv("MAX_CONSECUTIVE_LOSSES", "5"))
+        self.sl_multi = sl_multi if sl_multi is not None else float(os.getenv("SL_ATR_MULTIPLIER", "1.5"))
+        self.tp_multi = tp_multi if tp_multi is not None else float(os.getenv("TP_ATR_MULTIPLIER", "3.0"))
+        self.threshold = threshold if threshold is not None else int(os.getenv("SCORE_THRESHOLD", "3"))
+        self.max_holding_bars = max_holding_bars   # None = jusqu'au SL/TP ou la fin des données
+        # Stratégie dont on reproduit le trailing stop (None = SL/TP fixes)
+        self.trail_strategy = trail_strategy
+        # Frais / funding / slippage (cost_model.CostModel), None = PnL brut
+        self.cost_model = cost_model
+
+    # ── Sizing (calculate_position_size / adjust_qty) ─────────────────────────
+    def position_size(self, price, stop_distance, capital):
+        if stop_distance <= 0:
+            return None
+        qty = (capital * self.risk_per_trade / stop_distance) * self.leverage
+        # Sécurité : Max 25% du capital effectif par position
+        return min(qty, capital * self.leverage * 0.25 / price)
+
+    # ── Simulation ────────────────────────────────────────────────────────────
+    def run(self, frames, intrabar=None):
+        """
+        frames   : {symbol: DataFrame avec timestamp, open, high, low, close, signal, score, atr}
+        intrabar : {symbol: IntrabarIndex} optionnel, sorties résolues en 1m
+        Retourne {"trades": DataFrame, "equity": DataFrame, "stats": dict, "rejected": dict}
+        """
+        symbols = list(frames)
+        data = []
+        cand_ts, cand_sym, cand_idx = [], [], []
+        for s, sym in enumerate(symbols):
+            df = frames[sym]
+            cols = {c: df[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close", "score", "atr")}
+            cols["timestamp"] = df["timestamp"].to_numpy(dtype=np.int64)
+            cols["signal"] = df["signal"].to_numpy(dtype=np.int8)
+            cols["volume"] = df["volume"].to_numpy(dtype=np.float64) if "volume" in df else None
+            data.append(cols)
+            # Candidats : signal avec score suffisant, hors dernière bougie
+            mask = (cols["signal"] != 0) & (cols["score"] >= self.threshold) & (cols["atr"] > 0)
+            mask[-1:] = False
+            idx = np.flatnonzero(mask)
+            cand_ts.append(cols["timestamp"][idx])
+            cand_sym.append(np.full(len(idx), s, dtype=np.int32))
+            cand_idx.append(idx)
+
+        cand_ts = np.concatenate(cand_ts) if cand_ts else np.empty(0, dtype=np.int64)
+        cand_sym = np.concatenate(cand_sym) if cand_sym else np.empty(0, dtype=np.int32)
+        cand_idx = np.concatenate(cand_idx) if cand_idx else np.empty(0, dtype=np.int64)
+        # Flux unique ordonné par (temps, ordre des symboles comme dans bot_loop)
+        order = np.lexsort((cand_sym, cand_ts))
+        # La décision est prise à la clôture de la bougie du signal
+        bar_ms = min((int(np.diff(d["timestamp"][:2])[0]) for d in data if len(d["timestamp"]) > 1), default=0)
+        intrabar = intrabar or {}
+
+        equity = self.capital
+        max_daily_loss = self.capital * self.max_daily_loss_pct / 100
+        daily_pnl, consecutive_losses, current_day = 0.0, 0, None
+        open_positions = {}     # symbol index -> position
+        open_bases = {}         # base -> nombre de positions
+        margin_used = 0.0
+        last_trade_ts = {}
+        exits = []              # tas (exit_ts, seq, symbol index)
+        seq = itertools.count()
+        trades, equity_curve = [], []
+        rejected = {"risk_guard": 0, "cooldown": 0, "open_position": 0, "max_positions": 0,
+                    "same_base": 0, "min_notional": 0, "margin": 0}
+
+        def roll_day(ts):
+            # Guards journaliers remis à zéro à minuit UTC
+            nonlocal daily_pnl, consecutive_losses, current_day
+            day = ts // DAY_MS
+            if day != current_day:
+                current_day = day
+                daily_pnl, consecutive_losses = 0.0, 0
+
+        def close_position(s):
+            nonlocal equity, daily_pnl, consecutive_losses, margin_used
+            pos = open_positions.pop(s)
+            base = pos["base"]
+            open_bases[base] -= 1
+            margin_used -= pos["margin"]
+            direction = 1 if pos["side"] == "long" else -1
+            pnl = (pos["exit_price"] - pos["entry_price"]) * pos["qty"] * direction - pos["costs"]
+            equity += pnl
+            daily_pnl += pnl
+            consecutive_losses = consecutive_losses + 1 if pnl < 0 else 0
+            pos["pnl_usdt"] = pnl
+            pos["equity"] = equity
+            trades.append(pos)
+            equity_curve.append((pos["exit_ts"], equity))
+
+        for c in order:
+            t = int(cand_ts[c])
+            s = int(cand_sym[c])
+            i = int(cand_idx[c])
+
+            # Sorties survenues avant la décision (bougie de sortie ≤ bougie du signal)
+            while exits and exits[0][0] < t + bar_ms:
+                exit_ts, _, exit_sym = heapq.heappop(exits)
+                roll_day(exit_ts)
+                close_position(exit_sym)
+            roll_day(t)
+
+            # check_risk_limits
+            if daily_pnl <= -max_daily_loss or consecutive_losses >= self.max_consecutive_losses:
+                rejected["risk_guard"] += 1
+                continue
+            # cooldown_ok
+            if s in last_trade_ts and t - last_trade_ts[s] <= self.cooldown_ms:
+                rejected["cooldown"] += 1
+                continue
+            # open_trade : position existante, MAX_POSITIONS, même base
+            if s in open_positions:
+                rejected["open_position"] += 1
+                continue
+            if len(open_positions) >= self.max_positions:
+                rejected["max_positions"] += 1
+                continue
+            symbol = symbols[s]
+            base = get_base_currency(symbol)
+            if open_bases.get(base, 0):
+                rejected["same_base"] += 1
+                continue
+
+            cols = data[s]
+            price = cols["close"][i]
+            atr = cols["atr"][i]
+            available = equity - margin_used
+            effective_capital = available * 0.90
+            sl_dist = max(atr * self.sl_multi, price * MIN_SL_PCT)
+            tp_dist = max(atr * self.tp_multi, price * MIN_TP_PCT)
+            qty = self.position_size(price, sl_dist, effective_capital)
+            if qty is None or qty * price < MIN_NOTIONAL_USDT:
+                rejected["min_notional"] += 1
+                last_trade_ts[s] = t
+                continue
+            margin = qty * price / self.leverage
+            if margin > available * 0.85:
+                rejected["margin"] += 1
+                last_trade_ts[s] = t
+                continue
+
+            side = int(cols["signal"][i])
+            sl = price - side * sl_dist
+            tp = price + side * tp_dist
+            trail = None
+            if self.trail_strategy is not None:
+                activation_dist, trailing_distance = trail_distances(self.trail_strategy, price, atr, tp_dist)
+                trail = (price + side * activation_dist, trailing_distance)
+            n = len(cols["close"])
+            end = n if self.max_holding_bars is None else min(n, i + 1 + self.max_holding_bars)
+            htf = (cols["open"], cols["high"], cols["low"], cols["close"])
+            if symbol in intrabar:
+                exit_i, exit_price, reason, exit_ts = intrabar[symbol].resolve(
+                    i + 1, end, side, sl, tp, trail, htf=htf)
+            else:
+                exit_i, exit_price, reason = resolve_exit(*htf, i + 1, end, side, sl, tp, trail)
+                exit_ts = int(cols["timestamp"][exit_i])
+
+            fees = funding = slippage = 0.0
+            if self.cost_model is not None:
+                volume = cols["volume"]
+                costs = self.cost_model.trade_costs(
+                    side, price, exit_price, reason, qty=qty, entry_ts=t, exit_ts=exit_ts,
+                    entry_volume=volume[i] if volume is not None else None,
+                    exit_volume=volume[exit_i] if volume is not None else None,
+                    symbol=symbol,
+                )
+                fees = float(costs["fees"]) * qty
+                funding = float(costs["funding"]) * qty
+                slippage = float(costs["slippage"]) * qty
+
+            last_trade_ts[s] = t
+            open_positions[s] = {
+                "symbol": symbol,
+                "base": base,
+                "side": "long" if side > 0 else "short",
+                "entry_ts": t,
+                "entry_price": price,
+                "exit_ts": exit_ts,
+                "exit_price": float(exit_price),
+                "exit_reason": reason,
+                "qty": qty,
+                "margin": margin,
+                "score": cols["score"][i],
+                "bars_held": exit_i - i,
+                "fees": fees,
+                "funding": funding,
+                "slippage": slippage,
+                "costs": fees + funding + slippage,
+            }
+            open_bases[base] = open_bases.get(base, 0) + 1
+            margin_used += margin
+            heapq.heappush(exits, (open_positions[s]["exit_ts"], next(seq), s))
+
+        while exits:
+            _, _, exit_sym = heapq.heappop(exits)
+            close_position(exit_sym)
+
+        trades_df = pd.DataFrame(trades)
+        equity_df = pd.DataFrame(equity_curve, columns=["timestamp", "equity"])
+        return {
+            "trades": trades_df,
+            "equity": equity_df,
+            "stats": self._stats(trades_df, equity_df),
+            "rejected": rejected,
+        }
+
+    def _stats(self, trades, equity):
+        if trades.empty:
+            return {"trades": 0, "final_equity": self.capital, "return_pct": 0.0,
+                    "win_rate": 0.0, "profit_factor": 0.0, "max_drawdown_pct": 0.0}
+        wins = trades.loc[trades["pnl_usdt"] > 0, "pnl_usdt"].sum()
+        losses = -trades.loc[trades["pnl_usdt"] < 0, "pnl_usdt"].sum()
+        curve = np.concatenate([[self.capital], equity["equity"].to_numpy()])
+        running_max = np.maximum.accumulate(curve)
+        final = float(curve[-1])
+        return {
+            "trades": len(trades),
+            "final_equity": round(final, 2),
+            "return_pct": round((final / self.capital - 1) * 100, 2),
+            "win_rate": round(float((trades["pnl_usdt"] > 0).mean() * 100), 2),
+            "profit_factor": round(float(wins / losses), 2) if losses > 0 else float("inf"),
+            "max_drawdown_pct": round(float(((curve - running_max) / running_max).min() * 100), 2),
+            "fees_usdt": round(float(trades["fees"].sum()), 2),
+            "funding_usdt": round(float(trades["funding"].sum()), 2),
+            "slippage_usdt": round(float(trades["slippage"].sum()), 2),
+        }
+
+
+def main():
+    from auto_tuner import AutoTuner
+    from cost_model import get_cost_model
+    import market_data
+
+    parser = argparse.ArgumentParser(description="Backtest portefeuille multi-symboles (archive market_data)")
+    parser.add_argument("--symbols", required=True, help="liste séparée par des virgules")
+    parser.add_argument("--strategy", default="scalping_5m", help="scalping_5m | v6_aggressive | v7_robust")
+    parser.add_argument("--timeframe", default="5m")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--intrabar", action="store_true", help="résout les sorties sur les bougies 1m de l'archive")
+    parser.add_argument("--trail", action="store_true", help="modélise le trailing stop de la stratégie")
+    args = parser.parse_args()
+
+    tuner = AutoTuner(None, None)
+    apply_ind, check_sig = tuner.strategies[args.strategy]
+    warmup = tuner.warmup.get(args.strategy, 25)
+    start_ms = int((time.time() - args.days * 86400) * 1000)
+
+    frames, intrabar = {}, {}
+    for symbol in args.symbols.split(","):
+        df = market_data.load_dataframe(symbol, args.timeframe, start_ms=start_ms)
+        if len(df) <= warmup:
+            print(f"⚠️ {symbol}: pas assez de données dans l'archive ({len(df)} bougies)")
+            continue
+        t0 = time.perf_counter()
+        frames[symbol] = precompute_signals(df, apply_ind, check_sig, warmup)
+        print(f"📈 {symbol}: {len(df)} bougies, signaux en {time.perf_counter() - t0:.1f}s", flush=True)
+        if args.intrabar:
+            intrabar[symbol] = IntrabarIndex.from_archive(symbol, df["timestamp"], args.timeframe)
+
+    t0 = time.perf_counter()
+    backtester = PortfolioBacktester(trail_strategy=args.strategy if args.trail else None,
+                                     cost_model=get_cost_model())
+    result = backtester.run(frames, intrabar=intrabar)
+    print(f"⏱️ Simulation portefeuille: {time.perf_counter() - t0:.3f}s")
+    print(f"📊 {result['stats']}")
+    print(f"🚫 Rejets: {result['rejected']}")
+    fallbacks = sum(index.fallbacks for index in intrabar.values())
+    if fallbacks:
+        print(f"⚠️ {fallbacks} sortie(s) résolue(s) sans 1m (archive incomplète)")
+
+
+if __name__ == "__main__":
+    main()
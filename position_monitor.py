@@ -0,0 +1,111 @@
+"""
+Suivi rapide des positions ouvertes, séparé de la recherche de signaux
+
+La boucle de scan des bots ne tourne qu'à la clôture des bougies ; les
+trailing stops et les sorties SL/TP simulées (mode paper) ne peuvent pas
+attendre aussi longtemps. PositionMonitor tourne dans son propre thread :
+à chaque tick (POSITION_MONITOR_INTERVAL, sous la seconde par défaut), un
+seul appel groupé fetch_tickers pour les seuls symboles en position, puis
+le callback du bot reçoit {symbole: dernier prix}.
+
+Sans position ouverte, aucun appel n'est fait. Après une erreur, le tick
+suivant est retardé (backoff jusqu'à MAX_BACKOFF_SECONDS) pour ne pas
+insister sur une API en difficulté.
+
+Usage :
+    monitor = PositionMonitor(exchange, open_symbols, on_prices)
+    monitor.start()
+"""
+import os
+import threading
+import time
+
+POSITION_MONITOR_INTERVAL = float(os.getenv("POSITION_MONITOR_INTERVAL", "0.5"))
+MAX_BACKOFF_SECONDS = 10.0
+
+
+def ticker_price(ticker):
+    """Dernier prix d'un ticker ccxt (last, sinon close, sinon milieu bid/ask)"""
+    for key in ("last", "close"):
+        if ticker.get(key):
+            return float(ticker[key])
+    if ticker.get("bid") and ticker.get("ask"):
+        return (float(ticker["bid"]) + float(ticker["ask"])) / 2
+    return None
+
+
+class PositionMonitor:
+    def __init__(self, exchange, symbols, on_prices, interval=POSITION_MONITOR_INTERVAL, name="positions"):
+        """
+        symbols   : callable → symboles actuellement en position
+        on_prices : callable({symbole: prix}) appelé à chaque tick
+        """
+        self.exchange = exchange
+        self.symbols = symbols
+        self.on_prices = on_prices
+        self.interval = interval
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+        self.ticks = 0
+        self.errors = 0
+        self.last_tick_at = None
+        self.last_latency_ms = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"monitor-{self.name}", daemon=True)
+        self._thread.start()
+        print(f"👁️ Suivi des positions actif ({self.name}, tick {self.interval}s)", flush=True)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def poll_once(self):
+        """Un tick : prix des symboles en position, transmis au callback"""
+        symbols = list(self.symbols())
+        if not symbols:
+            return {}
+        t0 = time.perf_counter()
+        tickers = self.exchange.fetch_tickers(symbols)
+        self.last_latency_ms = (time.perf_counter() - t0) * 1000
+        prices = {}
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            price = ticker_price(ticker) if ticker else None
+            if price is not None:
+                prices[symbol] = price
+        if prices:
+            self.on_prices(prices)
+        self.ticks += 1
+        self.last_tick_at = time.time()
+        return prices
+
+    def _run(self):
+        backoff = 0.0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+                backoff = 0.0
+            except Exception as e:
+                self.errors += 1
+                backoff = min(MAX_BACKOFF_SECONDS, max(self.interval, backoff * 2))
+                print(f"⚠️ Suivi des positions ({self.name}): {e} — reprise dans {backoff:.1f}s", flush=True)
+            wait = backoff or self.interval - (time.monotonic() - started)
+            self._stop.wait(max(wait, 0.0))
+
+    def status(self):
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "interval_s": self.interval,
+            "ticks": self.ticks,
+            "errors": self.errors,
+            "last_tick_at": self.last_tick_at,
+            "last_latency_ms": round(self.last_latency_ms, 1) if self.last_latency_ms is not None else None,
+        }
@@ -0,0 +1,112 @@
+"""
+Snapshot partagé de l'état d'un bot (SQLite en mode WAL)
+
+Le bot publie son état (signaux, statut, positions) à chaque sauvegarde,
+depuis la boucle de trading ; un heartbeat republie ces payloads pour garder
+le snapshot frais. Le serveur API tourne dans un processus séparé et ne fait
+que lire.
+Les payloads sont stockés déjà sérialisés en JSON : le serveur les renvoie
+tels quels, sans re-sérialisation à chaque requête.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SNAPSHOT_DB = os.getenv("SNAPSHOT_DB", "data/api_snapshot.db")
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    # WAL : les lecteurs ne bloquent jamais l'écrivain (et inversement)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            bot TEXT,
+            key TEXT,
+            payload TEXT,
+            updated_at REAL,
+            PRIMARY KEY (bot, key)
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+class SnapshotWriter:
+    """Côté bot : publie l'état courant dans le snapshot partagé"""
+
+    def __init__(self, bot_name, path=SNAPSHOT_DB):
+        self.bot_name = bot_name
+        self.path = path
+        self.conn = None
+        # La boucle et le heartbeat publient sur la même connexion
+        self._lock = threading.Lock()
+        self._payloads = {}   # clé -> dernier payload JSON publié
+
+    def publish(self, **payloads):
+        """
+        Publie plusieurs clés en une seule transaction (ex: publish(signals=[...], status={...})).
+        À appeler depuis le thread qui possède l'état : les valeurs sont sérialisées ici.
+        """
+        self._write({key: json.dumps(value, default=str) for key, value in payloads.items()})
+
+    def republish(self, **payloads):
+        """
+        Republie les derniers payloads avec une date fraîche (heartbeat, depuis
+        un autre thread : l'état du bot n'est pas relu), plus d'éventuelles clés
+        `payloads` sûres à lire depuis ce thread
+        """
+        serialized = {key: json.dumps(value, default=str) for key, value in payloads.items()}
+        with self._lock:
+            serialized = {**self._payloads, **serialized}
+        self._write(serialized)
+
+    def _write(self, serialized):
+        now = time.time()
+        rows = [(self.bot_name, key, payload, now) for key, payload in serialized.items()]
+        with self._lock:
+            if self.conn is None:
+                self.conn = _connect(self.path)
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO snapshots (bot, key, payload, updated_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            self._payloads.update(serialized)
+
+
+class SnapshotReader:
+    """Côté serveur API : lit le dernier état publié par le bot"""
+
+    def __init__(self, bot_name, path=SNAPSHOT_DB):
+        self.bot_name = bot_name
+        self.path = path
+        self.conn = None
+        self.pid = None
+
+    def _get_conn(self):
+        # Une connexion par processus (les workers sont forkés après l'import)
+        if self.conn is None or self.pid != os.getpid():
+            self.conn = _connect(self.path)
+            self.pid = os.getpid()
+        return self.conn
+
+    def get_raw(self, key):
+        """Retourne (payload_json, updated_at) ou (None, None)"""
+        row = self._get_conn().execute(
+            "SELECT payload, updated_at FROM snapshots WHERE bot = ? AND key = ?",
+            (self.bot_name, key)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return row[0], row[1]
+
+    def get(self, key, default=None):
+        payload, _ = self.get_raw(key)
+        if payload is None:
+            return default
+        return json.loads(payload)
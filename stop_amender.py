@@ -0,0 +1,168 @@
+"""
+Envoi groupé et limité des modifications de stop (trailing) à l'exchange
+
+Le trailing stop logiciel recalcule un stop théorique à chaque prix : un
+appel trading-stop à chaque amélioration sature l'API dans les mouvements
+rapides et certaines modifications sont refusées. StopAmender garde en
+mémoire, par position, le stop souhaité et le dernier stop accepté par
+l'exchange ; flush() n'envoie que le plus récent (les intermédiaires sont
+fusionnés), et seulement si :
+  - l'amélioration dépasse le seuil de la position : max(STOP_AMEND_MIN_TICKS
+    ticks, STOP_AMEND_ATR_FRACTION × ATR)
+  - ou, pour une amélioration plus petite (≥ 1 tick), si le dernier envoi
+    date d'au moins STOP_AMEND_MIN_INTERVAL secondes
+Un refus laisse le stop accepté inchangé ; le même stop n'est retenté
+qu'après l'intervalle minimal. Au plus STOP_AMEND_MAX_PER_SECOND envois par
+seconde, toutes positions confondues (plus grosses améliorations d'abord).
+
+stats() : nombre de modifications envoyées / acceptées / refusées /
+fusionnées et latence d'acquittement (moyenne, max, dernière).
+
+Usage :
+    amender = StopAmender(send_stop)       # send_stop(symbol, stop) -> (ok, détail)
+    amender.open(symbol, "long", sl_price, tick_size=0.01, atr=atr)
+    amender.desire(symbol, new_sl)         # à chaque prix
+    amender.flush()                        # une fois par tick de suivi
+"""
+import os
+import threading
+import time
+
+STOP_AMEND_MIN_INTERVAL = float(os.getenv("STOP_AMEND_MIN_INTERVAL", "5"))
+STOP_AMEND_MIN_TICKS = int(os.getenv("STOP_AMEND_MIN_TICKS", "5"))
+STOP_AMEND_ATR_FRACTION = float(os.getenv("STOP_AMEND_ATR_FRACTION", "0.1"))
+STOP_AMEND_MAX_PER_SECOND = float(os.getenv("STOP_AMEND_MAX_PER_SECOND", "5"))
+
+
+class _Position:
+    __slots__ = ("side", "tick", "threshold", "acked", "desired", "last_sent_at", "last_rejected")
+
+    def __init__(self, side, stop, tick, threshold):
+        self.side = 1 if side == "long" else -1
+        self.tick = tick
+        self.threshold = threshold
+        self.acked = stop           # dernier stop accepté par l'exchange
+        self.desired = stop         # stop souhaité le plus récent
+        self.last_sent_at = None
+        self.last_rejected = None   # stop refusé, pas retenté avant l'intervalle
+
+    def improvement(self):
+        return self.side * (self.desired - self.acked)
+
+
+class StopAmender:
+    def __init__(self, send, min_interval=STOP_AMEND_MIN_INTERVAL, min_ticks=STOP_AMEND_MIN_TICKS,
+                 atr_fraction=STOP_AMEND_ATR_FRACTION, max_per_second=STOP_AMEND_MAX_PER_SECOND):
+        """send(symbol, stop) -> (ok, détail) : appel exchange synchrone"""
+        self.send = send
+        self.min_interval = min_interval
+        self.min_ticks = min_ticks
+        self.atr_fraction = atr_fraction
+        self.max_per_second = max_per_second
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._tokens = max_per_second
+        self._refilled_at = time.monotonic()
+        self.counts = {"desired": 0, "sent": 0, "acked": 0, "rejected": 0, "errors": 0}
+        self._latencies_ms = []
+        self.last_latency_ms = None
+
+    # ── Positions ─────────────────────────────────────────────────────────────
+    def open(self, symbol, side, stop, tick_size=None, atr=None):
+        """Suit une position dont le stop `stop` est déjà en place sur l'exchange"""
+        tick = float(tick_size or 0.0)
+        threshold = max(self.min_ticks * tick, self.atr_fraction * float(atr or 0.0))
+        with self._lock:
+            self._positions[symbol] = _Position(side, stop, tick, threshold)
+
+    def close(self, symbol):
+        with self._lock:
+            self._positions.pop(symbol, None)
+
+    def desire(self, symbol, stop):
+        """Nouveau stop souhaité (ignoré s'il ne l'améliore pas) ; rien n'est envoyé ici"""
+        with self._lock:
+            pos = self._positions.get(symbol)
+            if pos is None or pos.side * (stop - pos.desired) <= 0:
+                return False
+            pos.desired = stop
+            self.counts["desired"] += 1
+            return True
+
+    def acked_stop(self, symbol):
+        pos = self._positions.get(symbol)
+        return pos.acked if pos else None
+
+    # ── Envoi ─────────────────────────────────────────────────────────────────
+    def _due(self, pos, now):
+        improvement = pos.improvement()
+        if improvement < max(pos.tick, 1e-12):
+            return False
+        recent = pos.last_sent_at is not None and now - pos.last_sent_at < self.min_interval
+        if pos.last_rejected == pos.desired and recent:
+            return False
+        return improvement >= pos.threshold or not recent
+
+    def _take_token(self, now):
+        self._tokens = min(self.max_per_second,
+                           self._tokens + (now - self._refilled_at) * self.max_per_second)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def flush(self):
+        """Envoie les stops dus (plus grosses améliorations d'abord). Retourne le nombre d'envois."""
+        now = time.monotonic()
+        with self._lock:
+            due = [(symbol, pos) for symbol, pos in self._positions.items() if self._due(pos, now)]
+        due.sort(key=lambda item: item[1].improvement(), reverse=True)
+
+        sent = 0
+        for symbol, pos in due:
+            if not self._take_token(now):
+                break
+            stop = pos.desired
+            pos.last_sent_at = now
+            t0 = time.perf_counter()
+            try:
+                ok, detail = self.send(symbol, stop)
+            except Exception as e:
+                ok, detail = False, e
+                self.counts["errors"] += 1
+            latency = (time.perf_counter() - t0) * 1000
+            sent += 1
+            with self._lock:
+                self.counts["sent"] += 1
+                self.last_latency_ms = latency
+                self._latencies_ms.append(latency)
+                del self._latencies_ms[:-500]
+                if ok:
+                    self.counts["acked"] += 1
+                    # Un stop souhaité plus récent reste à envoyer
+                    if pos.side * (stop - pos.acked) > 0:
+                        pos.acked = stop
+                    pos.last_rejected = None
+                else:
+                    self.counts["rejected"] += 1
+                    pos.last_rejected = stop
+            if not ok:
+                print(f"⚠️ [{symbol}] Stop {stop} refusé: {detail}", flush=True)
+        return sent
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies_ms)
+            counts = dict(self.counts)
+            pending = sum(1 for pos in self._positions.values() if pos.improvement() > 0)
+        # Améliorations fusionnées : souhaitées mais jamais envoyées telles quelles
+        counts["coalesced"] = max(0, counts["desired"] - counts["sent"])
+        return {
+            **counts,
+            "positions": len(self._positions),
+            "pending": pending,
+            "latency_ms_avg": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "latency_ms_max": round(max(latencies), 1) if latencies else None,
+            "latency_ms_last": round(self.last_latency_ms, 1) if self.last_latency_ms is not None else None,
+        }
@@ -2,6 +2,9 @@
 Stratégie avancée avec EMA, MACD, RSI, Stochastic, Bollinger Bands
 et OTE (Optimal Trade Entry) sur retracements Fibonacci
 Version avec logs de débogage et export CSV pour dashboard
+
+replay_signals() rejoue la même machine à états sur tout un historique en une
+passe (backtests), sans logs ni écriture CSV.
 """
 import pandas as pd
 import numpy as np
@@ -10,6 +13,8 @@ import os
 import logging
 import csv
 
+from strategy_params import AIEnhancedParams, ParamStore
+
 # Configuration des logs
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -20,6 +25,10 @@ logger = logging.getLogger(__name__)
 # =========================
 _symbol_states = {}  # { symbol: { bios_level, bios_direction, ote_active, ote_entry_zone } }
 
+# Paramètres résolus une fois (défauts, env, STRATEGY_PARAMS_FILE) et rechargés à chaud.
+# Les fonctions prennent params=None → jeu courant ; à lire une fois par évaluation.
+PARAMS = ParamStore(AIEnhancedParams, "ai_enhanced")
+
 def _get_sym_state(symbol):
     if symbol not in _symbol_states:
         _symbol_states[symbol] = {
@@ -97,18 +106,29 @@ def log_signal_to_file(signal_data):
     except Exception as e:
         logger.error(f"Erreur lors du log du signal: {e}")
 
+def _previous(values):
+    """Valeurs décalées d'une bougie (NaN sur la première), comme shift(1)"""
+    out = np.empty_like(values)
+    out[:1] = np.nan
+    out[1:] = values[:-1]
+    return out
+
+def _rolling_extreme(values, window, reduce):
+    """Min / max glissant sur `window` bougies (NaN pendant le warmup), comme rolling().min()"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = reduce(np.lib.stride_tricks.sliding_window_view(values, window), axis=1)
+    return out
+
 def calculate_atr(df, period=14):
     """Calcule l'ATR (Average True Range) pour la volatilité adaptative"""
-    high = df['high']
-    low = df['low']
-    close = df['close'].shift(1)
-
-    tr1 = high - low
-    tr2 = abs(high - close)
-    tr3 = abs(low - close)
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    close = _previous(df['close'].to_numpy(dtype=np.float64))
 
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    atr = tr.rolling(window=period).mean()
+    # fmax ignore les NaN comme max(axis=1) (première bougie : high - low)
+    tr = np.fmax(np.fmax(high - low, np.abs(high - close)), np.abs(low - close))
+    atr = pd.Series(tr, index=df.index).rolling(window=period).mean()
 
     return atr
 
@@ -129,9 +149,10 @@ def calculate_macd(df, fast=12, slow=26, signal=9):
 
 def calculate_rsi(df, period=14):
     """Calcule RSI"""
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    close = df['close'].to_numpy(dtype=np.float64)
+    delta = close - _previous(close)
+    gain = pd.Series(np.where(delta > 0, delta, 0.0), index=df.index).rolling(window=period).mean()
+    loss = pd.Series(-np.where(delta < 0, delta, 0.0), index=df.index).rolling(window=period).mean()
 
     rs = gain / loss
     rsi = 100 - (100 / (1 + rs))
@@ -140,18 +161,21 @@ def calculate_rsi(df, period=14):
 
 def calculate_stochastic(df, k_period=14, d_period=3):
     """Calcule Stochastic Oscillator"""
-    low_min = df['low'].rolling(window=k_period).min()
-    high_max = df['high'].rolling(window=k_period).max()
+    low_min = _rolling_extreme(df['low'].to_numpy(dtype=np.float64), k_period, np.min)
+    high_max = _rolling_extreme(df['high'].to_numpy(dtype=np.float64), k_period, np.max)
 
-    k = 100 * ((df['close'] - low_min) / (high_max - low_min))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100 * ((df['close'].to_numpy(dtype=np.float64) - low_min) / (high_max - low_min))
+    k = pd.Series(k, index=df.index)
     d = k.rolling(window=d_period).mean()
 
     return k, d
 
 def calculate_bollinger_bands(df, period=20, std_dev=2):
     """Calcule Bollinger Bands"""
-    sma = df['close'].rolling(window=period).mean()
-    std = df['close'].rolling(window=period).std()
+    rolling = df['close'].rolling(window=period)
+    sma = rolling.mean()
+    std = rolling.std()
 
     upper_band = sma + (std * std_dev)
     lower_band = sma - (std * std_dev)
@@ -180,28 +204,23 @@ def detect_bios(df):
 
     return None
 
-def calculate_fibonacci_retracement(swing_low, swing_high):
+def calculate_fibonacci_retracement(swing_low, swing_high, params=None):
     """
     Calcule les niveaux Fibonacci avec niveaux configurables
     """
+    p = params or PARAMS.get()
     diff = swing_high - swing_low
 
-    # Niveaux Fibonacci depuis variables d'env
-    fib_382 = float(os.getenv('FIB_382', '0.382'))
-    fib_500 = float(os.getenv('FIB_500', '0.5'))
-    fib_618 = float(os.getenv('FIB_618', '0.618'))
-    fib_786 = float(os.getenv('FIB_786', '0.786'))
-
     return {
         '0.0': swing_low,
-        '0.382': swing_low + diff * fib_382,
-        '0.5': swing_low + diff * fib_500,
-        '0.618': swing_low + diff * fib_618,
-        '0.786': swing_low + diff * fib_786,
+        '0.382': swing_low + diff * p.fib_382,
+        '0.5': swing_low + diff * p.fib_500,
+        '0.618': swing_low + diff * p.fib_618,
+        '0.786': swing_low + diff * p.fib_786,
         '1.0': swing_high
     }
 
-def detect_ote_zone(df, bios_direction, bios_level):
+def detect_ote_zone(df, bios_direction, bios_level, params=None):
     """
     Détecte la zone OTE (Optimal Trade Entry) sur retracement Fibonacci
     OTE = zone entre 0.618 et 0.786 du dernier mouvement
@@ -209,21 +228,20 @@ def detect_ote_zone(df, bios_direction, bios_level):
     if len(df) < 30:
         return None
 
-    # Récupérer les niveaux Fibonacci depuis variables d'env
-    fib_entry_min = float(os.getenv('FIB_ENTRY_MIN', '0.618'))
-    fib_entry_max = float(os.getenv('FIB_ENTRY_MAX', '0.786'))
+    p = params or PARAMS.get()
+    fib_entry_min, fib_entry_max = p.fib_entry_keys
 
     if bios_direction == 'bullish':
-        # Trouver le dernier swing low avant le BIOS
-        swings = df['low'].rolling(window=5, center=True).min()
-        swing_low = swings[swings == swings].iloc[-10:-2].min()
+        # Dernier swing low avant le BIOS : minimum centré sur 5 bougies,
+        # valeurs [-10:-2] = plus bas des bougies [-14:-2] (sans rolling sur tout le cadre)
+        swing_low = df['low'].iloc[-14:-2].min()
 
         if pd.isna(swing_low):
             return None
 
-        fibs = calculate_fibonacci_retracement(swing_low, bios_level)
-        ote_low = fibs[str(fib_entry_min)]
-        ote_high = fibs[str(fib_entry_max)]
+        fibs = calculate_fibonacci_retracement(swing_low, bios_level, p)
+        ote_low = fibs[fib_entry_min]
+        ote_high = fibs[fib_entry_max]
 
         return {
             'direction': 'long',
@@ -232,16 +250,15 @@ def detect_ote_zone(df, bios_direction, bios_level):
         }
 
     elif bios_direction == 'bearish':
-        # Trouver le dernier swing high avant le BIOS
-        swings = df['high'].rolling(window=5, center=True).max()
-        swing_high = swings[swings == swings].iloc[-10:-2].max()
+        # Dernier swing high avant le BIOS (mêmes bougies [-14:-2])
+        swing_high = df['high'].iloc[-14:-2].max()
 
         if pd.isna(swing_high):
             return None
 
-        fibs = calculate_fibonacci_retracement(bios_level, swing_high)
-        ote_low = fibs[str(fib_entry_min)]
-        ote_high = fibs[str(fib_entry_max)]
+        fibs = calculate_fibonacci_retracement(bios_level, swing_high, p)
+        ote_low = fibs[fib_entry_min]
+        ote_high = fibs[fib_entry_max]
 
         return {
             'direction': 'short',
@@ -251,20 +268,22 @@ def detect_ote_zone(df, bios_direction, bios_level):
 
     return None
 
-def calculate_adaptive_thresholds(df):
+def calculate_adaptive_thresholds(df, params=None):
     """
     Calcule des seuils adaptatifs basés sur la volatilité (ATR)
     """
-    atr = calculate_atr(df)
+    p = params or PARAMS.get()
+    # ATR déjà calculé par apply_indicators si présent
+    atr = df['atr'] if 'atr' in df.columns else calculate_atr(df)
     current_atr = atr.iloc[-1]
     current_price = df['close'].iloc[-1]
     atr_pct = current_atr / current_price
 
-    # Seuils de base depuis variables d'env
-    rsi_ob_base = float(os.getenv('RSI_OVERBOUGHT_BASE', '70'))
-    rsi_os_base = float(os.getenv('RSI_OVERSOLD_BASE', '30'))
-    stoch_ob_base = float(os.getenv('STOCH_OVERBOUGHT_BASE', '80'))
-    stoch_os_base = float(os.getenv('STOCH_OVERSOLD_BASE', '20'))
+    # Seuils de base (AIEnhancedParams)
+    rsi_ob_base = p.rsi_overbought_base
+    rsi_os_base = p.rsi_oversold_base
+    stoch_ob_base = p.stoch_overbought_base
+    stoch_os_base = p.stoch_oversold_base
 
     # Ajuster les seuils selon la volatilité
     if atr_pct > 0.02:  # Forte volatilité (>2%)
@@ -291,33 +310,37 @@ def calculate_adaptive_thresholds(df):
         'atr_pct': atr_pct
     }
 
-def apply_indicators(df):
+def apply_indicators(df, params=None):
     """
     Applique tous les indicateurs techniques
+    (colonnes ajoutées en un seul bloc : un insert pandas par colonne coûtait
+    plus cher que les calculs eux-mêmes sur 300 bougies)
     """
-    df = df.copy()
+    p = params or PARAMS.get()
+    cols = {}
 
-    # EMAs
-    df['ema20'] = calculate_ema(df, 20)
-    df['ema50'] = calculate_ema(df, 50)
-    df['ema200'] = calculate_ema(df, 200)
+    # EMAs (ema20 / ema50 : EMA rapide / lente de la tendance, noms historiques)
+    cols['ema20'] = calculate_ema(df, p.ema_fast)
+    cols['ema50'] = calculate_ema(df, p.ema_slow)
+    cols['ema200'] = calculate_ema(df, 200)
 
     # MACD
-    df['macd'], df['macd_signal'], df['macd_hist'] = calculate_macd(df)
+    cols['macd'], cols['macd_signal'], cols['macd_hist'] = calculate_macd(df)
 
     # RSI
-    df['rsi'] = calculate_rsi(df)
+    cols['rsi'] = calculate_rsi(df, p.rsi_period)
 
     # Stochastic
-    df['stoch_k'], df['stoch_d'] = calculate_stochastic(df)
+    cols['stoch_k'], cols['stoch_d'] = calculate_stochastic(df)
 
     # Bollinger Bands
-    df['bb_upper'], df['bb_middle'], df['bb_lower'] = calculate_bollinger_bands(df)
+    cols['bb_upper'], cols['bb_middle'], cols['bb_lower'] = calculate_bollinger_bands(df)
 
     # ATR
-    df['atr'] = calculate_atr(df)
+    cols['atr'] = calculate_atr(df)
 
-    return df
+    base = df.drop(columns=[c for c in cols if c in df.columns])
+    return pd.concat([base, pd.DataFrame(cols, index=df.index)], axis=1)
 
 def detect_trend(df):
     """
@@ -338,7 +361,7 @@ def detect_trend(df):
 
     return None
 
-def detect_momentum_signal(df, trend):
+def detect_momentum_signal(df, trend, params=None):
     """
     Détecte les signaux de momentum (MACD, RSI, Stochastic)
     """
@@ -346,7 +369,7 @@ def detect_momentum_signal(df, trend):
     prev = df.iloc[-2]
 
     # Seuils adaptatifs selon volatilité
-    thresholds = calculate_adaptive_thresholds(df)
+    thresholds = calculate_adaptive_thresholds(df, params)
 
     signals = []
 
@@ -404,16 +427,17 @@ def calculate_signal_strength(df, signal):
 
     return strength
 
-def calculate_sl_tp_adaptive(entry_price, side, df):
+def calculate_sl_tp_adaptive(entry_price, side, df, params=None):
     """
     Calcule SL/TP adaptatifs basés sur ATR avec ratios configurables
     """
+    p = params or PARAMS.get()
     atr = df['atr'].iloc[-1]
     atr_pct = atr / entry_price
 
-    # Ratios depuis variables d'env
-    sl_atr_multiplier = float(os.getenv('SL_ATR_MULTIPLIER', '1.5'))
-    tp_atr_multiplier = float(os.getenv('TP_ATR_MULTIPLIER', '3.0'))
+    # Ratios (AIEnhancedParams)
+    sl_atr_multiplier = p.sl_atr_multiplier
+    tp_atr_multiplier = p.tp_atr_multiplier
 
     # SL et TP basés sur ATR
     sl_distance = atr * sl_atr_multiplier
@@ -428,13 +452,19 @@ def calculate_sl_tp_adaptive(entry_price, side, df):
 
     return round(sl_price, 2), round(tp_price, 2), atr_pct
 
-def debug_check_signal(df, symbol=None):
+def evaluate_signal(df, symbol=None, params=None):
     """
-    Évalue le signal BIOS/OTE/Momentum pour un symbole donné.
+    Évalue le signal BIOS/OTE/Momentum pour un symbole donné, sans écriture.
     L'état de la machine à états est isolé par symbole (plus d'interférence
     entre les 10 symboles du bot multi-symbol).
+
+    df : bougies brutes, ou déjà passées par apply_indicators (pas de recalcul)
+    params : AIEnhancedParams (défaut : jeu courant, lu une fois pour l'évaluation)
+    Retourne (signal, signal_data, df enrichi) ; signal_data est la ligne
+    du journal des signaux (logs/signals_log.csv), à écrire une seule fois.
     """
     sym = symbol or os.getenv('SYMBOL', 'UNKNOWN')
+    p = params or PARAMS.get()
 
     signal_data = {
         'bot_name': 'ZONE2_AI',
@@ -449,10 +479,10 @@ def debug_check_signal(df, symbol=None):
 
     if len(df) < 50:
         signal_data['reason_not_executed'] = 'Pas assez de données'
-        log_signal_to_file(signal_data)
-        return None
+        return None, signal_data, df
 
-    df = apply_indicators(df)
+    if 'ema20' not in df.columns:
+        df = apply_indicators(df, p)
     last = df.iloc[-1]
 
     signal_data['rsi']     = last.get('rsi', 0)
@@ -470,9 +500,8 @@ def debug_check_signal(df, symbol=None):
 
     if not trend:
         signal_data['reason_not_executed'] = 'Pas de tendance claire'
-        log_signal_to_file(signal_data)
         reset_state(sym)
-        return None
+        return None, signal_data, df
 
     # ── État isolé par symbole ────────────────────────────────────────────────
     state = _get_sym_state(sym)
@@ -482,7 +511,7 @@ def debug_check_signal(df, symbol=None):
     # chaque bougie en tendance et reset ote_active indéfiniment)
     bios = detect_bios(df)
     if bios and bios['direction'] == trend and not state['ote_active']:
-        ote = detect_ote_zone(df, bios['direction'], bios['level'])
+        ote = detect_ote_zone(df, bios['direction'], bios['level'], p)
         if ote:
             state['bios_level']     = bios['level']
             state['bios_direction'] = bios['direction']
@@ -495,15 +524,13 @@ def debug_check_signal(df, symbol=None):
     # Étape 2 : Vérifier qu'on a un setup en cours
     if not state['bios_level'] or not state['ote_entry_zone']:
         signal_data['reason_not_executed'] = 'Pas de BIOS / Attente breakout'
-        log_signal_to_file(signal_data)
-        return None
+        return None, signal_data, df
 
     # Invalidation si la tendance s'inverse
     if trend != state['bios_direction']:
         reset_state(sym)
         signal_data['reason_not_executed'] = 'Tendance inversée'
-        log_signal_to_file(signal_data)
-        return None
+        return None, signal_data, df
 
     # Étape 3 : Pullback dans la zone OTE
     current_price = df['close'].iloc[-1]
@@ -515,13 +542,12 @@ def debug_check_signal(df, symbol=None):
             logger.info(f"[{sym}] ✅ Prix dans la zone OTE — attente momentum...")
         else:
             signal_data['reason_not_executed'] = f'Attente Pullback OTE ({zone_low:.2f}-{zone_high:.2f})'
-            log_signal_to_file(signal_data)
-            return None
+            return None, signal_data, df
 
     signal_data['ote_zone'] = True
 
     # Étape 4 : Confirmation momentum
-    signals = detect_momentum_signal(df, trend)
+    signals = detect_momentum_signal(df, trend, p)
     if trend == 'bullish':
         required = ['macd_bullish', 'rsi_healthy_bull', 'stoch_bullish']
     else:
@@ -533,8 +559,7 @@ def debug_check_signal(df, symbol=None):
 
     if score < 2:
         signal_data['reason_not_executed'] = f'Momentum insuffisant ({score}/3)'
-        log_signal_to_file(signal_data)
-        return None
+        return None, signal_data, df
 
     # ── Signal validé ────────────────────────────────────────────────────────
     result = 'long' if trend == 'bullish' else 'short'
@@ -543,11 +568,143 @@ def debug_check_signal(df, symbol=None):
     signal_data['signal']               = result
     signal_data['executed']             = True
     signal_data['reason_not_executed']  = ''
-    log_signal_to_file(signal_data)
 
     logger.info(f"[{sym}] 🎉 SIGNAL: {result}")
-    return result
+    return result, signal_data, df
+
+
+def debug_check_signal(df, symbol=None, params=None):
+    """evaluate_signal + écriture de la ligne dans le journal des signaux"""
+    signal, signal_data, _ = evaluate_signal(df, symbol, params)
+    log_signal_to_file(signal_data)
+    return signal
 
 
 # Garder l'ancien nom pour la compatibilité
 check_signal = debug_check_signal
+
+
+# =========================
+# REJEU EN BATCH (backtests)
+# =========================
+def replay_signals(df, params=None):
+    """
+    Signaux de debug_check_signal bougie par bougie sur tout l'historique.
+
+    Équivalent à reset_state() puis debug_check_signal(df.iloc[:i+1]) pour
+    chaque i, mais les indicateurs sont calculés une seule fois (ils sont
+    causaux) et la machine à états BIOS → OTE → momentum est parcourue en
+    une passe, sans log ni écriture CSV. L'état live (_symbol_states)
+    n'est pas touché.
+
+    df : bougies OHLC complètes (sans NaN), avec ou sans apply_indicators
+    params : AIEnhancedParams (défaut : jeu courant)
+    Retourne un tableau (objet) de 'long' / 'short' / None par bougie.
+    """
+    p = params or PARAMS.get()
+    n = len(df)
+    signals = np.full(n, None, dtype=object)
+    if n < 50:
+        return signals
+    df = df if 'ema20' in df.columns else apply_indicators(df, p)
+
+    close = df['close'].to_numpy(dtype=np.float64)
+    ema20 = df['ema20'].to_numpy(dtype=np.float64)
+    ema50 = df['ema50'].to_numpy(dtype=np.float64)
+
+    # detect_trend
+    trend = np.full(n, None, dtype=object)
+    trend[ema20 > ema50] = 'bullish'
+    trend[ema20 < ema50] = 'bearish'
+
+    # detect_bios : extrêmes des 9 bougies précédentes
+    past_high = df['high'].rolling(9).max().shift(1).to_numpy()
+    past_low = df['low'].rolling(9).min().shift(1).to_numpy()
+    bios_up = close > past_high * 1.0005
+    bios_down = ~bios_up & (close < past_low * 0.9995)
+
+    # detect_ote_zone : extrême des bougies [i-13, i-2] d'un préfixe
+    swing_low = df['low'].rolling(12).min().shift(2).to_numpy()
+    swing_high = df['high'].rolling(12).max().shift(2).to_numpy()
+    fib_entry_min, fib_entry_max = p.fib_entry_keys
+
+    # detect_momentum_signal + calculate_adaptive_thresholds
+    macd = df['macd'].to_numpy(dtype=np.float64)
+    macd_signal = df['macd_signal'].to_numpy(dtype=np.float64)
+    rsi = df['rsi'].to_numpy(dtype=np.float64)
+    stoch_k = df['stoch_k'].to_numpy(dtype=np.float64)
+    stoch_d = df['stoch_d'].to_numpy(dtype=np.float64)
+    atr_pct = calculate_atr(df).to_numpy() / close
+    offset = np.where(atr_pct > 0.02, 5.0, np.where(atr_pct > 0.01, 0.0, -5.0))
+    rsi_ob = p.rsi_overbought_base + offset
+    rsi_os = p.rsi_oversold_base - offset
+    stoch_ob = p.stoch_overbought_base + offset
+    stoch_os = p.stoch_oversold_base - offset
+    score_bull = ((macd > macd_signal).astype(int) + ((rsi > 50) & (rsi < rsi_ob))
+                  + ((stoch_k > stoch_d) & (stoch_k < stoch_ob)))
+    score_bear = ((macd < macd_signal).astype(int) + ((rsi < 50) & (rsi > rsi_os))
+                  + ((stoch_k < stoch_d) & (stoch_k > stoch_os)))
+
+    bios_level = bios_direction = zone = None
+    ote_active = False
+    for i in range(49, n):
+        t = trend[i]
+        if t is None:
+            bios_level = bios_direction = zone = None
+            ote_active = False
+            continue
+
+        # Étape 1 : nouveau BIOS dans le sens de la tendance
+        if not ote_active and ((t == 'bullish' and bios_up[i]) or (t == 'bearish' and bios_down[i])):
+            if t == 'bullish':
+                level, swing = past_high[i], swing_low[i]
+                fibs = None if pd.isna(swing) else calculate_fibonacci_retracement(swing, level, p)
+            else:
+                level, swing = past_low[i], swing_high[i]
+                fibs = None if pd.isna(swing) else calculate_fibonacci_retracement(level, swing, p)
+            if fibs:
+                bios_level, bios_direction = level, t
+                zone = (fibs[fib_entry_min], fibs[fib_entry_max])
+                ote_active = False
+
+        # Étape 2 : setup en cours
+        if not bios_level or not zone:
+            continue
+        if t != bios_direction:
+            bios_level = bios_direction = zone = None
+            ote_active = False
+            continue
+
+        # Étape 3 : pullback dans la zone OTE
+        if not ote_active:
+            if zone[0] <= close[i] <= zone[1]:
+                ote_active = True
+            else:
+                continue
+
+        # Étape 4 : confirmation momentum
+        score = score_bull[i] if t == 'bullish' else score_bear[i]
+        if score < 2:
+            continue
+        signals[i] = 'long' if t == 'bullish' else 'short'
+        bios_level = bios_direction = zone = None
+        ote_active = False
+
+    return signals
+
+
+def sweep_signals(df, param_sets):
+    """
+    replay_signals pour chaque jeu de paramètres (balayage du tuner) :
+    les indicateurs sont calculés une fois par clé EMA / RSI distincte et
+    partagés entre les jeux qui ne diffèrent que par Fibonacci / seuils.
+    Retourne une liste de tableaux de signaux, dans l'ordre de param_sets.
+    """
+    frames = {}
+    results = []
+    for p in param_sets:
+        key = p.indicator_key()
+        if key not in frames:
+            frames[key] = apply_indicators(df, p)
+        results.append(replay_signals(frames[key], p))
+    return results
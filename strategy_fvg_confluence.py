@@ -1,5 +1,7 @@
 # strategy_fvg_confluence.py
 
+from collections import deque
+
 import pandas as pd
 import numpy as np
 
@@ -46,22 +48,110 @@ def detect_recent_fvg(df, lookback=15):
     if len(df) < lookback + 3:
         return None
 
-    # Parcourir du plus récent au plus ancien
-    for i in range(len(df) - 1, len(df) - lookback - 1, -1):
-        if i < 2:
-            break
-        c1 = df.iloc[i - 2]
-        c3 = df.iloc[i]
+    direction, fvg_low, fvg_high = find_fvgs(df.iloc[-(lookback + 2):])
+    hits = np.flatnonzero(direction)
+    if len(hits) == 0:
+        return None
+    j = hits[-1]
+    return ("long" if direction[j] > 0 else "short", fvg_low[j], fvg_high[j])
 
-        # Bullish FVG
-        if c3['low'] > c1['high']:
-            return ("long", c1['high'], c3['low'])
 
-        # Bearish FVG
-        if c3['high'] < c1['low']:
-            return ("short", c3['high'], c1['low'])
+def find_fvgs(df):
+    """
+    Tous les FVG de l'historique en une passe (bougie i-2 comparée à la bougie i).
+    Retourne (direction, fvg_low, fvg_high) par bougie : direction +1 long /
+    -1 short / 0 sans gap, bornes NaN sans gap.
+    """
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    n = len(high)
+    direction = np.zeros(n, dtype=np.int8)
+    fvg_low = np.full(n, np.nan)
+    fvg_high = np.full(n, np.nan)
+    if n < 3:
+        return direction, fvg_low, fvg_high
+
+    h1, l1, h3, l3 = high[:-2], low[:-2], high[2:], low[2:]
+    bull = l3 > h1
+    bear = h3 < l1
+    direction[2:] = np.where(bull, 1, np.where(bear, -1, 0))
+    fvg_low[2:] = np.where(bull, h1, np.where(bear, h3, np.nan))
+    fvg_high[2:] = np.where(bull, l3, np.where(bear, l1, np.nan))
+    return direction, fvg_low, fvg_high
+
+
+def recent_fvgs(df, lookback=15):
+    """
+    detect_recent_fvg évalué sur chaque bougie en une passe : le FVG le plus
+    récent des `lookback` dernières bougies (dernier gap propagé par
+    maximum.accumulate). Même format que find_fvgs.
+    """
+    direction, fvg_low, fvg_high = find_fvgs(df)
+    n = len(direction)
+    bars = np.arange(n)
+    last = np.maximum.accumulate(np.where(direction != 0, bars, -1)) if n else bars
+    valid = (last >= 0) & (bars - last < lookback) & (bars >= lookback + 2)
+    src = np.where(valid, last, 0)
+    return (np.where(valid, direction[src], 0).astype(np.int8),
+            np.where(valid, fvg_low[src], np.nan),
+            np.where(valid, fvg_high[src], np.nan))
+
+
+class FVGTracker:
+    """
+    FVG non comblés, mis à jour bougie par bougie (flux live ou rejeu).
+    Un gap haussier est comblé quand le prix redescend à son bas, un gap
+    baissier quand le prix remonte à son haut. Seuls les `max_open` gaps
+    les plus récents sont suivis.
+    """
 
-    return None
+    def __init__(self, max_open=20):
+        self.max_open = max_open
+        self.open = []               # [(direction, fvg_low, fvg_high, index)]
+        self._prev = deque(maxlen=2)  # (high, low) des 2 bougies précédentes
+        self.index = -1
+
+    def update(self, high, low):
+        """Ajoute une bougie clôturée, retourne le FVG non comblé le plus récent"""
+        self.index += 1
+        if self.open:
+            self.open = [g for g in self.open
+                         if (low > g[1] if g[0] > 0 else high < g[2])]
+        if len(self._prev) == 2:
+            h1, l1 = self._prev[0]
+            if low > h1:
+                self.open.append((1, h1, low, self.index))
+            elif high < l1:
+                self.open.append((-1, high, l1, self.index))
+            if len(self.open) > self.max_open:
+                del self.open[0]
+        self._prev.append((high, low))
+        return self.latest
+
+    @property
+    def latest(self):
+        return self.open[-1] if self.open else None
+
+
+def unfilled_fvgs(df, max_open=20):
+    """
+    FVG non comblé le plus récent à chaque bougie (FVGTracker sur tout l'historique).
+    Retourne (direction, fvg_low, fvg_high, age en bougies), âge -1 sans gap.
+    """
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    n = len(high)
+    direction = np.zeros(n, dtype=np.int8)
+    fvg_low = np.full(n, np.nan)
+    fvg_high = np.full(n, np.nan)
+    age = np.full(n, -1, dtype=np.int64)
+    tracker = FVGTracker(max_open)
+    for i, (h, l) in enumerate(zip(high.tolist(), low.tolist())):
+        gap = tracker.update(h, l)
+        if gap:
+            direction[i], fvg_low[i], fvg_high[i] = gap[0], gap[1], gap[2]
+            age[i] = i - gap[3]
+    return direction, fvg_low, fvg_high, age
 
 
 # =========================
@@ -86,3 +176,37 @@ def fib_zone(df, lookback=30):
     fib_618 = swing_high - 0.618 * diff
 
     return min(fib_50, fib_618), max(fib_50, fib_618)
+
+
+def fib_zones(df, lookback=30):
+    """
+    fib_zone évalué sur chaque bougie : extrêmes glissants en O(n) (rolling
+    max/min de pandas, file monotone). Retourne (fib_low, fib_high), NaN
+    pendant le warmup ou si le range est nul.
+    """
+    swing_high = df['high'].rolling(lookback).max().to_numpy()
+    swing_low = df['low'].rolling(lookback).min().to_numpy()
+
+    diff = swing_high - swing_low
+    diff = np.where(diff == 0, np.nan, diff)
+    fib_50 = swing_high - 0.5 * diff
+    fib_618 = swing_high - 0.618 * diff
+
+    return np.minimum(fib_50, fib_618), np.maximum(fib_50, fib_618)
+
+
+# =========================
+# CONFLUENCE
+# =========================
+def fvg_fib_confluence(df, fvg_lookback=15, fib_lookback=30, max_open=20):
+    """
+    Confluence FVG + Fibonacci sur chaque bougie : le FVG non comblé le plus
+    récent (formé dans les `fvg_lookback` dernières bougies) recoupe la zone
+    50%-61.8%. Retourne la direction par bougie (+1 long / -1 short / 0).
+    Une passe par symbole : utilisable sur tout l'univers du scanner.
+    """
+    direction, fvg_low, fvg_high, age = unfilled_fvgs(df, max_open)
+    fib_low, fib_high = fib_zones(df, fib_lookback)
+    overlap = (fvg_low <= fib_high) & (fvg_high >= fib_low)
+    recent = (age >= 0) & (age < fvg_lookback)
+    return np.where(overlap & recent, direction, 0).astype(np.int8)
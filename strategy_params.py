@@ -0,0 +1,229 @@
+"""
+Paramètres typés et immuables des stratégies, rechargeables à chaud
+
+Chaque stratégie a une dataclass figée (AIEnhancedParams, ScalpingParams)
+résolue une fois — défauts du code, puis variables d'environnement, puis
+section du fichier STRATEGY_PARAMS_FILE — et passée explicitement aux
+fonctions chaudes, au lieu d'un os.getenv + float() à chaque évaluation.
+
+ParamStore garde le jeu courant d'une stratégie :
+  - get()    : jeu courant ; au plus toutes les RELOAD_CHECK_SECONDS,
+               recharge le fichier si sa date de modification a changé
+  - reload() : rechargement explicite (route API du bot)
+Le nouveau jeu est construit et validé à part puis substitué en une seule
+affectation : une évaluation en cours garde le jeu qu'elle a lu, un fichier
+invalide laisse le jeu courant en place.
+
+sweep() produit des listes de jeux (produit cartésien) pour les balayages
+du tuner (Fibonacci, RSI, EMA...).
+
+Fichier (JSON, une section par stratégie) :
+    {"ai_enhanced": {"fib_entry_min": 0.5, "rsi_overbought_base": 75},
+     "scalping_5m": {"ema_fast_len": 9}}
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields, replace
+
+PARAMS_FILE = os.getenv("STRATEGY_PARAMS_FILE", "strategy_params.json")
+RELOAD_CHECK_SECONDS = float(os.getenv("STRATEGY_PARAMS_CHECK_SECONDS", "5"))
+
+# Niveaux nommés de calculate_fibonacci_retracement (clés du dict retourné)
+FIB_LEVELS = ("0.382", "0.5", "0.618", "0.786")
+
+
+def _convert(field_type, value):
+    """Conversion au type du champ ; un entier n'accepte pas de partie décimale"""
+    if field_type is int:
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"entier attendu, reçu {value!r}")
+        return int(number)
+    return field_type(value)
+
+
+class _StrategyParams:
+    """Méthodes communes aux dataclasses de paramètres"""
+
+    ENV = {}              # champ -> variable d'environnement
+    INDICATOR_FIELDS = ()  # champs qui changent les colonnes d'apply_indicators
+
+    @classmethod
+    def _coerce(cls, values):
+        types = {f.name: f.type for f in fields(cls)}
+        unknown = set(values) - set(types)
+        if unknown:
+            raise ValueError(f"Paramètres inconnus pour {cls.__name__}: {sorted(unknown)}")
+        return {name: _convert(types[name], value) for name, value in values.items()}
+
+    @classmethod
+    def from_env(cls, overrides=None):
+        """Défauts, surchargés par l'environnement puis par `overrides`"""
+        values = {name: os.environ[env] for name, env in cls.ENV.items() if env in os.environ}
+        values.update(overrides or {})
+        return cls(**cls._coerce(values))
+
+    def with_overrides(self, **overrides):
+        """Copie validée avec quelques champs modifiés"""
+        return replace(self, **self._coerce(overrides))
+
+    def as_dict(self):
+        return asdict(self)
+
+    def indicator_key(self):
+        """Jeux de même clé = mêmes indicateurs (calculés une fois dans un balayage)"""
+        return tuple(getattr(self, name) for name in self.INDICATOR_FIELDS)
+
+
+@dataclass(frozen=True)
+class AIEnhancedParams(_StrategyParams):
+    """strategy_ai_enhanced : tendance EMA, BIOS/OTE Fibonacci, seuils momentum, SL/TP"""
+    ema_fast: int = 20
+    ema_slow: int = 50
+    rsi_period: int = 14
+    fib_382: float = 0.382
+    fib_500: float = 0.5
+    fib_618: float = 0.618
+    fib_786: float = 0.786
+    fib_entry_min: float = 0.618
+    fib_entry_max: float = 0.786
+    rsi_overbought_base: float = 70.0
+    rsi_oversold_base: float = 30.0
+    stoch_overbought_base: float = 80.0
+    stoch_oversold_base: float = 20.0
+    sl_atr_multiplier: float = 1.5
+    tp_atr_multiplier: float = 3.0
+
+    ENV = {
+        'fib_382': 'FIB_382',
+        'fib_500': 'FIB_500',
+        'fib_618': 'FIB_618',
+        'fib_786': 'FIB_786',
+        'fib_entry_min': 'FIB_ENTRY_MIN',
+        'fib_entry_max': 'FIB_ENTRY_MAX',
+        'rsi_overbought_base': 'RSI_OVERBOUGHT_BASE',
+        'rsi_oversold_base': 'RSI_OVERSOLD_BASE',
+        'stoch_overbought_base': 'STOCH_OVERBOUGHT_BASE',
+        'stoch_oversold_base': 'STOCH_OVERSOLD_BASE',
+        'sl_atr_multiplier': 'SL_ATR_MULTIPLIER',
+        'tp_atr_multiplier': 'TP_ATR_MULTIPLIER',
+    }
+    INDICATOR_FIELDS = ('ema_fast', 'ema_slow', 'rsi_period')
+
+    def __post_init__(self):
+        # La zone OTE désigne deux niveaux nommés du retracement (erreur au
+        # chargement plutôt qu'un KeyError à la première cassure)
+        for name in ('fib_entry_min', 'fib_entry_max'):
+            if str(float(getattr(self, name))) not in FIB_LEVELS:
+                raise ValueError(f"{name} doit être l'un de {FIB_LEVELS}")
+        if not 0 < self.ema_fast < self.ema_slow:
+            raise ValueError("ema_fast doit être > 0 et < ema_slow")
+        if self.rsi_period < 1:
+            raise ValueError("rsi_period doit être >= 1")
+
+    @property
+    def fib_entry_keys(self):
+        """Clés des deux bornes de la zone OTE dans calculate_fibonacci_retracement"""
+        return str(float(self.fib_entry_min)), str(float(self.fib_entry_max))
+
+
+@dataclass(frozen=True)
+class ScalpingParams(_StrategyParams):
+    """strategy_scalping_5m (défauts du script Pine, ex-constantes du module)"""
+    ema_fast_len: int = 8
+    ema_slow_len: int = 21
+    rsi_len: int = 7
+    rsi_long_min: float = 45.0
+    rsi_long_max: float = 70.0
+    rsi_short_min: float = 30.0
+    rsi_short_max: float = 55.0
+    vol_ma_len: int = 20
+    vol_multi: float = 1.2
+    atr_len: int = 14
+    vwap_len: int = 100
+    trail_active_pct: float = 80.0
+    trail_lock_pct: float = 10.0
+
+    INDICATOR_FIELDS = ('ema_fast_len', 'ema_slow_len', 'rsi_len', 'vol_ma_len', 'atr_len', 'vwap_len')
+
+    def __post_init__(self):
+        if not 0 < self.ema_fast_len < self.ema_slow_len:
+            raise ValueError("ema_fast_len doit être > 0 et < ema_slow_len")
+        for name in ('rsi_len', 'vol_ma_len', 'atr_len', 'vwap_len'):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} doit être >= 1")
+
+    @property
+    def min_bars(self):
+        return max(self.ema_slow_len, self.atr_len, self.vwap_len) + 5
+
+
+def sweep(base, **axes):
+    """
+    Produit cartésien de jeux autour de `base`, pour les balayages du tuner :
+        sweep(AIEnhancedParams(), fib_entry_min=[0.5, 0.618], ema_fast=[13, 20])
+    Une combinaison invalide lève ValueError.
+    """
+    names = list(axes)
+    return [base.with_overrides(**dict(zip(names, combo)))
+            for combo in itertools.product(*axes.values())]
+
+
+class ParamStore:
+    """Jeu de paramètres courant d'une stratégie, rechargé à chaud depuis le fichier"""
+
+    def __init__(self, params_cls, section, path=None):
+        self.params_cls = params_cls
+        self.section = section
+        self.path = path or PARAMS_FILE
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = time.monotonic()
+        self._params = params_cls.from_env()
+        if os.path.exists(self.path):
+            self.reload()
+
+    def get(self):
+        """Jeu courant (à lire une fois par évaluation puis passer aux fonctions)"""
+        if time.monotonic() - self._checked_at >= RELOAD_CHECK_SECONDS:
+            self.reload_if_changed()
+        return self._params
+
+    def reload_if_changed(self):
+        self._checked_at = time.monotonic()
+        if self._file_mtime() != self._mtime:
+            self.reload()
+
+    def reload(self):
+        """
+        Relit environnement + fichier et substitue le jeu courant.
+        Retourne (True, jeu) ou (False, erreur) — le jeu courant est alors conservé.
+        """
+        with self._lock:
+            mtime = self._file_mtime()
+            try:
+                overrides = {}
+                if mtime is not None:
+                    with open(self.path, encoding='utf-8') as f:
+                        overrides = json.load(f).get(self.section, {})
+                params = self.params_cls.from_env(overrides)
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # Mémorise la version fautive pour ne pas réessayer à chaque get()
+                self._mtime = mtime
+                print(f"⚠️ Paramètres {self.section} non rechargés ({self.path}): {e}", flush=True)
+                return False, str(e)
+            changed = params != self._params
+            self._params = params
+            self._mtime = mtime
+        if changed:
+            print(f"🔄 Paramètres {self.section} rechargés: {params.as_dict()}", flush=True)
+        return True, params
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
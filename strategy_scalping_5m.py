@@ -14,39 +14,32 @@ Logic:
 import pandas as pd
 import numpy as np
 
+from strategy_params import ParamStore, ScalpingParams
+
 # ── Parameters (mirror Pine Script defaults) ─────────────────────────────────
-EMA_FAST_LEN  = 8
-EMA_SLOW_LEN  = 21
-RSI_LEN       = 7
-RSI_LONG_MIN  = 45
-RSI_LONG_MAX  = 70
-RSI_SHORT_MIN = 30
-RSI_SHORT_MAX = 55
-VOL_MA_LEN    = 20
-VOL_MULTI     = 1.2
-ATR_LEN       = 14
-VWAP_LEN      = 100   # rolling-window VWAP approximation
-
-# Trailing stop parameters (from Pine Script)
-TRAIL_ACTIVE_PCT = 80.0   # activate when price moves 80% toward TP
-TRAIL_LOCK_PCT   = 10.0   # trail is placed at 10% of TP range above entry
+# Typed, immutable set (strategy_params.ScalpingParams): EMA 8/21, RSI(7) 45-70 /
+# 30-55, volume > 1.2x SMA(20), ATR 14, rolling VWAP 100, trail 80% / lock 10%.
+# Hot-reloaded from the "scalping_5m" section of STRATEGY_PARAMS_FILE; every
+# function takes params=None -> current set.
+PARAMS = ParamStore(ScalpingParams, "scalping_5m")
 
 
 # ── Indicator computation ────────────────────────────────────────────────────
 
-def apply_indicators(df: pd.DataFrame) -> pd.DataFrame:
+def apply_indicators(df: pd.DataFrame, params: ScalpingParams = None) -> pd.DataFrame:
+    p = params or PARAMS.get()
     df = df.copy()
 
     # Fast / Slow EMA
-    df["ema_fast"] = df["close"].ewm(span=EMA_FAST_LEN, adjust=False).mean()
-    df["ema_slow"] = df["close"].ewm(span=EMA_SLOW_LEN, adjust=False).mean()
+    df["ema_fast"] = df["close"].ewm(span=p.ema_fast_len, adjust=False).mean()
+    df["ema_slow"] = df["close"].ewm(span=p.ema_slow_len, adjust=False).mean()
 
     # RSI (Wilder smoothing via ewm com)
     delta     = df["close"].diff()
     gain      = delta.clip(lower=0)
     loss      = (-delta).clip(lower=0)
-    avg_gain  = gain.ewm(com=RSI_LEN - 1, adjust=False).mean()
-    avg_loss  = loss.ewm(com=RSI_LEN - 1, adjust=False).mean()
+    avg_gain  = gain.ewm(com=p.rsi_len - 1, adjust=False).mean()
+    avg_loss  = loss.ewm(com=p.rsi_len - 1, adjust=False).mean()
     rs        = avg_gain / avg_loss.replace(0, np.nan)
     df["rsi"] = 100 - (100 / (1 + rs))
 
@@ -56,33 +49,33 @@ def apply_indicators(df: pd.DataFrame) -> pd.DataFrame:
         (df["high"] - df["close"].shift()).abs(),
         (df["low"]  - df["close"].shift()).abs(),
     ], axis=1).max(axis=1)
-    df["atr"] = tr.ewm(span=ATR_LEN, adjust=False).mean()
+    df["atr"] = tr.ewm(span=p.atr_len, adjust=False).mean()
 
     # VWAP (rolling window — approximates intraday VWAP on short timeframes)
     df["hlc3"] = (df["high"] + df["low"] + df["close"]) / 3
     pv         = df["hlc3"] * df["volume"]
     df["vwap"] = (
-        pv.rolling(VWAP_LEN).sum() /
-        df["volume"].rolling(VWAP_LEN).sum()
+        pv.rolling(p.vwap_len).sum() /
+        df["volume"].rolling(p.vwap_len).sum()
     )
 
     # Volume MA
-    df["vol_ma"] = df["volume"].rolling(VOL_MA_LEN).mean()
+    df["vol_ma"] = df["volume"].rolling(p.vol_ma_len).mean()
 
     return df
 
 
 # ── Signal check ─────────────────────────────────────────────────────────────
 
-def check_signal(df: pd.DataFrame):
+def check_signal(df: pd.DataFrame, params: ScalpingParams = None):
     """
     Returns (signal, score, atr)
       signal : 'long' | 'short' | None
       score  : 3 if valid (compatible with bot threshold system)
       atr    : current ATR value
     """
-    min_bars = max(EMA_SLOW_LEN, ATR_LEN, VWAP_LEN) + 5
-    if len(df) < min_bars:
+    p = params or PARAMS.get()
+    if len(df) < p.min_bars:
         return None, 0, 0
 
     last = df.iloc[-1]
@@ -100,12 +93,12 @@ def check_signal(df: pd.DataFrame):
     below_vwap = last["close"] < last["vwap"]
 
     rsi      = last["rsi"]
-    rsi_bull = RSI_LONG_MIN  <= rsi <= RSI_LONG_MAX
-    rsi_bear = RSI_SHORT_MIN <= rsi <= RSI_SHORT_MAX
+    rsi_bull = p.rsi_long_min  <= rsi <= p.rsi_long_max
+    rsi_bear = p.rsi_short_min <= rsi <= p.rsi_short_max
 
     vol_ok = (
         not pd.isna(last["vol_ma"]) and
-        last["volume"] > last["vol_ma"] * VOL_MULTI
+        last["volume"] > last["vol_ma"] * p.vol_multi
     )
 
     # ── EMA8 bounce entry ─────────────────────────────────────────────────────
@@ -126,14 +119,15 @@ def check_signal(df: pd.DataFrame):
 
 # ── Trailing stop parameters (consumed by the bot) ───────────────────────────
 
-def get_trail_params(tp_dist: float):
+def get_trail_params(tp_dist: float, params: ScalpingParams = None):
     """
     Returns (activation_dist, trailing_distance) for Bybit's set_trailing_stop.
 
     activation_dist  : price must move this much from entry before trail activates
     trailing_distance: fixed offset the trailing stop trails behind the extreme price
     """
-    activation_dist   = tp_dist * (TRAIL_ACTIVE_PCT / 100.0)   # 80% of TP
-    lock_dist         = tp_dist * (TRAIL_LOCK_PCT   / 100.0)   # 10% of TP
+    p = params or PARAMS.get()
+    activation_dist   = tp_dist * (p.trail_active_pct / 100.0)   # 80% of TP
+    lock_dist         = tp_dist * (p.trail_lock_pct   / 100.0)   # 10% of TP
     trailing_distance = activation_dist - lock_dist             # 70% of TP
     return activation_dist, trailing_distance
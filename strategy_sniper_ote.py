@@ -9,9 +9,16 @@ Règles :
   4. Entrée proche du niveau 0.618 (Golden Zone)
   5. SL : derrière la structure réelle (mèches incluses)
   6. TP : RR fixe de 2.0
+
+En live (check_signal avec `symbol`), tendance H4 et swing M1 sont lus sur
+la structure incrémentale du symbole (market_structure) au lieu d'être
+recalculés sur chaque cadre ; detect_dow_trend / find_last_swing restent
+la version sans état (backtests, benchmark).
 """
 import numpy as np
 
+from market_structure import StructureRegistry
+
 # ─── Paramètres ────────────────────────────────────────────────────────────────
 OTE_ENTRY = 0.618    # Niveau idéal d'entrée (bonus score)
 OTE_LIMIT = 0.786    # Borne extérieure de la zone OTE
@@ -25,6 +32,9 @@ MIN_SL_PCT = 0.001   # SL minimum : 0.1% du prix (éviter le bruit)
 MAX_SL_PCT = 0.03    # SL maximum : 3% du prix (éviter les SL absurdes)
 MIN_SWING_PCT = 0.005  # Swing minimum : 0.5% (sinon trop petit pour tracer fib)
 
+# Structure de marché par (symbole, timeframe), mise à jour à chaque cadre
+STRUCTURES = StructureRegistry(pivot_lookback=H4_LOOKBACK, leg_lookback=M1_LOOKBACK)
+
 
 # ─── Théorie de Dow (H4) ───────────────────────────────────────────────────────
 def detect_dow_trend(df, lookback=H4_LOOKBACK):
@@ -136,9 +146,11 @@ def get_structural_sl(df, trend, lookback=M1_SL_LOOKBACK):
 
 
 # ─── Signal Principal ─────────────────────────────────────────────────────────
-def check_signal(df_m1, df_h4):
+def check_signal(df_m1, df_h4, symbol=None):
     """
     Signal Sniper OTE.
+    symbol : active la structure incrémentale du symbole (appels successifs
+    sur des cadres glissants) ; sans symbole, calcul complet sur les cadres.
 
     Score :
       1 pt  → Tendance H4 confirmée (Dow Theory)
@@ -152,7 +164,10 @@ def check_signal(df_m1, df_h4):
         return None, 0, 0
 
     # ── 1. Tendance H4 ────────────────────────────────────────────────────
-    h4_trend = detect_dow_trend(df_h4)
+    if symbol is not None:
+        h4_trend = STRUCTURES.sync(symbol, '4h', df_h4).trend()
+    else:
+        h4_trend = detect_dow_trend(df_h4)
     if not h4_trend:
         return None, 0, 0
 
@@ -160,7 +175,10 @@ def check_signal(df_m1, df_h4):
     score = 1  # H4 confirmé
 
     # ── 2. Swing + Zone OTE ───────────────────────────────────────────────
-    swing_from, swing_to = find_last_swing(df_m1, h4_trend)
+    if symbol is not None:
+        swing_from, swing_to = STRUCTURES.sync(symbol, '1m', df_m1).last_swing(h4_trend)
+    else:
+        swing_from, swing_to = find_last_swing(df_m1, h4_trend)
     if swing_from is None:
         return None, 0, 0
 
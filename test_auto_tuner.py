@@ -0,0 +1,71 @@
+"""
+Tests de la grille vectorisée de l'auto-tuner (auto_tuner.py)
+
+_grid_from_signals (cube signaux x SL x TP, seuils en masque) doit donner
+les mêmes trades nets que _simulate_exit appelé param set par param set,
+longs et shorts, y compris pour les signaux à moins de MAX_LOOKAHEAD
+bougies de la fin des données.
+
+Usage:
+    python3 test_auto_tuner.py
+"""
+import itertools
+
+import numpy as np
+
+import market_data
+from auto_tuner import MAX_LOOKAHEAD, AutoTuner
+
+GRID = [{'sl_multi': sl, 'tp_multi': tp, 'threshold': th}
+        for sl, tp, th in itertools.product((1.0, 1.2, 1.5), (1.5, 2.4, 3.0), (2, 3, 4))]
+
+
+def per_param(tuner, df_ind, side, score, params):
+    """Référence : un _simulate_exit par signal, comme avant la vectorisation"""
+    trades = []
+    for i in np.flatnonzero((side != 0) & (score >= params['threshold'])):
+        result = tuner._simulate_exit(df_ind, i, 'long' if side[i] > 0 else 'short', params)
+        if result and result[0] != 0:
+            trades.append((i, int(side[i])) + result)
+    return tuner._net_outcomes(df_ind, trades)
+
+
+def assert_same_outcomes(tuner, df_ind, side, score):
+    for params, fast in zip(GRID, tuner._grid_from_signals(df_ind, side, score, GRID)):
+        slow = per_param(tuner, df_ind, side, score, params)
+        assert fast.shape == slow.shape, params
+        assert np.allclose(fast, slow, rtol=1e-12), params
+
+
+def test_grid_matches_simulate_exit_on_strategy_signals():
+    tuner = AutoTuner(None, None)
+    df = market_data.synthetic_dataframe(1200, seed=21, timeframe="5m")
+    for strat_name in tuner.strategies:
+        df_ind, side, score = tuner._signal_columns(df, strat_name)
+        assert_same_outcomes(tuner, df_ind, side, score)
+
+
+def test_grid_matches_simulate_exit_on_random_signals():
+    rng = np.random.default_rng(5)
+    df = market_data.synthetic_dataframe(600, seed=22, timeframe="5m")
+    for cost_model in ("default", None):
+        tuner = AutoTuner(None, None)
+        if cost_model is None:
+            tuner.cost_model = None   # résultats bruts, en multiples d'ATR exacts
+        df_ind, _, _ = tuner._signal_columns(df, 'v6_aggressive')
+        first = int(np.flatnonzero(df_ind['atr'].notna().to_numpy())[0])
+        side = np.zeros(len(df_ind), dtype=np.int8)
+        picks = rng.choice(np.arange(first, len(df_ind) - 1), size=150, replace=False)
+        side[picks] = rng.choice([-1, 1], size=len(picks))
+        # Signaux sur les dernières bougies : fenêtre tronquée par la fin des données
+        side[-MAX_LOOKAHEAD:-1] = rng.choice([-1, 1], size=MAX_LOOKAHEAD - 1)
+        score = rng.integers(1, 6, size=len(df_ind)).astype(np.float64)
+        assert (side < 0).any() and (side > 0).any()
+        assert_same_outcomes(tuner, df_ind, side, score)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,119 @@
+"""
+Tests de la résolution des sorties (exit_resolution.py)
+
+resolve_exit (par blocs numpy) doit donner la même sortie qu'une boucle
+bougie par bougie ; IntrabarIndex résout sur les bougies 1m et se replie
+sur le timeframe supérieur quand l'archive 1m a un trou.
+
+Usage:
+    python3 test_exit_resolution.py
+"""
+import numpy as np
+import pandas as pd
+
+import market_data
+from exit_resolution import IntrabarIndex, resolve_exit
+
+
+def naive_exit(open_, high, low, close, start, end, side, sl, tp, trail=None):
+    """Référence : une bougie à la fois, SL avant TP, TP avant activation"""
+    sgn = 1.0 if side > 0 else -1.0
+    sl_s, tp_s = sgn * sl, sgn * tp
+    activated, extreme = False, None
+    for t in range(start, end):
+        if side > 0:
+            hi, lo, op = high[t], low[t], open_[t]
+        else:
+            hi, lo, op = -low[t], -high[t], -open_[t]
+        if not activated:
+            if lo <= sl_s:
+                return t, sgn * min(sl_s, op), "SL"
+            if hi >= tp_s:
+                return t, tp, "TP"
+            if trail and hi >= sgn * trail[0]:
+                activated, extreme = True, hi
+            continue
+        stop = max(sl_s, extreme - trail[1])
+        if lo <= stop:
+            return t, sgn * min(stop, op), "TRAIL" if stop > sl_s else "SL"
+        if hi >= tp_s:
+            return t, tp, "TP"
+        extreme = max(extreme, hi)
+    return end - 1, close[end - 1], "END"
+
+
+def columns(df):
+    return tuple(df[c].to_numpy() for c in ("open", "high", "low", "close"))
+
+
+def random_trades(prices, n, seed):
+    """(start, end, side, sl, tp, trail) variés : avec ou sans trailing, longs et shorts"""
+    rng = np.random.default_rng(seed)
+    close = prices[3]
+    for _ in range(n):
+        start = int(rng.integers(0, len(close) - 400))
+        end = start + int(rng.integers(1, 400))
+        side = 1 if rng.random() < 0.5 else -1
+        entry = close[start - 1] if start else close[0]
+        risk = entry * rng.uniform(0.002, 0.02)
+        sl, tp = entry - side * risk, entry + side * risk * rng.uniform(0.5, 4)
+        trail = None
+        if rng.random() < 0.6:
+            trail = (entry + side * risk * rng.uniform(0.2, 2), risk * rng.uniform(0.1, 1))
+        yield start, end, side, sl, tp, trail
+
+
+def test_resolve_exit_matches_naive_loop():
+    prices = columns(market_data.synthetic_dataframe(20_000, seed=4))
+    reasons = set()
+    for trade in random_trades(prices, 3000, seed=1):
+        expected = naive_exit(*prices, *trade)
+        got = resolve_exit(*prices, *trade)
+        assert got[0] == expected[0] and got[2] == expected[2], (trade, got, expected)
+        assert np.isclose(got[1], expected[1], rtol=1e-12), (trade, got, expected)
+        reasons.add(got[2])
+    assert reasons == {"SL", "TP", "TRAIL", "END"}
+
+
+def m1_and_5m(n_m1, seed):
+    """Bougies 1m alignées sur les bougies 5m, et leur agrégation 5m"""
+    m1 = market_data.generate(n_m1, seed=seed, timeframe="1m")
+    m1["timestamp"] = m1["timestamp"] - m1["timestamp"][0] % 300_000
+    df = pd.DataFrame(m1)
+    df["bucket"] = df["timestamp"] // 300_000
+    htf = df.groupby("bucket").agg(timestamp=("timestamp", "first"), open=("open", "first"),
+                                   high=("high", "max"), low=("low", "min"), close=("close", "last"))
+    return m1, htf.reset_index(drop=True)
+
+
+def test_intrabar_index_resolves_on_1m():
+    m1, htf = m1_and_5m(5000, seed=6)
+    index = IntrabarIndex(m1, htf["timestamp"], "5m")
+    m1_prices = tuple(m1[c] for c in ("open", "high", "low", "close"))
+    for start, end, side, sl, tp, trail in random_trades(columns(htf), 300, seed=2):
+        end = min(end, len(htf))
+        idx, price, reason, ts = index.resolve(start, end, side, sl, tp, trail)
+        m_idx, m_price, m_reason = naive_exit(*m1_prices, start * 5, end * 5, side, sl, tp, trail)
+        assert (idx, reason, ts) == (m_idx // 5, m_reason, int(m1["timestamp"][m_idx]))
+        assert np.isclose(price, m_price, rtol=1e-12)
+    assert index.fallbacks == 0
+
+
+def test_intrabar_index_falls_back_on_gaps():
+    m1, htf = m1_and_5m(1000, seed=8)
+    keep = np.ones(1000, dtype=bool)
+    keep[502] = False   # une bougie 1m manquante dans la bougie 5m n°100
+    index = IntrabarIndex({c: v[keep] for c, v in m1.items()}, htf["timestamp"], "5m")
+    assert index.covers(0, 100) and not index.covers(90, 110)
+    prices = columns(htf)
+    close = prices[3][90]
+    idx, price, reason, _ = index.resolve(90, 110, 1, close * 0.9, close * 1.1, htf=prices)
+    assert index.fallbacks == 1
+    assert (idx, price, reason) == resolve_exit(*prices, 90, 110, 1, close * 0.9, close * 1.1)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,111 @@
+"""
+Tests des versions par bougie de strategy_fvg_confluence.py
+
+recent_fvgs, fib_zones et unfilled_fvgs / FVGTracker (une passe sur tout
+l'historique) doivent donner, à chaque bougie, ce que donnent
+detect_recent_fvg et fib_zone sur le préfixe df.iloc[:i+1], et une
+recherche exhaustive des gaps non comblés.
+
+Usage:
+    python3 test_fvg_confluence.py
+"""
+import numpy as np
+
+import market_data
+from strategy_fvg_confluence import (
+    detect_recent_fvg, fib_zone, fib_zones, find_fvgs, fvg_fib_confluence, recent_fvgs, unfilled_fvgs,
+)
+
+SEEDS = (1, 2, 3)
+
+
+def series(seed, n=600):
+    return market_data.synthetic_dataframe(n, seed=seed, timeframe="5m")
+
+
+def brute_unfilled(df, i):
+    """FVG non comblé le plus récent à la bougie i : (direction, low, high, index) ou None"""
+    high, low = df['high'].to_numpy(), df['low'].to_numpy()
+    for j in range(i, 1, -1):
+        if low[j] > high[j - 2]:
+            gap = (1, high[j - 2], low[j], j)
+            if all(low[k] > gap[1] for k in range(j + 1, i + 1)):
+                return gap
+        elif high[j] < low[j - 2]:
+            gap = (-1, high[j], low[j - 2], j)
+            if all(high[k] < gap[2] for k in range(j + 1, i + 1)):
+                return gap
+    return None
+
+
+def test_recent_fvgs_matches_detect_recent_fvg():
+    found = 0
+    for seed in SEEDS:
+        df = series(seed)
+        direction, fvg_low, fvg_high = recent_fvgs(df)
+        for i in range(len(df)):
+            expected = detect_recent_fvg(df.iloc[:i + 1])
+            if expected is None:
+                assert direction[i] == 0, (seed, i)
+            else:
+                found += 1
+                assert ({1: "long", -1: "short"}[direction[i]], fvg_low[i], fvg_high[i]) == expected, (seed, i)
+    assert found > 0
+
+
+def test_fib_zones_matches_fib_zone():
+    for seed in SEEDS:
+        df = series(seed)
+        fib_low, fib_high = fib_zones(df)
+        for i in range(len(df)):
+            lo, hi = fib_zone(df.iloc[:i + 1])
+            if lo is None:
+                assert np.isnan(fib_low[i]) and np.isnan(fib_high[i]), (seed, i)
+            else:
+                assert np.isclose(fib_low[i], lo, rtol=1e-12) and np.isclose(fib_high[i], hi, rtol=1e-12), (seed, i)
+
+
+def test_unfilled_fvgs_matches_brute_force():
+    for seed in SEEDS:
+        df = series(seed, n=300)
+        # max_open illimité : la recherche exhaustive ne plafonne pas les gaps suivis
+        direction, fvg_low, fvg_high, age = unfilled_fvgs(df, max_open=len(df))
+        ages = set()
+        for i in range(len(df)):
+            gap = brute_unfilled(df, i)
+            if gap is None:
+                assert direction[i] == 0 and age[i] == -1, (seed, i)
+            else:
+                assert (direction[i], fvg_low[i], fvg_high[i], age[i]) == (gap[0], gap[1], gap[2], i - gap[3]), (seed, i)
+                ages.add(int(age[i]))
+        assert len(ages) > 5   # des gaps restent ouverts plusieurs bougies
+
+
+def test_confluence_matches_per_bar_composition():
+    fired = 0
+    for seed in SEEDS:
+        df = series(seed, n=300)
+        got = fvg_fib_confluence(df, fvg_lookback=15, fib_lookback=30, max_open=len(df))
+        for i in range(len(df)):
+            gap = brute_unfilled(df, i)
+            lo, hi = fib_zone(df.iloc[:i + 1], 30)
+            expected = 0
+            if gap is not None and lo is not None and i - gap[3] < 15 and gap[1] <= hi and gap[2] >= lo:
+                expected = gap[0]
+            assert got[i] == expected, (seed, i)
+            fired += expected != 0
+    assert fired > 0
+
+
+def test_find_fvgs_directions():
+    df = series(4)
+    direction, fvg_low, fvg_high = find_fvgs(df)
+    assert (direction > 0).any() and (direction < 0).any()
+    assert (fvg_low[direction != 0] < fvg_high[direction != 0]).all()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,80 @@
+"""
+Tests de la structure de marché incrémentale (market_structure.py)
+
+Sur des cadres glissants comme ceux des bots (nouvelle bougie, ou même
+cadre avec la bougie en formation révisée), la structure incrémentale doit
+donner exactement les résultats du calcul complet : detect_dow_trend,
+find_last_swing et check_signal de strategy_sniper_ote.
+
+Usage:
+    python3 test_market_structure.py
+"""
+import numpy as np
+
+import market_data
+import strategy_sniper_ote as sniper
+from market_structure import MarketStructure
+
+M1_FRAME = 100
+H4_FRAME = 50
+
+
+def sliding_frames(df, frame, steps, seed):
+    """Cadres successifs : la fenêtre avance d'une bougie, ou reste en place
+    avec une bougie en formation révisée (close / high / low modifiés)"""
+    rng = np.random.default_rng(seed)
+    end = frame
+    for _ in range(steps):
+        if rng.random() < 0.3:
+            window = df.iloc[end - frame:end].copy()
+            last = window.index[-1]
+            bump = 1 + rng.normal(0, 0.002)
+            window.loc[last, "close"] *= bump
+            window.loc[last, "high"] = max(window.loc[last, "high"], window.loc[last, "close"])
+            window.loc[last, "low"] = min(window.loc[last, "low"], window.loc[last, "close"])
+        else:
+            end = min(end + 1, len(df))
+            window = df.iloc[end - frame:end]
+        yield window.reset_index(drop=True)
+
+
+def test_trend_matches_detect_dow_trend():
+    h4 = market_data.synthetic_dataframe(1500, seed=11, timeframe="4h")
+    ms = MarketStructure(pivot_lookback=sniper.H4_LOOKBACK, leg_lookback=sniper.M1_LOOKBACK)
+    trends = set()
+    for frame in sliding_frames(h4, H4_FRAME, 1200, seed=1):
+        expected = sniper.detect_dow_trend(frame)
+        assert ms.sync(frame).trend() == expected
+        trends.add(expected)
+    assert trends == {"long", "short", None}
+
+
+def test_last_swing_matches_find_last_swing():
+    m1 = market_data.synthetic_dataframe(2500, seed=5, timeframe="1m")
+    ms = MarketStructure(pivot_lookback=sniper.H4_LOOKBACK, leg_lookback=sniper.M1_LOOKBACK)
+    for i, frame in enumerate(sliding_frames(m1, M1_FRAME, 2000, seed=2)):
+        ms.sync(frame)
+        for trend in ("long", "short"):
+            assert ms.last_swing(trend) == sniper.find_last_swing(frame, trend), (i, trend)
+
+
+def test_incremental_check_signal_matches_stateless():
+    m1 = market_data.synthetic_dataframe(3000, seed=9, timeframe="1m")
+    h4 = market_data.synthetic_dataframe(400, seed=10, timeframe="4h")
+    h4_end = H4_FRAME
+    fired = 0
+    for i, df_m1 in enumerate(sliding_frames(m1, M1_FRAME, 2500, seed=3)):
+        if i % 25 == 0:
+            h4_end += 1   # une bougie H4 de plus de temps en temps
+        df_h4 = h4.iloc[h4_end - H4_FRAME:h4_end].reset_index(drop=True)
+        expected = sniper.check_signal(df_m1, df_h4)
+        assert sniper.check_signal(df_m1, df_h4, symbol="SYN/USDT:USDT") == expected, i
+        fired += expected[0] is not None
+    assert fired > 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,93 @@
+"""
+Tests du carnet L2 local (order_book.py)
+
+Snapshot + deltas au format Bybit V5, requêtes de sizing (VWAP, max_qty
+mesuré depuis le meilleur prix) et rejeu d'un enregistrement JSONL.
+
+Usage:
+    python3 test_order_book.py
+"""
+import json
+import os
+import tempfile
+
+from order_book import OrderBookRegistry, record_message, replay
+
+TOPIC = "orderbook.50.BTCUSDT"
+
+
+def message(kind, bids, asks, u):
+    return {"topic": TOPIC, "type": kind, "ts": 1_700_000_000_000 + u,
+            "data": {"s": "BTCUSDT", "b": bids, "a": asks, "u": u, "seq": u}}
+
+
+MESSAGES = [
+    message("snapshot", [["99.0", "1"], ["98.0", "5"]], [["101.0", "1"], ["101.05", "2"], ["102.0", "5"]], 10),
+    message("delta", [["99.5", "2"]], [["101.0", "0"]], 11),     # nouveau bid, best ask supprimé
+    message("delta", [["99.5", "9"]], [], 11),                  # périmé (u déjà vu) : ignoré
+    message("delta", [], [["101.05", "3"]], 12),
+]
+
+
+def registry_with(messages):
+    registry = OrderBookRegistry(record_path="")
+    books = [registry.handle_message(m) for m in messages]
+    return registry, books
+
+
+def test_snapshot_and_deltas():
+    registry, books = registry_with(MESSAGES)
+    assert books[2] is None   # delta périmé
+    book = registry.get("BTCUSDT")
+    assert book.best_bid == 99.5 and book.best_ask == 101.05
+    assert book.top(2) == {"bids": [(99.5, 2.0), (99.0, 1.0)], "asks": [(101.05, 3.0), (102.0, 5.0)]}
+    assert book.update_id == 12
+
+
+def test_delta_before_snapshot_is_ignored():
+    registry, books = registry_with(MESSAGES[1:2])
+    assert books == [None]
+
+
+def test_vwap_and_limit_price():
+    registry, _ = registry_with(MESSAGES[:1])
+    book = registry.get("BTCUSDT")
+    price, filled = book.vwap("buy", 2)
+    assert filled == 2 and abs(price - (101.0 + 101.05) / 2) < 1e-9
+    assert book.limit_price("buy", 2) == 101.05
+    assert book.limit_price("sell", 100) is None
+    assert book.slippage_bps("buy", 100) == float("inf")
+
+
+def test_max_qty_from_touch():
+    registry, _ = registry_with(MESSAGES[:1])
+    book = registry.get("BTCUSDT")
+    # Spread de ~200 bps : mesuré depuis le mid, la taille serait nulle à 10 bps
+    assert book.spread_bps > 10
+    qty = book.max_qty("buy", 10)
+    price, filled = book.vwap("buy", qty)
+    assert filled == qty and qty > 1
+    assert abs(price - 101.0 * 1.001) < 1e-9   # VWAP exactement à la limite
+    sell_qty = book.max_qty("sell", 10)
+    assert abs(book.vwap("sell", sell_qty)[0] - 99.0 * 0.999) < 1e-9
+
+
+def test_replay_matches_live_registry():
+    path = os.path.join(tempfile.mkdtemp(prefix="bybit_ob_"), "order_book.jsonl")
+    for m in MESSAGES:
+        record_message(path, m)
+    replayed = list(replay(path))
+    # Le delta périmé n'est pas émis
+    assert [m["data"]["u"] for m, _ in replayed] == [10, 11, 12]
+    live, _ = registry_with(MESSAGES)
+    _, book = replayed[-1]
+    assert book.top(5) == live.get("BTCUSDT").top(5)
+    with open(path) as f:
+        assert json.loads(f.readline()) == MESSAGES[0]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,128 @@
+"""
+Tests du paper exchange (paper_exchange.py) sur un exchange interne factice
+
+Fills market / limit, TP/SL de position Full et Partial, trailing stop
+Bybit et PnL réalisé, sans réseau ni thread de flux (feed=False).
+
+Usage:
+    python3 test_paper_exchange.py
+"""
+from cost_model import CostModel
+from paper_exchange import PaperExchange
+
+SYMBOL = "BTC/USDT:USDT"
+FEE = 0.001
+
+
+class FakeExchange:
+    """Exchange interne minimal : un prix par symbole, servi par fetch_ticker"""
+
+    def __init__(self, price):
+        self.price = {SYMBOL: price}
+
+    def fetch_ticker(self, symbol, params=None):
+        return {"symbol": symbol, "last": self.price[symbol]}
+
+    def fetch_tickers(self, symbols=None, params=None):
+        return {s: {"symbol": s, "last": p} for s, p in self.price.items()}
+
+    def parse_timeframe(self, timeframe):
+        return 60
+
+
+def paper(price=100.0):
+    # Frais identiques maker / taker et sans slippage : PnL calculable à la main
+    costs = CostModel(taker_fee=FEE, maker_fee=FEE, slippage_base_bps=0.0, slippage_impact_bps=0.0)
+    return PaperExchange(FakeExchange(price), balance=1000.0, cost_model=costs, feed=False)
+
+
+def trading_stop(ex, **params):
+    return ex.private_post_v5_position_trading_stop({"symbol": "BTCUSDT", **params})
+
+
+def test_market_fill_and_close():
+    ex = paper()
+    order = ex.create_order(SYMBOL, "market", "buy", 2)
+    assert order["status"] == "closed" and order["filled"] == 2 and order["average"] == 100.0
+    pos = ex.fetch_position(SYMBOL)
+    assert pos["side"] == "long" and pos["contracts"] == 2 and pos["entryPrice"] == 100.0
+
+    ex.update_prices({SYMBOL: 110.0})
+    assert abs(ex.fetch_position(SYMBOL)["unrealizedPnl"] - 20.0) < 1e-9
+
+    ex.create_order(SYMBOL, "market", "sell", 2, params={"reduceOnly": True})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 0.0
+    expected = 1000.0 + 20.0 - FEE * 100.0 * 2 - FEE * 110.0 * 2
+    assert abs(ex.balance - expected) < 1e-9
+    assert len(ex.closed) == 1 and ex.closed[0]["exitReason"] == "MARKET"
+
+
+def test_resting_limit_fills_at_limit_price():
+    ex = paper()
+    ex.create_order(SYMBOL, "limit", "buy", 1, price=95.0)
+    assert len(ex.fetch_open_orders(SYMBOL)) == 1
+    ex.update_prices({SYMBOL: 97.0})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 0.0
+    ex.update_prices({SYMBOL: 94.0})
+    pos = ex.fetch_position(SYMBOL)
+    assert pos["contracts"] == 1 and pos["entryPrice"] == 95.0
+    assert ex.fills[-1]["isMaker"] and not ex.fetch_open_orders(SYMBOL)
+
+
+def test_full_stop_loss_attached_to_entry():
+    ex = paper()
+    ex.create_order(SYMBOL, "market", "buy", 1, params={"stopLoss": 95.0, "takeProfit": 110.0})
+    assert ex.fetch_position(SYMBOL)["stopLossPrice"] == 95.0
+    ex.update_prices({SYMBOL: 96.0})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 1
+    ex.update_prices({SYMBOL: 94.0})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 0.0
+    # Stop market : exécuté au prix du tick, TP retiré avec la position
+    assert ex.closed[-1]["exitReason"] == "SL" and ex.closed[-1]["avgExitPrice"] == 94.0
+    assert not ex.fetch_open_orders(SYMBOL)
+
+
+def test_partial_take_profits():
+    ex = paper()
+    ex.create_order(SYMBOL, "market", "sell", 3)
+    assert trading_stop(ex, tpslMode="Partial", takeProfit="90", tpSize="1")["retCode"] == 0
+    assert trading_stop(ex, tpslMode="Partial", takeProfit="85", tpSize="1")["retCode"] == 0
+    ex.update_prices({SYMBOL: 89.0})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 2
+    ex.update_prices({SYMBOL: 84.0})
+    pos = ex.fetch_position(SYMBOL)
+    assert pos["side"] == "short" and pos["contracts"] == 1
+    assert [c["exitReason"] for c in ex.closed] == ["TP", "TP"]
+
+
+def test_stop_on_wrong_side_is_rejected():
+    ex = paper()
+    ex.create_order(SYMBOL, "market", "buy", 1)
+    assert trading_stop(ex, stopLoss="105")["retCode"] != 0
+    assert trading_stop(ex, takeProfit="95")["retCode"] != 0
+    assert not ex.fetch_open_orders(SYMBOL)
+
+
+def test_trailing_stop_activates_then_follows():
+    ex = paper()
+    ex.create_order(SYMBOL, "market", "buy", 1)
+    assert trading_stop(ex, trailingStop="2", activePrice="105")["retCode"] == 0
+
+    # Sous le prix d'activation : le recul ne déclenche rien
+    ex.update_prices({SYMBOL: 101.0})
+    ex.update_prices({SYMBOL: 98.0})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 1
+
+    for price in (105.0, 108.0, 107.0):
+        ex.update_prices({SYMBOL: price})
+    assert ex.fetch_position(SYMBOL)["contracts"] == 1
+    ex.update_prices({SYMBOL: 106.0})   # 108 - 2
+    assert ex.fetch_position(SYMBOL)["contracts"] == 0.0
+    assert ex.closed[-1]["exitReason"] == "TRAIL" and ex.closed[-1]["avgExitPrice"] == 106.0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
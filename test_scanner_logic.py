@@ -1,40 +1,49 @@
-
-import pandas as pd
-import numpy as np
-import sys
 import os
 
-# Mock the indicators to see if they fail on empty or weird data
+import market_data
 from strategy_v7_robust import apply_indicators, check_signal
 
+SCAN_BARS = 250
+
+# Données du scanner : série enregistrée (python market_data.py record) si
+# SCANNER_DATASET=SYMBOLE@TF est archivée, sinon régimes synthétiques
+# (tendance, range, choc) de market_data.generate
+REGIME_CASES = {
+    "trend_up":   [("trend_up", SCAN_BARS)],
+    "trend_down": [("trend_down", SCAN_BARS)],
+    "range":      [("range", SCAN_BARS)],
+    "shock":      [("range", SCAN_BARS - 20), ("shock", 20)],
+}
+
+
+def scanner_frames():
+    dataset = os.getenv("SCANNER_DATASET", "")
+    if dataset:
+        symbol, timeframe = dataset.rsplit("@", 1)
+        df = market_data.load_dataframe(symbol, timeframe)
+        if len(df) >= SCAN_BARS:
+            # Fenêtres successives de la taille d'un fetch_ohlcv du scanner
+            for end in range(SCAN_BARS, len(df) + 1, SCAN_BARS):
+                yield f"{dataset}[{end - SCAN_BARS}:{end}]", df.iloc[end - SCAN_BARS:end].reset_index(drop=True)
+            return
+        print(f"⚠️ {dataset} : {len(df)} bougies archivées, données synthétiques utilisées")
+    for seed, (name, regimes) in enumerate(REGIME_CASES.items()):
+        yield name, market_data.synthetic_dataframe(SCAN_BARS, seed=seed, regimes=regimes)
+
+
 def test_scanner():
     print("Testing scanner logic...")
-    # Mock some data
-    data = []
-    for i in range(250):
-        data.append([
-            1600000000 + i*60,
-            100 + np.random.normal(0, 1),
-            101 + np.random.normal(0, 1),
-            99 + np.random.normal(0, 1),
-            100 + np.random.normal(0, 1),
-            1000 + np.random.normal(0, 100)
-        ])
-    
-    df = pd.DataFrame(data, columns=["timestamp", "open", "high", "low", "close", "volume"])
-    print("DataFrame head:")
-    print(df.head())
-    
-    try:
+    for name, df in scanner_frames():
+        print(f"Dataset {name}: {len(df)} candles, close {df['close'].iloc[0]:.2f} → {df['close'].iloc[-1]:.2f}")
+
         df_proc = apply_indicators(df)
         print("Indicators applied successfully.")
-        print("Columns:", df_proc.columns.tolist())
-        
+
         signal, score, atr = check_signal(df_proc)
         print(f"Signal: {signal}, Score: {score}, ATR: {atr}")
-        
-    except Exception as e:
-        print(f"Error in strategy logic: {e}")
+        assert signal in (None, "long", "short")
+        if signal:
+            assert atr > 0
 
 if __name__ == "__main__":
     test_scanner()
@@ -0,0 +1,117 @@
+"""
+Tests du moteur de modification des stops (stop_amender.py)
+
+Fusion des stops intermédiaires, seuil en ticks / ATR, intervalle minimal,
+refus et token bucket global, sur une horloge simulée.
+
+Usage:
+    python3 test_stop_amender.py
+"""
+import contextlib
+
+import stop_amender
+from stop_amender import StopAmender
+
+
+class Clock:
+    """Remplace le module time de stop_amender : le temps n'avance qu'à la main"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@contextlib.contextmanager
+def simulated_time():
+    clock, real = Clock(), stop_amender.time
+    stop_amender.time = clock
+    try:
+        yield clock
+    finally:
+        stop_amender.time = real
+
+
+class Exchange:
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.calls = []
+
+    def send(self, symbol, stop):
+        self.calls.append((symbol, stop))
+        return self.accept, "ok" if self.accept else "rejected"
+
+
+def amender(exchange, **kwargs):
+    params = dict(min_interval=5, min_ticks=5, atr_fraction=0.1, max_per_second=5)
+    params.update(kwargs)
+    return StopAmender(exchange.send, **params)
+
+
+def test_intermediate_stops_are_coalesced():
+    with simulated_time():
+        ex = Exchange()
+        am = amender(ex)
+        am.open("BTC", "long", 100.0, tick_size=0.1, atr=2.0)   # seuil = max(0.5, 0.2)
+        for stop in (100.2, 100.4, 100.6, 100.9):
+            assert am.desire("BTC", stop)
+        assert not am.desire("BTC", 100.5)   # recul : ignoré
+        assert am.flush() == 1
+        assert ex.calls == [("BTC", 100.9)] and am.acked_stop("BTC") == 100.9
+        stats = am.stats()
+        assert stats["desired"] == 4 and stats["sent"] == 1 and stats["coalesced"] == 3
+
+
+def test_small_improvement_waits_for_min_interval():
+    with simulated_time() as clock:
+        ex = Exchange()
+        am = amender(ex)
+        am.open("BTC", "short", 100.0, tick_size=0.1, atr=1.0)
+        am.desire("BTC", 99.0)
+        assert am.flush() == 1
+        clock.now += 1
+        am.desire("BTC", 98.8)               # 2 ticks < seuil de 5 ticks, envoi récent
+        assert am.flush() == 0
+        clock.now += 5
+        assert am.flush() == 1
+        assert ex.calls[-1] == ("BTC", 98.8) and am.acked_stop("BTC") == 98.8
+
+
+def test_rejected_stop_is_not_retried_before_interval():
+    with simulated_time() as clock:
+        ex = Exchange(accept=False)
+        am = amender(ex)
+        am.open("BTC", "long", 100.0, tick_size=0.1)
+        am.desire("BTC", 101.0)
+        assert am.flush() == 1 and am.acked_stop("BTC") == 100.0
+        clock.now += 1
+        assert am.flush() == 0
+        clock.now += 5
+        ex.accept = True
+        assert am.flush() == 1 and am.acked_stop("BTC") == 101.0
+        assert am.stats()["rejected"] == 1 and am.stats()["acked"] == 1
+
+
+def test_token_bucket_limits_sends_across_positions():
+    with simulated_time() as clock:
+        ex = Exchange()
+        am = amender(ex, max_per_second=2)
+        for i, symbol in enumerate(("A", "B", "C")):
+            am.open(symbol, "long", 100.0, tick_size=0.1)
+            am.desire(symbol, 101.0 + i)         # C, puis B, puis A par amélioration
+        assert am.flush() == 2
+        assert [s for s, _ in ex.calls] == ["C", "B"]
+        assert am.flush() == 0                   # bucket vide, temps figé
+        clock.now += 0.5                         # 0.5 s × 2/s = 1 jeton
+        assert am.flush() == 1 and ex.calls[-1][0] == "A"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
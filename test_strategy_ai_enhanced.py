@@ -0,0 +1,62 @@
+"""
+Tests du rejeu en batch de strategy_ai_enhanced.py
+
+replay_signals (indicateurs calculés une fois, machine à états en une passe)
+doit donner, bougie par bougie, les signaux du chemin live : reset_state()
+puis debug_check_signal(df.iloc[:i+1]) sur chaque préfixe.
+
+Usage:
+    python3 test_strategy_ai_enhanced.py
+"""
+import contextlib
+import logging
+import os
+import tempfile
+
+import market_data
+import strategy_ai_enhanced as ai
+from strategy_params import AIEnhancedParams
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    """debug_check_signal écrit logs/signals_log.csv : dossier temporaire"""
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="ai_enhanced_"))
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+        os.chdir(cwd)
+
+
+def live_signals(df, params=None):
+    ai.reset_state()
+    return [ai.debug_check_signal(df.iloc[:i + 1], params=params) for i in range(len(df))]
+
+
+def test_replay_matches_live_path():
+    fired = 0
+    with scratch_dir():
+        for seed in (1, 2, 3):
+            df = market_data.synthetic_dataframe(500, seed=seed, timeframe="15m")
+            replayed = list(ai.replay_signals(df))
+            assert replayed == live_signals(df), seed
+            fired += sum(s is not None for s in replayed)
+    assert fired > 0
+
+
+def test_replay_matches_live_path_with_params():
+    params = AIEnhancedParams.from_env().with_overrides(ema_fast=12, ema_slow=40, rsi_period=10,
+                                                        fib_entry_min=0.5, fib_entry_max=0.618)
+    with scratch_dir():
+        df = market_data.synthetic_dataframe(500, seed=4, timeframe="15m")
+        assert list(ai.replay_signals(df, params)) == live_signals(df, params)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
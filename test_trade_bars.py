@@ -0,0 +1,99 @@
+"""
+Tests des bougies construites depuis les trades publics (trade_bars.py)
+
+Le chemin vectorisé (build_bars, rejeu) et le chemin incrémental
+(BarBuilder, live) doivent donner les mêmes bougies ; TradeBarFeed ferme
+les barres de temps à l'heure donnée et n'expose la bougie en formation
+que sur demande.
+
+Usage:
+    python3 test_trade_bars.py
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from trade_bars import BarBuilder, TradeBarFeed, build_bars, record_trades, replay, trades_to_message
+
+SPECS = ("5s", "15s", "vol50", "range0.5")
+
+
+def synthetic_trades(n=5000, seed=7):
+    rng = np.random.default_rng(seed)
+    # Trades groupés par rafales, avec des trous de plus d'une période
+    gaps = rng.choice([0, 1, 20, 400, 12_000], size=n, p=[0.3, 0.3, 0.3, 0.09, 0.01])
+    return {
+        "timestamp": 1_700_000_000_000 + np.cumsum(gaps).astype(np.int64),
+        "price": 100 + np.cumsum(rng.normal(0, 0.02, n)),
+        "size": rng.lognormal(0, 1, n),
+    }
+
+
+def incremental(trades, spec):
+    builder = BarBuilder(spec)
+    bars = []
+    for ts, price, size in zip(trades["timestamp"], trades["price"], trades["size"]):
+        bars.extend(builder.add(int(ts), float(price), float(size)))
+    if builder.current is not None:
+        bars.append(tuple(builder.current))
+    return np.array(bars, dtype=np.float64)
+
+
+def vectorized(trades, spec):
+    bars = build_bars(trades, spec)
+    return np.column_stack([np.asarray(bars[c], dtype=np.float64)
+                            for c in ("timestamp", "open", "high", "low", "close", "volume")])
+
+
+def test_build_bars_matches_bar_builder():
+    trades = synthetic_trades()
+    for spec in SPECS:
+        fast, slow = vectorized(trades, spec), incremental(trades, spec)
+        assert fast.shape == slow.shape, spec
+        assert np.array_equal(fast[:, :5], slow[:, :5]), spec
+        # Volumes : sommes dans un ordre différent, égaux à l'arrondi flottant près
+        assert np.allclose(fast[:, 5], slow[:, 5], rtol=1e-9), spec
+
+
+def test_time_bars_fill_empty_periods():
+    bars = vectorized({"timestamp": np.array([1_000, 16_000], dtype=np.int64),
+                       "price": np.array([10.0, 12.0]), "size": np.array([1.0, 2.0])}, "5s")
+    assert bars[:, 0].tolist() == [0, 5_000, 10_000, 15_000]
+    # Périodes sans trade : bougie plate au dernier prix, volume 0
+    assert bars[1, 1:].tolist() == [10.0, 10.0, 10.0, 10.0, 0.0]
+
+
+def test_feed_closes_due_bars_and_hides_forming():
+    feed = TradeBarFeed(None, ["BTC/USDT:USDT"], ("5s",), record_path="")
+    feed.add_trades("BTC/USDT:USDT", [(1_000, 10.0, 1.0, "a"), (3_000, 11.0, 1.0, "b"),
+                                      (3_000, 11.0, 1.0, "b")])   # doublon ignoré
+    assert feed.frame("BTC/USDT:USDT", "5s", include_forming=False).empty
+    assert feed.frame("BTC/USDT:USDT", "5s")["volume"].tolist() == [2.0]
+
+    feed.close_due(now_ms=5_000)   # clôture exacte de la période [0, 5000)
+    closed = feed.frame("BTC/USDT:USDT", "5s", include_forming=False)
+    assert closed.values.tolist() == [[0, 10.0, 11.0, 10.0, 11.0, 2.0]]
+
+
+def test_replay_matches_build_bars():
+    trades = synthetic_trades(n=800, seed=3)
+    path = os.path.join(tempfile.mkdtemp(prefix="bybit_trades_"), "trades.jsonl")
+    rows = list(zip(trades["timestamp"].tolist(), trades["price"].tolist(), trades["size"].tolist(),
+                    [str(i) for i in range(len(trades["timestamp"]))]))
+    for start in range(0, len(rows), 100):
+        record_trades(path, trades_to_message("BTCUSDT", rows[start:start + 100]))
+
+    replayed = replay(path, SPECS)["BTCUSDT"]
+    for spec in SPECS:
+        expected = vectorized(trades, spec)
+        got = replayed[spec].to_numpy(dtype=np.float64)
+        assert got.shape == expected.shape, spec
+        assert np.allclose(got, expected, rtol=1e-12), spec
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
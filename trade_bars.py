@@ -0,0 +1,489 @@
+"""
+Bougies construites depuis le flux de trades publics (sous la minute)
+
+Les klines de l'exchange s'arrêtent à 1m et arrivent par polling : les
+scalpers voient leurs bougies en retard. Ce module agrège les trades publics
+en bougies au format market_data (timestamp, open, high, low, close, volume),
+utilisables telles quelles par apply_indicators / check_signal :
+  - barres de temps   : "5s", "15s", "30s" (ou tout timeframe de TIMEFRAME_MS) ;
+    les périodes sans trade donnent une bougie plate au dernier prix, volume 0,
+    comme les klines Bybit
+  - barres de volume  : "vol<N>" — une bougie par N unités échangées ; le
+    trade qui franchit le seuil appartient à la bougie (volume cumulé avant
+    le trade dans [k·N, (k+1)·N) → bougie k)
+  - barres de range   : "range<R>" — la bougie se ferme sur le trade qui porte
+    high − low à R ou plus
+Pour les barres de volume / range, timestamp = premier trade de la bougie,
+rendu strictement croissant (+1 ms si deux bougies ouvrent dans la même ms)
+pour l'archive market_data.
+
+Deux chemins donnant les mêmes bougies (volumes à l'arrondi flottant près) :
+  - build_bars(trades, spec)  : vectorisé numpy (rejeu, backtests)
+  - BarBuilder(spec).add(...) : incrémental, trade par trade (live)
+
+TradeBarFeed tient les bougies récentes par (symbole, spec) : trades reçus
+par handle_message() (messages publicTrade Bybit V5) ou par polling REST
+fetch_trades (TRADE_POLL_SECONDS) ; frame() retourne le DataFrame (bougie en
+formation en dernier, comme fetch_ohlcv). Les bougies closes peuvent être
+archivées (TRADE_BARS_ARCHIVE=1, market_data.append_candles) et les trades
+enregistrés en JSONL (TRADE_BARS_RECORD) puis rejoués avec replay().
+
+Usage :
+    feed = TradeBarFeed(exchange, ["BTC/USDT:USDT"], ("15s",)).start()
+    df = feed.frame("BTC/USDT:USDT", "15s")
+    bars = replay("data/trades.jsonl", ("5s", "vol100", "range25"))
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import market_data
+from bar_scheduler import BAR_CLOSE_GRACE_MS
+from market_data import COLUMNS, TIMEFRAME_MS
+
+SUB_MINUTE_TIMEFRAMES = ("5s", "15s", "30s")
+TRADE_POLL_SECONDS = float(os.getenv("TRADE_POLL_SECONDS", "1"))
+TRADE_BARS_MAX = int(os.getenv("TRADE_BARS_MAX", "500"))
+TRADE_BARS_ARCHIVE = os.getenv("TRADE_BARS_ARCHIVE", "0") == "1"
+TRADE_BARS_RECORD = os.getenv("TRADE_BARS_RECORD", "")
+TRADE_FETCH_LIMIT = 1000   # max trades par requête recent-trade Bybit
+
+
+def parse_spec(spec):
+    """'15s' -> ('time', 15000) | 'vol100' -> ('volume', 100.0) | 'range25' -> ('range', 25.0)"""
+    if spec in TIMEFRAME_MS:
+        return "time", TIMEFRAME_MS[spec]
+    for prefix, kind in (("vol", "volume"), ("range", "range")):
+        if spec.startswith(prefix):
+            size = float(spec[len(prefix):])
+            if size <= 0:
+                break
+            return kind, size
+    raise ValueError(f"Spécification de bougies inconnue: {spec}")
+
+
+# =========================
+# AGRÉGATION VECTORISÉE
+# =========================
+def _empty_bars():
+    return {c: np.empty(0, dtype=market_data.DTYPES[c]) for c in COLUMNS}
+
+
+def _aggregate(ts_open, price, size, starts):
+    """Bougies des segments [starts[k], starts[k+1]) de trades"""
+    ends = np.append(starts[1:], len(price)) - 1
+    return {
+        "timestamp": ts_open.astype(np.int64),
+        "open": price[starts],
+        "high": np.maximum.reduceat(price, starts),
+        "low": np.minimum.reduceat(price, starts),
+        "close": price[ends],
+        "volume": np.add.reduceat(size, starts),
+    }
+
+
+def _strictly_increasing(ts):
+    """t'_k = max(t_k, t'_{k-1} + 1)"""
+    steps = np.arange(len(ts), dtype=np.int64)
+    return np.maximum.accumulate(ts - steps) + steps
+
+
+def time_bars(ts, price, size, interval_ms):
+    ts, price, size = np.asarray(ts, np.int64), np.asarray(price, np.float64), np.asarray(size, np.float64)
+    if len(ts) == 0:
+        return _empty_bars()
+    bucket = ts // interval_ms
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    bars = _aggregate(bucket[starts] * interval_ms, price, size, starts)
+    # Périodes sans trade : bougie plate au dernier prix, volume 0
+    index = bucket[starts] - bucket[0]
+    n = int(index[-1]) + 1
+    if n == len(starts):
+        return bars
+    # Dernière bougie réelle à chaque période
+    source = np.zeros(n, dtype=np.int64)
+    source[index] = np.arange(len(starts))
+    flat = bars["close"][np.maximum.accumulate(source)]
+    full = {c: flat.copy() for c in ("open", "high", "low", "close")}
+    full["timestamp"] = (bucket[0] + np.arange(n, dtype=np.int64)) * interval_ms
+    full["volume"] = np.zeros(n)
+    for column in ("open", "high", "low", "close", "volume"):
+        full[column][index] = bars[column]
+    return full
+
+
+def volume_bars(ts, price, size, volume_per_bar):
+    ts, price, size = np.asarray(ts, np.int64), np.asarray(price, np.float64), np.asarray(size, np.float64)
+    if len(ts) == 0:
+        return _empty_bars()
+    # Volume cumulé avant chaque trade (même somme séquentielle que BarBuilder)
+    before = np.r_[0.0, np.cumsum(size)[:-1]]
+    bar_id = np.floor(before / volume_per_bar)
+    starts = np.flatnonzero(np.r_[True, bar_id[1:] != bar_id[:-1]])
+    return _aggregate(_strictly_increasing(ts[starts]), price, size, starts)
+
+
+def range_bars(ts, price, size, range_size, chunk=16):
+    """
+    Fin de chaque bougie cherchée par blocs (maximum/minimum.accumulate), de
+    taille doublée tant que le range n'est pas atteint : O(trades) amorti.
+    Après une bougie de moins de `chunk` trades, la suivante est cherchée
+    trade par trade (le coût fixe d'un bloc numpy dépasserait le parcours).
+    """
+    ts, price, size = np.asarray(ts, np.int64), np.asarray(price, np.float64), np.asarray(size, np.float64)
+    n = len(price)
+    if n == 0:
+        return _empty_bars()
+    prices = price.tolist()
+    starts = []
+    start = 0
+    bar_length = chunk   # longueur de la bougie précédente
+    while start < n:
+        starts.append(start)
+        end = None
+        high = low = prices[start]
+        if bar_length < chunk:
+            for i in range(start, n):
+                p = prices[i]
+                if p > high:
+                    high = p
+                elif p < low:
+                    low = p
+                if high - low >= range_size:
+                    end = i
+                    break
+        else:
+            lo = start
+            width = 2 * bar_length
+            while lo < n:
+                hi = min(n, lo + width)
+                highs = np.maximum.accumulate(np.maximum(price[lo:hi], high))
+                lows = np.minimum.accumulate(np.minimum(price[lo:hi], low))
+                hit = np.flatnonzero(highs - lows >= range_size)
+                if len(hit):
+                    end = lo + int(hit[0])
+                    break
+                high, low = highs[-1], lows[-1]
+                lo = hi
+                width *= 2
+        if end is None:
+            break
+        bar_length = end + 1 - start
+        start = end + 1
+    starts = np.asarray(starts, dtype=np.int64)
+    return _aggregate(_strictly_increasing(ts[starts]), price, size, starts)
+
+
+def build_bars(trades, spec):
+    """Bougies d'une spec depuis des trades {timestamp, price, size} (colonnes triées par temps)"""
+    kind, size = parse_spec(spec)
+    args = (trades["timestamp"], trades["price"], trades["size"])
+    if kind == "time":
+        return time_bars(*args, int(size))
+    if kind == "volume":
+        return volume_bars(*args, size)
+    return range_bars(*args, size)
+
+
+# =========================
+# AGRÉGATION INCRÉMENTALE
+# =========================
+class BarBuilder:
+    """Même découpage que build_bars, un trade à la fois. add() retourne les bougies closes."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.kind, self.size = parse_spec(spec)
+        self.current = None        # [timestamp, open, high, low, close, volume]
+        self.key = None            # période (temps) ou numéro de bougie (volume) de la dernière bougie
+        self.last_close = None
+        self.cum_volume = 0.0
+        self.last_ts = None        # timestamp de la dernière bougie émise (volume / range)
+        self.late = 0              # trades reçus après la clôture de leur période
+
+    def add(self, ts, price, size):
+        closed = []
+        if self.kind == "time":
+            key = int(ts) // int(self.size)
+            if self.key is not None and (key < self.key or (key == self.key and self.current is None)):
+                self.late += 1
+                return closed
+            if self.current is not None and key != self.key:
+                closed.append(self._close())
+            if self.current is None and self.key is not None:
+                closed.extend(self._flat_bars(self.key + 1, key))
+        elif self.kind == "volume":
+            key = np.floor(self.cum_volume / self.size)
+            self.cum_volume += size
+            if self.current is not None and key != self.key:
+                closed.append(self._close())
+        else:
+            key = None
+
+        if self.current is None:
+            open_ts = key * int(self.size) if self.kind == "time" else self._open_ts(ts)
+            self.current = [open_ts, price, price, price, price, size]
+            self.key = key
+        else:
+            bar = self.current
+            if price > bar[2]:
+                bar[2] = price
+            if price < bar[3]:
+                bar[3] = price
+            bar[4] = price
+            bar[5] += size
+
+        if self.kind == "range" and self.current[2] - self.current[3] >= self.size:
+            closed.append(self._close())
+        return closed
+
+    def close_due(self, now_ms):
+        """Barres de temps : ferme les périodes terminées à now_ms (bougie en cours et périodes vides)"""
+        if self.kind != "time" or self.key is None:
+            return []
+        key = int(now_ms) // int(self.size)
+        if key <= self.key:
+            return []
+        closed = [self._close()] if self.current is not None else []
+        closed.extend(self._flat_bars(self.key + 1, key))
+        # Périodes < key émises : un trade plus ancien arrivera en retard
+        self.key = key - 1
+        return closed
+
+    def _close(self):
+        bar = tuple(self.current)
+        self.last_close = bar[4]
+        self.current = None
+        return bar
+
+    def _flat_bars(self, first_key, end_key):
+        close = self.last_close
+        return [(k * int(self.size), close, close, close, close, 0.0) for k in range(first_key, end_key)]
+
+    def _open_ts(self, ts):
+        ts = int(ts)
+        if self.last_ts is not None and ts <= self.last_ts:
+            ts = self.last_ts + 1
+        self.last_ts = ts
+        return ts
+
+
+# =========================
+# SOURCES DE TRADES
+# =========================
+def trades_from_message(message):
+    """Message publicTrade Bybit V5 -> (identifiant marché, [(ts, prix, taille, id)])"""
+    if isinstance(message, (str, bytes)):
+        message = json.loads(message)
+    if not str(message.get("topic", "")).startswith("publicTrade."):
+        return None, []
+    trades = [(int(t["T"]), float(t["p"]), float(t["v"]), t.get("i")) for t in message.get("data", ())]
+    return message["topic"].split(".", 1)[1], trades
+
+
+def trades_to_message(market, trades):
+    """Trades -> message publicTrade Bybit (format d'enregistrement)"""
+    return {
+        "topic": f"publicTrade.{market}",
+        "type": "snapshot",
+        "ts": int(time.time() * 1000),
+        "data": [{"T": ts, "s": market, "p": str(price), "v": str(size), "i": trade_id}
+                 for ts, price, size, trade_id in trades],
+    }
+
+
+def load_trades(path, market=None):
+    """Enregistrement JSONL -> {identifiant marché: colonnes timestamp / price / size}"""
+    rows = collections.defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            name, trades = trades_from_message(json.loads(line))
+            if name is not None and (market is None or name == market):
+                rows[name].extend(trades)
+    columns = {}
+    for name, trades in rows.items():
+        ts, price, size, _ = zip(*trades) if trades else ((), (), (), ())
+        order = np.argsort(np.asarray(ts, np.int64), kind="stable")
+        columns[name] = {
+            "timestamp": np.asarray(ts, np.int64)[order],
+            "price": np.asarray(price, np.float64)[order],
+            "size": np.asarray(size, np.float64)[order],
+        }
+    return columns
+
+
+def replay(path, specs, market=None):
+    """Rejeu vectorisé d'un enregistrement : {identifiant marché: {spec: DataFrame}}"""
+    return {
+        name: {spec: pd.DataFrame(build_bars(trades, spec), columns=list(COLUMNS)) for spec in specs}
+        for name, trades in load_trades(path, market).items()
+    }
+
+
+def _market_id(symbol):
+    return symbol.split(":")[0].replace("/", "")
+
+
+# =========================
+# FLUX LIVE
+# =========================
+class TradeBarFeed:
+    def __init__(self, exchange, symbols, specs, max_bars=TRADE_BARS_MAX, archive=TRADE_BARS_ARCHIVE,
+                 root=None, record_path=TRADE_BARS_RECORD, interval=TRADE_POLL_SECONDS):
+        for spec in specs:
+            parse_spec(spec)
+        self.exchange = exchange
+        self.symbols = list(symbols)
+        self.specs = tuple(specs)
+        self.archive = archive
+        self.root = root
+        self.record_path = record_path
+        self.interval = interval
+        self._ids = {_market_id(s): s for s in self.symbols}
+        self._builders = {(s, spec): BarBuilder(spec) for s in self.symbols for spec in self.specs}
+        self._bars = {key: collections.deque(maxlen=max_bars) for key in self._builders}
+        self._last_trade = {}      # symbole -> (timestamp, ids vus à ce timestamp)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.trades = 0
+        self.errors = 0
+
+    # ── Entrées ───────────────────────────────────────────────────────────────
+    def handle_message(self, message):
+        """Message publicTrade Bybit V5 (websocket ou enregistrement)"""
+        market, trades = trades_from_message(message)
+        symbol = self._ids.get(market)
+        if symbol is None:
+            return 0
+        return self.add_trades(symbol, trades)
+
+    def add_trades(self, symbol, trades):
+        """Ajoute des trades (ts, prix, taille, id) triés ; doublons déjà vus ignorés"""
+        last_ts, seen = self._last_trade.get(symbol, (None, set()))
+        fresh = []
+        for trade in trades:
+            ts, trade_id = trade[0], trade[3]
+            if last_ts is not None and (ts < last_ts or (ts == last_ts and trade_id in seen)):
+                continue
+            if ts != last_ts:
+                last_ts, seen = ts, set()
+            seen.add(trade_id)
+            fresh.append(trade)
+        self._last_trade[symbol] = (last_ts, seen)
+        if not fresh:
+            return 0
+
+        closed = collections.defaultdict(list)
+        with self._lock:
+            for spec in self.specs:
+                builder = self._builders[(symbol, spec)]
+                bars = self._bars[(symbol, spec)]
+                for ts, price, size, _ in fresh:
+                    for bar in builder.add(ts, price, size):
+                        bars.append(bar)
+                        closed[spec].append(bar)
+            self.trades += len(fresh)
+        if self.record_path:
+            record_trades(self.record_path, trades_to_message(_market_id(symbol), fresh))
+        self._archive(symbol, closed)
+        return len(fresh)
+
+    def close_due(self, now_ms=None):
+        """
+        Ferme les barres de temps terminées même sans nouveau trade, avec
+        BAR_CLOSE_GRACE_MS de marge pour les trades publiés en retard (même délai
+        que bar_scheduler : au réveil du scheduler la bougie est déjà close)
+        """
+        if now_ms is None:
+            now_ms = int(time.time() * 1000) - BAR_CLOSE_GRACE_MS
+        for symbol in self.symbols:
+            closed = collections.defaultdict(list)
+            with self._lock:
+                for spec in self.specs:
+                    for bar in self._builders[(symbol, spec)].close_due(now_ms):
+                        self._bars[(symbol, spec)].append(bar)
+                        closed[spec].append(bar)
+            self._archive(symbol, closed)
+
+    def _archive(self, symbol, closed):
+        if not self.archive:
+            return
+        for spec, bars in closed.items():
+            try:
+                market_data.append_candles(symbol, spec, bars, root=self.root, source="trades")
+            except Exception as e:
+                print(f"⚠️ [{symbol}] Archive {spec}: {e}", flush=True)
+
+    # ── Polling REST ──────────────────────────────────────────────────────────
+    def poll_once(self):
+        added = 0
+        for symbol in self.symbols:
+            since = self._last_trade.get(symbol, (None,))[0]
+            trades = self.exchange.fetch_trades(symbol, since=since, limit=TRADE_FETCH_LIMIT)
+            trades = sorted(trades, key=lambda t: t["timestamp"])
+            added += self.add_trades(symbol, [
+                (int(t["timestamp"]), float(t["price"]), float(t["amount"]), t.get("id")) for t in trades])
+        self.close_due()
+        return added
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trade-bars", daemon=True)
+        self._thread.start()
+        print(f"🧱 Bougies depuis les trades actives ({', '.join(self.specs)}, poll {self.interval}s)", flush=True)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Trades publics: {e}", flush=True)
+            self._stop.wait(max(self.interval - (time.monotonic() - started), 0.0))
+
+    # ── Lecture ───────────────────────────────────────────────────────────────
+    def frame(self, symbol, spec, include_forming=True):
+        """Bougies récentes au format DataFrame ccxt (bougie en formation en dernier)"""
+        with self._lock:
+            rows = list(self._bars[(symbol, spec)])
+            current = self._builders[(symbol, spec)].current
+            if include_forming and current is not None:
+                rows.append(tuple(current))
+        return pd.DataFrame(rows, columns=list(COLUMNS))
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "specs": list(self.specs),
+                "trades": self.trades,
+                "late_trades": sum(b.late for b in self._builders.values()),
+                "errors": self.errors,
+                "bars": {f"{s} {spec}": len(bars) for (s, spec), bars in self._bars.items()},
+            }
+
+
+def record_trades(path, message):
+    """Ajoute un message au fichier JSONL d'enregistrement des trades"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(message, separators=(",", ":")) + "\n")
@@ -0,0 +1,10 @@
+"""
+Module principal des workers du walk-forward (auto_tuner.py)
+
+Un worker 'spawn' ré-exécute le module __main__ du parent : lancé depuis
+bot_multisymbol_v6_3.py, chaque worker referait `from config import *`
+(client ccxt, load_markets réseau), PaperExchange, Flask, scheduler...
+Pendant le pool, auto_tuner désigne ce module comme __main__ : les workers
+n'importent que le tuner et ses stratégies.
+"""
+import auto_tuner  # noqa: F401